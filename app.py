@@ -1,8 +1,15 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, make_response
-from werkzeug.utils import secure_filename
-from datetime import datetime, date
+from flask import Flask, Request, abort, current_app, g, has_request_context, render_template, stream_template, stream_with_context, request, redirect, url_for, session, flash, get_flashed_messages, jsonify, make_response
+from datetime import datetime, date, timezone
+import base64
+import csv
+import hashlib
+import io
 import os
+import random
 import sqlite3
+import tempfile
+import threading
+import time
 import uuid
 import html
 import json
@@ -10,25 +17,238 @@ import smtplib
 import re
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from functools import wraps
+from collections import OrderedDict, namedtuple
+from functools import partial, wraps
+from flask.signals import before_render_template, template_rendered
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.http import is_resource_modified
+import click
 
-app = Flask(__name__)
-app.secret_key = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
-app.config['UPLOAD_FOLDER'] = 'static/uploads'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+from content import compile_content
+from images import image_placeholder, sniff_image, sniff_image_bytes
+import metrics
+from writer import BatchWriter
+from uploads import HashedUpload
+import static_export
+import bodies
+import revisions
+import backups
+import critical_css
+import useragents
+import feeds
+
+DEFAULT_SUMMARY = 'Short summary of the article will go here eventually'
+
+# Upper bound on memoized URLs kept per app
+URL_CACHE_SIZE = 50000
+
+# Views and template filters are recorded here and attached to each app by
+# create_app(), so several independent apps can be built in one process.
+_routes = []
+_template_filters = []
+_template_globals = []
+
+# Settings that make an app write outside its DATABASE and UPLOAD_FOLDER; an app
+# created with a `config` mapping only has the ones that mapping sets
+SHARED_OUTPUT_SETTINGS = ('METRICS_DIR', 'CRITICAL_CSS_CACHE', 'STATIC_EXPORT_DIR', 'BACKUP_DIR')
+
+def route(rule, **options):
+    """Record a view function to be registered by create_app()"""
+    def decorator(f):
+        _routes.append((rule, f, options))
+        return f
+    return decorator
+
+def template_filter(name):
+    """Record a template filter to be registered by create_app()"""
+    def decorator(f):
+        _template_filters.append((name, f))
+        return f
+    return decorator
+
+def template_global(name):
+    """Record a template global function to be registered by create_app()"""
+    def decorator(f):
+        _template_globals.append((name, f))
+        return f
+    return decorator
+
+class AppState:
+    """Per-app lazily initialized state.
+
+    Nothing here touches the database or the filesystem until first use, so an
+    app imported by a preloading gunicorn master carries no open handles into
+    forked workers; each worker opens its own connections after the fork.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.db_ready = False
+        self.email_loaded = False
+        self.upload_folder_ready = False
+        self.url_cache = {}
+        self.metrics = metrics.MetricsRegistry()
+        # Called with (connection, sql, parameters, seconds, endpoint) for every statement, e.g. by the query auditor
+        self.statement_listeners = []
+        self.writer = None
+        # (article id, comments_version) -> (count, first page, next cursor), least recently used first
+        self.comment_cache = OrderedDict()
+        # User agent string -> id in user_agents, least recently used first
+        self.user_agent_ids = OrderedDict()
+        # Decompressed compiled bodies keyed by (article id, body_version)
+        self.body_cache = bodies.BodyCache()
+        # Stored feed and sitemap bodies: name -> (etag, bytes)
+        self.documents = {}
+        # ((style.css mtime, cache mtime), {template: critical CSS}), loaded on first use
+        self.critical_css = None
+        self.critical_css_lock = threading.Lock()
+        # (endpoint, slug) -> URLs of the images a page shows first, least recently used first
+        self.preload_cache = OrderedDict()
+        # Thread taking scheduled backups when BACKUP_DIR is set, started by the first request
+        self.backup_thread = None
+
+def get_state():
+    """Get the lazy state object of the current app"""
+    return current_app.extensions['blog']
+
+def create_app(config=None):
+    """Create and configure a Flask application.
+
+    `config` is a mapping that overrides the defaults below; pass a distinct
+    DATABASE (and UPLOAD_FOLDER) to run isolated instances side by side.
+    Such an app leaves the SHARED_OUTPUT_SETTINGS the environment sets off,
+    so it does not write to the export, backups or caches of the real site.
+    """
+    app = Flask(__name__)
+    app.request_class = UploadRequest
+    app.config.from_mapping(
+        SECRET_KEY=os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production'),
+        DATABASE=os.environ.get('DATABASE', 'blog.db'),
+        UPLOAD_FOLDER=os.environ.get('UPLOAD_FOLDER', 'static/uploads'),
+        MAX_CONTENT_LENGTH=16 * 1024 * 1024,  # 16MB max file size
+        ADMIN_PASSWORD=os.environ.get('ADMIN_PASSWORD', 'kyleekallick2002'),
+        # Templates are only re-checked on disk when explicitly asked for
+        TEMPLATES_AUTO_RELOAD=os.environ.get('TEMPLATES_AUTO_RELOAD', 'False').lower() == 'true',
+        # Compiled template bytecode is shared across workers and restarts
+        TEMPLATE_CACHE_DIR=os.environ.get('TEMPLATE_CACHE_DIR', '.jinja_cache'),
+        # Large listing pages are streamed to the client while rows are read
+        STREAM_LISTINGS=os.environ.get('STREAM_LISTINGS', 'True').lower() == 'true',
+        STREAM_CHUNK_SIZE=8 * 1024,
+        STREAM_FETCH_SIZE=500,
+        # Request, SQL and template timing; METRICS_DIR lets workers share numbers
+        METRICS_ENABLED=os.environ.get('METRICS_ENABLED', 'True').lower() == 'true',
+        METRICS_DIR=os.environ.get('METRICS_DIR'),
+        METRICS_FLUSH_INTERVAL=10,
+        METRICS_MAX_AGE=3600,
+        METRICS_TOKEN=os.environ.get('METRICS_TOKEN'),
+        # Fraction of requests run under cProfile, and how many of the slowest to keep
+        PROFILE_SAMPLE_RATE=float(os.environ.get('PROFILE_SAMPLE_RATE', 0)),
+        PROFILE_KEEP=10,
+        # Statements slower than this many seconds are logged with their plan (0 disables)
+        SLOW_QUERY_THRESHOLD=float(os.environ.get('SLOW_QUERY_THRESHOLD', 0.1)),
+        # Most writes the batched writer commits in one transaction
+        WRITE_BATCH_SIZE=500,
+        # Seconds a connection waits for another one's lock, and how often the writer retries a batch after that
+        DATABASE_TIMEOUT=float(os.environ.get('DATABASE_TIMEOUT', 10)),
+        WRITE_RETRIES=int(os.environ.get('WRITE_RETRIES', 3)),
+        # Articles whose first page of comments is kept in memory per worker
+        COMMENT_CACHE_SIZE=256,
+        # User agent ids kept in memory per worker
+        USER_AGENT_CACHE_SIZE=4096,
+        # Fraction of tracking calls from crawlers and other bots that are stored (0 drops them all)
+        BOT_SAMPLE_RATE=float(os.environ.get('BOT_SAMPLE_RATE', 0)),
+        # Characters of decompressed article bodies kept in memory per worker
+        BODY_CACHE_SIZE=32 * 1024 * 1024,
+        # New comments stay hidden until approved in the moderation queue
+        COMMENTS_REQUIRE_APPROVAL=os.environ.get('COMMENTS_REQUIRE_APPROVAL', 'False').lower() == 'true',
+        # Seconds an image uploaded for a preview is kept
+        PREVIEW_UPLOAD_MAX_AGE=3600,
+        # Largest image (width x height) accepted for upload
+        MAX_IMAGE_PIXELS=40_000_000,
+        # Where uploaded files are spooled while they arrive, outside the publicly served UPLOAD_FOLDER
+        UPLOAD_SPOOL_DIR=os.environ.get('UPLOAD_SPOOL_DIR', os.path.join(app.instance_path, 'incoming')),
+        # Where the critical CSS extracted for each page template is kept (empty disables inlining)
+        CRITICAL_CSS_CACHE=os.environ.get('CRITICAL_CSS_CACHE', os.path.join(app.instance_path, 'critical_css.json')),
+        # Directory of the static export that admin saves keep up to date (off when unset)
+        STATIC_EXPORT_DIR=os.environ.get('STATIC_EXPORT_DIR'),
+        # Public address used for links in the feed and sitemap (default: the requested host)
+        SITE_URL=os.environ.get('SITE_URL'),
+        # Directory of rotating database snapshots taken every BACKUP_INTERVAL seconds (off when unset)
+        BACKUP_DIR=os.environ.get('BACKUP_DIR'),
+        BACKUP_INTERVAL=int(os.environ.get('BACKUP_INTERVAL', 3600)),
+        BACKUP_KEEP=int(os.environ.get('BACKUP_KEEP', 24)),
+        # Run analytics and CSV exports on the latest snapshot instead of the live database
+        READ_FROM_SNAPSHOT=os.environ.get('READ_FROM_SNAPSHOT', 'False').lower() == 'true',
+    )
+    if config is not None:
+        app.config.update(dict.fromkeys(SHARED_OUTPUT_SETTINGS), **config)
+    
+    if app.config['TEMPLATE_CACHE_DIR']:
+        os.makedirs(app.config['TEMPLATE_CACHE_DIR'], exist_ok=True)
+        app.jinja_options = dict(app.jinja_options,
+                                 bytecode_cache=FileSystemBytecodeCache(app.config['TEMPLATE_CACHE_DIR']))
+    
+    app.extensions['blog'] = AppState()
+    
+    for rule, view_func, options in _routes:
+        app.add_url_rule(rule, view_func=view_func, **options)
+    for name, filter_func in _template_filters:
+        app.add_template_filter(filter_func, name)
+    for name, global_func in _template_globals:
+        app.add_template_global(global_func, name)
+    
+    app.cli.command('init-db')(init_db_command)
+    app.cli.command('compile-content')(compile_content_command)
+    app.cli.command('backfill-placeholders')(backfill_placeholders_command)
+    app.cli.command('audit-queries')(audit_queries_command)
+    app.cli.command('import-subscribers')(import_subscribers_command)
+    app.cli.command('gc-uploads')(gc_uploads_command)
+    app.cli.command('export-site')(export_site_command)
+    app.cli.command('build-critical-css')(build_critical_css_command)
+    app.cli.command('build-documents')(build_documents_command)
+    app.cli.command('backup-db')(backup_db_command)
+    app.cli.command('restore-db')(restore_db_command)
+    app.cli.command('compact-revisions')(compact_revisions_command)
+    
+    app.after_request(set_upload_cache_headers)
+    app.before_request(send_early_hints)
+    app.after_request(set_preload_headers)
+    
+    if app.config['METRICS_ENABLED']:
+        app.before_request(start_request_metrics)
+        app.teardown_request(finish_request_metrics)
+        before_render_template.connect(start_template_metrics, app)
+        template_rendered.connect(finish_template_metrics, app)
+    
+    return app
+
+def warm_templates(app):
+    """Compile every template up front so no request pays for it"""
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
 
 # Email configuration (set via environment variables or database)
 def load_email_config():
     """Load email configuration from database or environment variables"""
+    config_values = {
+        'MAIL_SERVER': 'smtp.gmail.com',
+        'MAIL_PORT': 587,
+        'MAIL_USE_TLS': True,
+        'MAIL_USE_SSL': False,
+        'MAIL_USERNAME': '',
+        'MAIL_PASSWORD': '',
+        'MAIL_DEFAULT_SENDER': '',
+    }
+    
     # First try environment variables (takes precedence)
     if os.environ.get('MAIL_USERNAME') and os.environ.get('MAIL_PASSWORD'):
-        app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
-        app.config['MAIL_PORT'] = int(os.environ.get('MAIL_PORT', 587))
-        app.config['MAIL_USE_TLS'] = os.environ.get('MAIL_USE_TLS', 'True').lower() == 'true'
-        app.config['MAIL_USE_SSL'] = os.environ.get('MAIL_USE_SSL', 'False').lower() == 'true'
-        app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME', '')
-        app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD', '')
-        app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER', '')
+        config_values['MAIL_SERVER'] = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
+        config_values['MAIL_PORT'] = int(os.environ.get('MAIL_PORT', 587))
+        config_values['MAIL_USE_TLS'] = os.environ.get('MAIL_USE_TLS', 'True').lower() == 'true'
+        config_values['MAIL_USE_SSL'] = os.environ.get('MAIL_USE_SSL', 'False').lower() == 'true'
+        config_values['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME', '')
+        config_values['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD', '')
+        config_values['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER', '')
     else:
         # Try loading from database
         try:
@@ -39,50 +259,669 @@ def load_email_config():
             conn.close()
             
             if config and config['mail_username'] and config['mail_password']:
-                app.config['MAIL_SERVER'] = config['mail_server'] or 'smtp.gmail.com'
-                app.config['MAIL_PORT'] = config['mail_port'] or 587
-                app.config['MAIL_USE_TLS'] = bool(config['mail_use_tls'])
-                app.config['MAIL_USE_SSL'] = bool(config['mail_use_ssl'])
-                app.config['MAIL_USERNAME'] = config['mail_username'] or ''
-                app.config['MAIL_PASSWORD'] = config['mail_password'] or ''
-                app.config['MAIL_DEFAULT_SENDER'] = config['mail_default_sender'] or ''
-            else:
-                # Defaults
-                app.config['MAIL_SERVER'] = 'smtp.gmail.com'
-                app.config['MAIL_PORT'] = 587
-                app.config['MAIL_USE_TLS'] = True
-                app.config['MAIL_USE_SSL'] = False
-                app.config['MAIL_USERNAME'] = ''
-                app.config['MAIL_PASSWORD'] = ''
-                app.config['MAIL_DEFAULT_SENDER'] = ''
-        except:
-            # Defaults if database not ready
-            app.config['MAIL_SERVER'] = 'smtp.gmail.com'
-            app.config['MAIL_PORT'] = 587
-            app.config['MAIL_USE_TLS'] = True
-            app.config['MAIL_USE_SSL'] = False
-            app.config['MAIL_USERNAME'] = ''
-            app.config['MAIL_PASSWORD'] = ''
-            app.config['MAIL_DEFAULT_SENDER'] = ''
+                config_values['MAIL_SERVER'] = config['mail_server'] or 'smtp.gmail.com'
+                config_values['MAIL_PORT'] = config['mail_port'] or 587
+                config_values['MAIL_USE_TLS'] = bool(config['mail_use_tls'])
+                config_values['MAIL_USE_SSL'] = bool(config['mail_use_ssl'])
+                config_values['MAIL_USERNAME'] = config['mail_username'] or ''
+                config_values['MAIL_PASSWORD'] = config['mail_password'] or ''
+                config_values['MAIL_DEFAULT_SENDER'] = config['mail_default_sender'] or ''
+        except sqlite3.Error:
+            pass  # Defaults if database not ready
+    
+    current_app.config.update(config_values)
+    get_state().email_loaded = True
+
+def ensure_email_config():
+    """Load email configuration on first use"""
+    if not get_state().email_loaded:
+        load_email_config()
+
+# Instrumentation
+
+def start_request_metrics():
+    """Start timing the current request"""
+    g.request_started = time.perf_counter()
+    g.query_stats = metrics.QueryStats()
+    g.template_starts = []
+    rate = current_app.config['PROFILE_SAMPLE_RATE']
+    g.profiler = metrics.start_profiler() if rate and random.random() < rate else None
+
+def finish_request_metrics(exc):
+    """Record the timings of the current request"""
+    started = g.pop('request_started', None)
+    if started is None:
+        return
+    duration = time.perf_counter() - started
+    endpoint = request.endpoint or 'unmatched'
+    registry = get_state().metrics
+    registry.observe('request_duration_seconds', endpoint, duration)
+    stats = g.pop('query_stats')
+    registry.observe('request_sql_statements', endpoint, stats.statements)
+    registry.observe('request_sql_duration_seconds', endpoint, stats.seconds)
+    
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        registry.add_profile(duration, endpoint, request.full_path, profiler, current_app.config['PROFILE_KEEP'])
+    
+    if current_app.config['METRICS_DIR']:
+        registry.flush(current_app.config['METRICS_DIR'], current_app.config['METRICS_FLUSH_INTERVAL'])
+
+def record_statement(connection, sql, parameters, seconds, endpoint=None, stats=None):
+    """Add a statement to the current request's SQL totals and log it if slow.
+
+    `connection` is None for statements run by write(). Statements run on
+    the writer thread by write_transaction() pass the `endpoint` and SQL
+    totals of the request they were made for.
+    """
+    if has_request_context():
+        endpoint = request.endpoint
+        stats = g.get('query_stats')
+    if stats is not None:
+        stats.statements += 1
+        stats.seconds += seconds
+    
+    threshold = current_app.config['SLOW_QUERY_THRESHOLD']
+    if threshold and seconds >= threshold:
+        log_slow_query(connection, sql, parameters, seconds, endpoint)
+    
+    for listener in get_state().statement_listeners:
+        listener(connection, sql, parameters, seconds, endpoint)
+
+def log_slow_query(connection, sql, parameters, seconds, endpoint=None):
+    """Log a statement that took longer than SLOW_QUERY_THRESHOLD, with its query plan"""
+    try:
+        plan = metrics.query_plan(connection, sql, parameters) if connection is not None and parameters is not None else []
+    except sqlite3.Error:
+        plan = []
+    current_app.logger.warning(
+        'Slow query (%.1f ms, endpoint %s): %s params=%r\n  plan: %s',
+        seconds * 1000, endpoint, ' '.join(sql.split()), parameters, '; '.join(plan) or 'n/a')
+
+def start_template_metrics(sender, template, context, **extra):
+    if 'template_starts' in g:
+        g.template_starts.append(time.perf_counter())
+
+def finish_template_metrics(sender, template, context, **extra):
+    if g.get('template_starts'):
+        duration = time.perf_counter() - g.template_starts.pop()
+        get_state().metrics.observe('template_render_seconds', template.name or 'string', duration)
+
+def collect_metrics():
+    """Merge the metrics of every worker, or of this process alone without METRICS_DIR"""
+    registry = get_state().metrics
+    directory = current_app.config['METRICS_DIR']
+    if directory:
+        registry.flush(directory, 0)
+        snapshots = metrics.read_snapshots(directory, current_app.config['METRICS_MAX_AGE'])
+    else:
+        snapshots = [registry.snapshot()]
+    return metrics.merge_snapshots(snapshots, current_app.config['PROFILE_KEEP'])
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 
-# Ensure upload directories exist
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+# Subfolder of UPLOAD_FOLDER for preview uploads, which expire
+PREVIEW_UPLOAD_DIR = 'tmp'
+
+# Subfolder of UPLOAD_FOLDER that uploads used to be spooled into, served along with them
+LEGACY_INCOMING_UPLOAD_DIR = '.incoming'
+
+# File extension for each image type sniff_image() recognizes
+IMAGE_EXTENSIONS = {'png': 'png', 'jpeg': 'jpg', 'gif': 'gif', 'webp': 'webp'}
+
+# Uploaded files are named after the SHA-256 of their content
+CONTENT_ADDRESSED_UPLOAD = re.compile(r'^uploads/[0-9a-f]{64}\.[a-z]+$')
+
+# Upload filenames referenced from article and about page HTML
+UPLOAD_REFERENCE = re.compile(r'uploads/([\w.-]+)')
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def get_db():
-    """Get database connection"""
-    conn = sqlite3.connect('blog.db')
+def upload_folder(subfolder=''):
+    """Path of the upload folder (or a subfolder of it), created on first use"""
+    state = get_state()
+    if not state.upload_folder_ready:
+        os.makedirs(os.path.join(current_app.config['UPLOAD_FOLDER'], PREVIEW_UPLOAD_DIR), exist_ok=True)
+        os.makedirs(current_app.config['UPLOAD_SPOOL_DIR'], exist_ok=True)
+        state.upload_folder_ready = True
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], subfolder)
+
+def spool_folder():
+    """Path of UPLOAD_SPOOL_DIR, created on first use"""
+    upload_folder()
+    return current_app.config['UPLOAD_SPOOL_DIR']
+
+class UploadRequest(Request):
+    """Request that spools uploaded files into UPLOAD_SPOOL_DIR, hashing them on the way"""
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashedUpload(spool_folder())
+
+def save_upload(file, preview=False):
+    """Store an uploaded image under the hash of its content and return its filename.
+
+    The type and size are read from the file's header, not its name; None is
+    returned for anything that is not a PNG, JPEG, GIF or WebP image within
+    MAX_IMAGE_PIXELS. The same image uploaded twice is stored once, and
+    since a name always refers to the same bytes its URL can be cached
+    forever. Preview uploads go to PREVIEW_UPLOAD_DIR and are removed after
+    PREVIEW_UPLOAD_MAX_AGE.
+    """
+    upload = file.stream
+    if not isinstance(upload, HashedUpload):
+        upload = HashedUpload.copy_from(upload, spool_folder())
+    try:
+        upload.seek(0)
+        image = sniff_image(upload)
+        if not image:
+            return None
+        kind, width, height = image
+        if width * height > current_app.config['MAX_IMAGE_PIXELS']:
+            return None
+        
+        filename = f'{upload.hexdigest()}.{IMAGE_EXTENSIONS[kind]}'
+        if preview:
+            filename = f'{PREVIEW_UPLOAD_DIR}/{filename}'
+        filepath = os.path.join(upload_folder(), filename)
+        if os.path.exists(filepath):
+            os.utime(filepath)  # Restart the expiry of a preview upload
+        else:
+            # Already complete on disk, so a rename puts it in place atomically
+            upload.keep_as(filepath)
+        return filename
+    finally:
+        upload.close()
+
+def expire_files(folder, max_age):
+    """Delete files in `folder` older than `max_age` seconds and return their paths"""
+    cutoff = time.time() - max_age
+    removed = []
+    try:
+        entries = list(os.scandir(folder))
+    except FileNotFoundError:
+        return removed
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed.append(entry.path)
+        except FileNotFoundError:
+            pass  # Removed by another worker
+    return removed
+
+def expire_uploads(subfolder, max_age):
+    """Delete files in an upload subfolder older than `max_age` seconds and return their names"""
+    folder = os.path.join(current_app.config['UPLOAD_FOLDER'], subfolder)
+    return [f'{subfolder}/{os.path.basename(path)}' for path in expire_files(folder, max_age)]
+
+def expire_preview_uploads(max_age):
+    """Delete preview uploads older than `max_age` seconds and return their names"""
+    return expire_uploads(PREVIEW_UPLOAD_DIR, max_age)
+
+def find_upload_references():
+    """Names of uploaded files used by articles, their revisions or the about page"""
+    references = set()
+    conn = get_db()
+    for row in conn.execute('SELECT cover_image_filename FROM articles'):
+        references.add(row['cover_image_filename'])
+    for row in conn.execute('SELECT codec, source FROM article_bodies'):
+        references.update(UPLOAD_REFERENCE.findall(bodies.decompress(row['source'], row['codec'])))
+    # Images only earlier revisions use stay, so restoring one does not break it
+    for text in revisions.stored_text(conn):
+        references.update(UPLOAD_REFERENCE.findall(text))
+    for row in conn.execute('SELECT author_photo_filename, author_bio_text FROM about_page'):
+        references.add(row['author_photo_filename'])
+        references.update(UPLOAD_REFERENCE.findall(row['author_bio_text'] or ''))
+    conn.close()
+    return references
+
+def collect_upload_garbage(min_age, dry_run=False):
+    """Delete uploads nothing refers to and expired previews; return the names removed.
+
+    Files younger than `min_age` seconds are kept, since an image added in
+    the editor is only referenced once its article is saved.
+    """
+    removed = []
+    if not dry_run:
+        removed += expire_preview_uploads(current_app.config['PREVIEW_UPLOAD_MAX_AGE'])
+        # Spool files left behind by a worker that died mid-upload
+        removed += expire_files(current_app.config['UPLOAD_SPOOL_DIR'], min_age)
+        # and the ones left where uploads were spooled before UPLOAD_SPOOL_DIR, inside the served folder
+        removed += expire_uploads(LEGACY_INCOMING_UPLOAD_DIR, min_age)
+    references = find_upload_references()
+    cutoff = time.time() - min_age
+    try:
+        entries = list(os.scandir(current_app.config['UPLOAD_FOLDER']))
+    except FileNotFoundError:
+        return removed
+    for entry in entries:
+        if not entry.is_file() or entry.name in references:
+            continue
+        try:
+            if entry.stat().st_mtime >= cutoff:
+                continue
+            if not dry_run:
+                os.remove(entry.path)
+            removed.append(entry.name)
+        except FileNotFoundError:
+            pass
+    return removed
+
+# Page templates that get critical CSS inlined, by the endpoint rendering them
+CRITICAL_CSS_TEMPLATES = {
+    'home': 'home',
+    'songbird_magazine': 'category',
+    'angsty_entries': 'category',
+    'quick_reads': 'category',
+    'archive': 'archive',
+    'article_detail': 'article',
+    'about': 'about',
+}
+
+# Set in the WSGI environ of the pages rendered to extract critical CSS from
+CRITICAL_CSS_BUILD_ENVIRON = 'blog.critical_css_build'
+
+def stylesheet_path(app):
+    return os.path.join(app.static_folder, 'css', 'style.css')
+
+def build_critical_css(app):
+    """Extract the critical CSS of each page template and save it to CRITICAL_CSS_CACHE.
+
+    One page per template is rendered through the app (the latest article
+    stands in for all articles) and style.css is filtered down to the rules
+    that apply to it. Returns {template: css}.
+    """
+    with open(stylesheet_path(app), 'rb') as f:
+        stylesheet = f.read()
+    
+    # A fresh app context so rendering does not disturb a request this runs in
+    with app.app_context(), app.test_request_context():
+        conn = get_db()
+        latest = conn.execute('SELECT slug FROM articles ORDER BY published_date DESC LIMIT 1').fetchone()
+        conn.close()
+        pages = {
+            'home': url_for('home'),
+            'category': url_for('songbird_magazine'),
+            'archive': url_for('archive'),
+            'about': url_for('about'),
+        }
+        if latest:
+            pages['article'] = url_for('article_detail', slug=latest['slug'])
+        
+        client = app.test_client()
+        templates = {}
+        for template, path in pages.items():
+            response = client.get(path, environ_base={CRITICAL_CSS_BUILD_ENVIRON: True})
+            if response.status_code == 200:
+                templates[template] = critical_css.extract(stylesheet.decode(), response.get_data(as_text=True))
+    
+    path = app.config['CRITICAL_CSS_CACHE']
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.part')
+    with os.fdopen(fd, 'w') as f:
+        json.dump({'stylesheet': hashlib.sha256(stylesheet).hexdigest(), 'templates': templates}, f)
+    os.replace(temp_path, path)
+    return templates
+
+def saved_critical_css(app):
+    """Critical CSS saved for the current style.css, or None if none was built for it"""
+    with open(stylesheet_path(app), 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    try:
+        with open(app.config['CRITICAL_CSS_CACHE']) as f:
+            saved = json.load(f)
+        if saved['stylesheet'] == digest:
+            return saved['templates']
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
+    return None
+
+def warm_critical_css(app):
+    """Build the critical CSS cache unless it is current, before any worker serves pages.
+
+    Requests only read the cache: built here, in one process, workers never
+    race to write it or render pages while a visitor waits.
+    """
+    if not app.config['CRITICAL_CSS_CACHE'] or saved_critical_css(app) is not None:
+        return
+    try:
+        build_critical_css(app)
+    except Exception:
+        # Pages link the blocking stylesheet until `flask build-critical-css` succeeds
+        app.logger.exception('Building critical CSS failed')
+
+def file_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+@template_global('get_critical_css')
+def get_critical_css():
+    """Critical CSS to inline in the page being rendered, or None to link style.css as usual"""
+    if not current_app.config['CRITICAL_CSS_CACHE'] or not has_request_context():
+        return None
+    template = CRITICAL_CSS_TEMPLATES.get(request.endpoint)
+    if template is None or request.environ.get(CRITICAL_CSS_BUILD_ENVIRON):
+        return None
+    
+    # Checked on every page so an edited style.css or a rebuilt cache is picked up without a restart
+    app = current_app._get_current_object()
+    key = (file_mtime(stylesheet_path(app)), file_mtime(app.config['CRITICAL_CSS_CACHE']))
+    state = get_state()
+    if state.critical_css is None or state.critical_css[0] != key:
+        with state.critical_css_lock:
+            if state.critical_css is None or state.critical_css[0] != key:
+                # Never built on a request: a stale or missing cache means the plain stylesheet link
+                state.critical_css = (key, saved_critical_css(app) or {})
+    return state.critical_css[1].get(template)
+
+# Public pages whose responses carry preload hints
+PRELOAD_ENDPOINTS = frozenset(CRITICAL_CSS_TEMPLATES)
+
+# Carousel covers preloaded and loaded up front on the home page: the slides visible first and the next one
+PRELOAD_HOME_COVERS = 3
+
+# Pages whose first images are remembered for Early Hints, per worker
+PRELOAD_CACHE_SIZE = 1024
+
+def preload_links(images):
+    """Link header values for style.css, tracker.js and the given image URLs"""
+    links = [
+        f"<{cached_url_for('static', filename='css/style.css')}>; rel=preload; as=style",
+        f"<{cached_url_for('static', filename='js/tracker.js')}>; rel=preload; as=script",
+    ]
+    links.extend(f'<{url}>; rel=preload; as=image' for url in images)
+    return links
+
+def preload_key():
+    return request.endpoint, (request.view_args or {}).get('slug')
+
+def remember_preload_images(images):
+    """Record the images a page shows first.
+
+    They are preloaded through this response's Link header, and through 103
+    Early Hints on the next request for the page, before the database is read.
+    """
+    g.preload_images = images
+    key = preload_key()
+    state = get_state()
+    with state.lock:
+        state.preload_cache[key] = images
+        state.preload_cache.move_to_end(key)
+        while len(state.preload_cache) > PRELOAD_CACHE_SIZE:
+            state.preload_cache.popitem(last=False)
+
+def send_early_hints():
+    """Send 103 Early Hints for a public page when the server supports them (wsgi.early_hints)"""
+    early_hints = request.environ.get('wsgi.early_hints')
+    if early_hints is None or request.endpoint not in PRELOAD_ENDPOINTS:
+        return
+    state = get_state()
+    with state.lock:
+        images = state.preload_cache.get(preload_key(), ())
+    early_hints([('Link', ', '.join(preload_links(images)))])
+
+def set_preload_headers(response):
+    """Add Link preload headers to public pages (proxies and CDNs may turn them into Early Hints)"""
+    if (request.endpoint in PRELOAD_ENDPOINTS and response.status_code == 200
+            and response.mimetype == 'text/html'):
+        response.headers['Link'] = ', '.join(preload_links(g.get('preload_images', ())))
+    return response
+
+def set_upload_cache_headers(response):
+    """Let browsers and proxies keep content-addressed uploads forever"""
+    if (request.endpoint == 'static' and response.status_code == 200
+            and CONTENT_ADDRESSED_UPLOAD.match((request.view_args or {}).get('filename', ''))):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = 365 * 24 * 3600
+        response.cache_control.immutable = True
+    return response
+
+def resolve_image_size(src):
+    """Get (width, height) of an image referenced from article content, if it can be read"""
+    try:
+        if src.startswith('data:image/'):
+            return sniff_image_bytes(base64.b64decode(src.partition(',')[2]))[1:]
+        
+        static_prefix = current_app.static_url_path + '/'
+        if not src.startswith(static_prefix):
+            return None
+        relative_path = src[len(static_prefix):]
+        if relative_path.startswith('uploads/'):
+            path = os.path.join(current_app.config['UPLOAD_FOLDER'], relative_path[len('uploads/'):])
+        else:
+            path = os.path.join(current_app.static_folder, relative_path)
+        with open(path, 'rb') as f:
+            return sniff_image(f)[1:]
+    except (OSError, ValueError, TypeError):
+        return None  # Missing or unreadable image: leave the size out
+
+def compile_article_content(content_html):
+    """Compile editor HTML into the stored body, excerpt and reading time"""
+    return compile_content(content_html, resolve_image_size)
+
+def recompile_articles(only_missing=False):
+    """Recompile the stored body of existing articles and return how many were updated"""
+    conn = get_db()
+    cursor = conn.cursor()
+    query = 'SELECT article_id FROM article_bodies'
+    if only_missing:
+        query += ' WHERE compiled IS NULL'
+    article_ids = [row[0] for row in cursor.execute(query).fetchall()]
+    for article_id in article_ids:
+        source = bodies.load(conn, article_id, 'source')
+        compiled = compile_article_content(source)
+        bodies.store(conn, article_id, source, compiled.html)
+        cursor.execute('''
+            UPDATE articles SET excerpt = ?, reading_minutes = ?, body_version = body_version + 1
+            WHERE id = ?
+        ''', (compiled.excerpt, compiled.reading_minutes, article_id))
+    conn.commit()
+    conn.close()
+    return len(article_ids)
+
+def backfill_cover_placeholders(recompute=False):
+    """Compute the placeholders of article covers that have none (or all with `recompute`).
+
+    Returns (covers decoded, covers that could not be decoded).
+    """
+    conn = get_db()
+    query = 'SELECT DISTINCT cover_image_filename FROM articles'
+    if not recompute:
+        query += ' WHERE cover_color IS NULL'
+    filenames = [row[0] for row in conn.execute(query)]
+    failed = 0
+    for filename in filenames:
+        cover_color, cover_preview = cover_placeholder(filename)
+        if cover_color is None:
+            failed += 1
+            continue
+        conn.execute('UPDATE articles SET cover_color = ?, cover_preview = ? WHERE cover_image_filename = ?',
+                     (cover_color, cover_preview, filename))
+        conn.commit()
+    conn.close()
+    return len(filenames) - failed, failed
+
+def connect_db():
+    """Open a new connection to the configured database"""
+    conn = sqlite3.connect(current_app.config['DATABASE'], timeout=current_app.config['DATABASE_TIMEOUT'],
+                           factory=metrics.InstrumentedConnection)
     conn.row_factory = sqlite3.Row
+    if observing_statements():
+        conn.observer = record_statement
     return conn
 
+def observing_statements():
+    """Whether statements need to be passed to record_statement()"""
+    return bool(current_app.config['METRICS_ENABLED'] or current_app.config['SLOW_QUERY_THRESHOLD']
+                or get_state().statement_listeners)
+
+def get_db():
+    """Get database connection, creating the schema on first use"""
+    state = get_state()
+    if not state.db_ready:
+        with state.lock:
+            if not state.db_ready:
+                init_db()
+                state.db_ready = True
+    if state.backup_thread is None and current_app.config['BACKUP_DIR'] and has_request_context():
+        # Only in processes serving requests, so CLI commands do not start backups
+        with state.lock:
+            if state.backup_thread is None:
+                config = current_app.config
+                state.backup_thread = backups.start_scheduler(config['DATABASE'], config['BACKUP_DIR'],
+                                                              config['BACKUP_INTERVAL'], config['BACKUP_KEEP'],
+                                                              current_app.logger)
+    return connect_db()
+
+def get_replica_db():
+    """A connection for heavy read-only queries, and the time its data is from (None when live).
+
+    With READ_FROM_SNAPSHOT set this is the latest backup snapshot, as long
+    as it is less than two BACKUP_INTERVALs old; otherwise, or without
+    snapshots, it is the live database.
+    """
+    config = current_app.config
+    if config['READ_FROM_SNAPSHOT'] and config['BACKUP_DIR']:
+        snapshot = backups.latest_snapshot(config['BACKUP_DIR'], config['DATABASE'])
+        if snapshot is not None:
+            taken = backups.snapshot_time(snapshot)
+            if (datetime.now(timezone.utc) - taken).total_seconds() < 2 * config['BACKUP_INTERVAL']:
+                conn = backups.open_snapshot(snapshot, factory=metrics.InstrumentedConnection)
+                conn.row_factory = sqlite3.Row
+                live = get_db()
+                # A snapshot from before the last schema change may lack columns the queries use
+                if schema_sql(conn) == schema_sql(live):
+                    live.close()
+                    if observing_statements():
+                        conn.observer = record_statement
+                    return conn, taken
+                conn.close()
+                return live, None
+    return get_db(), None
+
+def schema_sql(conn):
+    # Not PRAGMA schema_version: the backup API does not carry it over to the copy
+    return conn.execute('SELECT type, name, sql FROM sqlite_schema ORDER BY type, name').fetchall()
+
+def get_writer():
+    """Get the app's batched writer, creating the schema first if needed"""
+    state = get_state()
+    if state.writer is None:
+        get_db().close()
+        with state.lock:
+            if state.writer is None:
+                config = current_app.config
+                state.writer = BatchWriter(config['DATABASE'], config['WRITE_BATCH_SIZE'], timeout=config['DATABASE_TIMEOUT'],
+                                           retries=config['WRITE_RETRIES'], factory=metrics.InstrumentedConnection)
+    return state.writer
+
+def write(sql, parameters=()):
+    """Run a write statement through the batched writer and return the rows it returned"""
+    start = time.perf_counter()
+    rows = get_writer().execute(sql, parameters)
+    if observing_statements():
+        record_statement(None, sql, parameters, time.perf_counter() - start)
+    return rows
+
+def write_transaction(function):
+    """Run `function(conn)` in the batched writer's transaction and return its result.
+
+    Every write made while serving a request goes through the writer, so
+    requests never wait on each other's locks. The function runs on the
+    writer thread in an app context, so it can use get_state() and url_for(),
+    and its statements are counted towards the request in metrics and the
+    query audit. It has no request context: ending a copy of the request's
+    would close the request's uploaded files, which the view may still be
+    reading. It has to take what it needs from the request before being
+    submitted.
+    """
+    app = current_app._get_current_object()
+    url_adapter = None
+    observer = None
+    if has_request_context():
+        # URLs built by the function point at the host the request came in on
+        url_adapter = app.create_url_adapter(request)
+    if observing_statements():
+        if has_request_context():
+            observer = partial(record_statement, endpoint=request.endpoint, stats=g.get('query_stats'))
+        else:
+            observer = record_statement
+    
+    def job(conn):
+        context = app.app_context()
+        if url_adapter is not None:
+            context.url_adapter = url_adapter
+        conn.observer = observer
+        try:
+            with context:
+                return function(conn)
+        finally:
+            conn.observer = None
+    return get_writer().transaction(job)
+
+def table_columns(conn, table):
+    return {row['name'] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+def move_article_bodies(conn):
+    """Move the bodies of a database from before article_bodies out of the articles table.
+
+    Runs once, in one transaction; a worker that finds another one doing it
+    waits for it and then has nothing to do. The freed pages are reused by
+    later writes, or given back to the filesystem by running VACUUM.
+    """
+    if 'content_html' not in table_columns(conn, 'articles'):
+        return
+    conn.commit()
+    conn.execute('BEGIN IMMEDIATE')
+    found = table_columns(conn, 'articles')
+    if 'content_html' in found:
+        compiled = 'content_compiled' if 'content_compiled' in found else 'NULL'
+        for article_id, source, compiled_html in conn.execute(f'SELECT id, content_html, {compiled} FROM articles'):
+            bodies.store(conn, article_id, source, compiled_html)
+        conn.execute('ALTER TABLE articles DROP COLUMN content_html')
+        if 'content_compiled' in found:
+            conn.execute('ALTER TABLE articles DROP COLUMN content_compiled')
+    conn.commit()
+
+def intern_user_agents(conn):
+    """Replace the user agent strings of page views from before user_agents with ids into it.
+
+    Runs once, in one transaction, like move_article_bodies().
+    """
+    if 'user_agent' not in table_columns(conn, 'page_views'):
+        return
+    conn.commit()
+    conn.execute('BEGIN IMMEDIATE')
+    if 'user_agent' in table_columns(conn, 'page_views'):
+        conn.execute('CREATE TEMP TABLE user_agent_map (user_agent TEXT PRIMARY KEY, id INTEGER NOT NULL)')
+        found = conn.execute('SELECT DISTINCT user_agent FROM page_views WHERE user_agent IS NOT NULL').fetchall()
+        for (original,) in found:
+            user_agent = useragents.normalize(original)
+            if user_agent is None:
+                continue
+            user_agent_id = conn.execute(INTERN_USER_AGENT, (user_agent, int(useragents.is_bot(user_agent)))).fetchone()[0]
+            conn.execute('INSERT INTO temp.user_agent_map (user_agent, id) VALUES (?, ?)', (original, user_agent_id))
+        conn.execute('''
+            UPDATE page_views SET user_agent_id = (
+                SELECT id FROM temp.user_agent_map AS m WHERE m.user_agent = page_views.user_agent
+            )
+            WHERE user_agent IS NOT NULL
+        ''')
+        conn.execute('DROP TABLE temp.user_agent_map')
+        conn.execute('ALTER TABLE page_views DROP COLUMN user_agent')
+    conn.commit()
+
 def init_db():
     """Initialize database with schema"""
-    conn = get_db()
+    conn = connect_db()
     cursor = conn.cursor()
+    # Readers and the writer do not block each other; the setting is stored in the file
+    cursor.execute('PRAGMA journal_mode = WAL')
     
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS articles (
@@ -93,7 +932,6 @@ def init_db():
             category TEXT NOT NULL,
             published_date DATE NOT NULL,
             cover_image_filename TEXT NOT NULL,
-            content_html TEXT NOT NULL,
             short_summary TEXT DEFAULT 'Short summary of the article will go here eventually'
         )
     ''')
@@ -104,6 +942,42 @@ def init_db():
     except sqlite3.OperationalError:
         pass  # Column already exists
     
+    # Excerpt and reading time derived from the body at save time, the cover's placeholder
+    # (dominant colour and tiny preview) computed at upload, and a counter of body changes
+    for column in ('excerpt TEXT', 'reading_minutes INTEGER', 'comments_version INTEGER NOT NULL DEFAULT 0',
+                   'cover_color TEXT', 'cover_preview TEXT', 'body_version INTEGER NOT NULL DEFAULT 0'):
+        try:
+            cursor.execute(f'ALTER TABLE articles ADD COLUMN {column}')
+        except sqlite3.OperationalError:
+            pass  # Column already exists
+    
+    # Editor HTML and compiled body of each article, compressed (see bodies.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS article_bodies (
+            article_id INTEGER PRIMARY KEY,
+            codec TEXT NOT NULL,
+            source BLOB NOT NULL,
+            compiled BLOB
+        )
+    ''')
+    move_article_bodies(conn)
+    
+    # Earlier versions of article bodies, as full copies and compressed deltas (see revisions.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS article_revisions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            article_id INTEGER NOT NULL,
+            number INTEGER NOT NULL,
+            created_at TIMESTAMP,
+            title TEXT,
+            kind TEXT NOT NULL,
+            codec TEXT NOT NULL,
+            data BLOB NOT NULL,
+            length INTEGER NOT NULL,
+            UNIQUE(article_id, number)
+        )
+    ''')
+    
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS about_page (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -125,6 +999,12 @@ def init_db():
         )
     ''')
     
+    # Viewer that posted a comment, so moderation can filter by it
+    try:
+        cursor.execute('ALTER TABLE comments ADD COLUMN viewer_token TEXT')
+    except sqlite3.OperationalError:
+        pass  # Column already exists
+    
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS likes (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -141,18 +1021,35 @@ def init_db():
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_likes_article_id ON likes(article_id)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_likes_viewer_token ON likes(viewer_token)')
     
+    # Each distinct user agent once; page views refer to it by id
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_agents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_agent TEXT UNIQUE NOT NULL,
+            is_bot INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_agents_is_bot ON user_agents(is_bot)')
+    
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS page_views (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             viewer_token TEXT NOT NULL,
             path TEXT NOT NULL,
             referrer TEXT,
-            user_agent TEXT,
+            user_agent_id INTEGER,
             started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            duration_seconds INTEGER
+            duration_seconds INTEGER,
+            FOREIGN KEY (user_agent_id) REFERENCES user_agents(id)
         )
     ''')
     
+    try:
+        cursor.execute('ALTER TABLE page_views ADD COLUMN user_agent_id INTEGER REFERENCES user_agents(id)')
+    except sqlite3.OperationalError:
+        pass  # Column already exists
+    intern_user_agents(conn)
+    
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS article_views (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -188,6 +1085,20 @@ def init_db():
         pass  # Column already exists
     
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_subscribers_email ON subscribers(email)')
+    # Case-insensitive prefix search on names in the admin subscriber list
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_subscribers_name ON subscribers(name COLLATE NOCASE)')
+    
+    # Indexes for the ORDER BY columns of listings, moderation and rate limiting
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_articles_published_date ON articles(published_date)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_articles_category_published_date ON articles(category, published_date)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_comments_created_at ON comments(created_at)')
+    # Approved comments of an article in date order, without a sort
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_comments_article_approved_created ON comments(article_id, is_approved, created_at)')
+    # Moderation queue filters, each ordered by date
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_comments_article_created ON comments(article_id, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_comments_approved_created ON comments(is_approved, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_comments_viewer_created ON comments(viewer_token, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_subscribers_created_at ON subscribers(created_at)')
     
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS email_config (
@@ -202,6 +1113,16 @@ def init_db():
         )
     ''')
     
+    # Feed and sitemap bodies, rebuilt when articles are added or their listing data changes
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS generated_documents (
+            name TEXT PRIMARY KEY,
+            body BLOB NOT NULL,
+            etag TEXT NOT NULL,
+            last_modified TEXT NOT NULL
+        )
+    ''')
+    
     # Initialize email config if it doesn't exist
     cursor.execute('SELECT COUNT(*) as count FROM email_config')
     config_count = cursor.fetchone()['count']
@@ -233,42 +1154,230 @@ def set_viewer_token_cookie(response, viewer_token):
     response.set_cookie('viewer_token', viewer_token, max_age=365*24*60*60)  # 1 year
     return response
 
-@app.template_filter('cover_image_url')
+def cached_url_for(endpoint, **values):
+    """url_for() memoized per app and script root.
+
+    Listing pages build the same static and article URLs over and over; the
+    result of url_for() only depends on its arguments and the mount point.
+    """
+    cache = get_state().url_cache
+    script_root = request.script_root if has_request_context() else ''
+    key = (script_root, endpoint, tuple(values.items()))
+    url = cache.get(key)
+    if url is None:
+        if len(cache) >= URL_CACHE_SIZE:
+            cache.clear()
+        url = cache[key] = url_for(endpoint, **values)
+    return url
+
+def image_url(filename):
+    """Get the URL for a cover image or author photo"""
+    if filename == 'cover_image.png':
+        return cached_url_for('static', filename='graphics/cover_image.png')
+    return cached_url_for('static', filename=f'uploads/{filename}')
+
+def image_path(filename):
+    """Path on disk of a cover image or author photo"""
+    if filename == 'cover_image.png':
+        return os.path.join(current_app.static_folder, 'graphics', 'cover_image.png')
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+
+def cover_placeholder(filename):
+    """(dominant colour, preview data URI) of a cover image, or (None, None) if it cannot be decoded"""
+    return image_placeholder(image_path(filename)) or (None, None)
+
+@template_global('cover_placeholder_style')
+def cover_placeholder_style(color, preview):
+    """Inline style showing a cover's placeholder behind it until the image loads"""
+    if not color:
+        return ''
+    return f'background: {color} url({preview}) center / cover no-repeat'
+
+@template_filter('cover_image_url')
 def cover_image_url(filename):
     """Get the URL for a cover image"""
-    if filename == 'cover_image.png':
-        return url_for('static', filename='graphics/cover_image.png')
-    else:
-        return url_for('static', filename=f'uploads/{filename}')
+    return image_url(filename)
 
-@app.template_filter('author_photo_url')
+@template_filter('author_photo_url')
 def author_photo_url(filename):
     """Get the URL for an author photo"""
-    if filename == 'cover_image.png':
-        return url_for('static', filename='graphics/cover_image.png')
-    else:
-        return url_for('static', filename=f'uploads/{filename}')
+    return image_url(filename)
+
+# Listing pages only need these columns; article bodies are never read for them
+ARTICLE_SUMMARY_COLUMNS = ('id, title, slug, author_name, category, published_date, cover_image_filename, short_summary, '
+                           'cover_color, cover_preview, excerpt')
+
+ArticleSummary = namedtuple('ArticleSummary', [
+    'id', 'title', 'slug', 'author_name', 'category', 'published_date',
+    'cover_image_filename', 'cover_url', 'url', 'short_summary', 'cover_placeholder',
+])
+
+def listing_summary(short_summary, excerpt):
+    """The text listings and the feed show for an article: its summary, or while that is the placeholder its excerpt"""
+    if short_summary and short_summary != DEFAULT_SUMMARY:
+        return short_summary
+    return excerpt or DEFAULT_SUMMARY
+
+def article_summary(row):
+    """Build an ArticleSummary with URLs and defaults resolved from a row of ARTICLE_SUMMARY_COLUMNS"""
+    (article_id, title, slug, author_name, category, published_date, cover_image_filename, short_summary,
+     cover_color, cover_preview, excerpt) = row
+    return ArticleSummary(
+        article_id, title, slug, author_name, category, published_date, cover_image_filename,
+        image_url(cover_image_filename),
+        cached_url_for('article_detail', slug=slug),
+        listing_summary(short_summary, excerpt),
+        cover_placeholder_style(cover_color, cover_preview),
+    )
+
+def fetch_article_summaries(cursor):
+    """Fetch the remaining rows of an ARTICLE_SUMMARY_COLUMNS query as ArticleSummary objects"""
+    return [article_summary(row) for row in cursor.fetchall()]
 
-@app.template_filter('safe_get')
-def safe_get(row, key, default=''):
-    """Safely get a value from a sqlite3.Row object"""
+def iter_rows(query, params=(), replica=False):
+    """Yield the rows of a query without holding them all in memory.
+
+    The query only runs once iteration starts, rows are read from the cursor
+    STREAM_FETCH_SIZE at a time, and the connection is closed at the end.
+    With `replica` the rows may come from the latest snapshot (see get_replica_db()).
+    """
+    fetch_size = current_app.config['STREAM_FETCH_SIZE']
+    conn = get_replica_db()[0] if replica else get_db()
     try:
-        value = row[key]
-        return value if value is not None else default
-    except (KeyError, IndexError, TypeError):
-        return default
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+def keyset_cursor(row):
+    """Encode the (created_at, id) position of a row for a next-page link"""
+    return f"{row['created_at']}|{row['id']}"
+
+def parse_keyset_cursor(value):
+    """The (created_at, id) position from keyset_cursor(), or None if malformed"""
+    created_at, _, row_id = value.rpartition('|')
+    if not created_at or not row_id.isdigit():
+        return None
+    return created_at, int(row_id)
+
+def iter_article_summaries(query, params=()):
+    """Yield ArticleSummary objects for an ARTICLE_SUMMARY_COLUMNS query, read as in iter_rows()"""
+    for row in iter_rows(query, params):
+        yield article_summary(row)
+
+def render_listing(template_name, query, params=(), **context):
+    """Render a listing page of article summaries.
+
+    With STREAM_LISTINGS on, the response starts with the page shell while
+    the query is still being read and is sent in STREAM_CHUNK_SIZE pieces;
+    otherwise all rows are fetched and rendered in one go.
+    """
+    if not current_app.config['STREAM_LISTINGS']:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        articles = fetch_article_summaries(cursor)
+        conn.close()
+        return render_template(template_name, articles=articles, **context)
+    
+    # Pop flashed messages now: the session cookie is written with the headers,
+    # before the template gets to read them
+    get_flashed_messages(with_categories=True)
+    
+    pieces = stream_template(template_name, articles=iter_article_summaries(query, params), **context)
+    chunk_size = current_app.config['STREAM_CHUNK_SIZE']
+    
+    def generate():
+        # The first piece goes out on its own so headers are sent right away
+        yield next(pieces, '')
+        buffer = []
+        buffered = 0
+        for piece in pieces:
+            buffer.append(piece)
+            buffered += len(piece)
+            if buffered >= chunk_size:
+                yield ''.join(buffer)
+                buffer = []
+                buffered = 0
+        if buffer:
+            yield ''.join(buffer)
+    
+    return current_app.response_class(generate(), mimetype='text/html')
+
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+# Rows per executemany() and commit when importing subscribers
+IMPORT_BATCH_SIZE = 10000
+
+ImportResult = namedtuple('ImportResult', ['inserted', 'duplicates', 'invalid'])
 
 def validate_email(email):
     """Basic email validation"""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+    return EMAIL_PATTERN.match(email) is not None
+
+def import_subscribers(lines):
+    """Add subscribers from CSV lines with an email and an optional name column.
+
+    The first row may be a header naming the columns (e.g. "Email,Name").
+    Addresses are trimmed and lowercased; rows are inserted IMPORT_BATCH_SIZE
+    at a time, skipping addresses that are already subscribed or repeated in
+    the file. Returns an ImportResult with the count of each outcome.
+    """
+    reader = csv.reader(lines)
+    email_column, name_column = 0, 1
+    inserted = duplicates = invalid = 0
+    first_row = True
+    batch = []
+    
+    def insert_batch():
+        # Each batch is one write, so signups and other writes go on between batches
+        def insert(conn):
+            before = conn.total_changes
+            conn.executemany('INSERT INTO subscribers (email, name) VALUES (?, ?) ON CONFLICT (email) DO NOTHING', batch)
+            return conn.total_changes - before
+        return write_transaction(insert)
+    
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        if first_row:
+            first_row = False
+            header = [cell.strip().lower() for cell in row]
+            if any('mail' in cell for cell in header) and not any(EMAIL_PATTERN.match(cell) for cell in header):
+                email_column = next(i for i, cell in enumerate(header) if 'mail' in cell)
+                name_column = next((i for i, cell in enumerate(header) if 'name' in cell and i != email_column), None)
+                continue
+        
+        email = row[email_column].strip().lower() if email_column < len(row) else ''
+        if not EMAIL_PATTERN.match(email):
+            invalid += 1
+            continue
+        name = row[name_column].strip() if name_column is not None and name_column < len(row) else ''
+        batch.append((email, name or None))
+        
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            added = insert_batch()
+            inserted += added
+            duplicates += len(batch) - added
+            batch = []
+    if batch:
+        added = insert_batch()
+        inserted += added
+        duplicates += len(batch) - added
+
+    return ImportResult(inserted, duplicates, invalid)
 
 def send_email_to_subscribers(subject, body):
     """Send email to all subscribers"""
     # Reload config in case it was updated
     load_email_config()
     
-    if not app.config['MAIL_USERNAME'] or not app.config['MAIL_PASSWORD']:
+    if not current_app.config['MAIL_USERNAME'] or not current_app.config['MAIL_PASSWORD']:
         return {'success': False, 'message': 'Email configuration not set. Please configure email settings in the admin panel (Admin Dashboard > Email Configuration).'}
     
     try:
@@ -284,7 +1393,7 @@ def send_email_to_subscribers(subject, body):
         # Create message
         msg = MIMEMultipart('alternative')
         msg['Subject'] = subject
-        msg['From'] = app.config['MAIL_DEFAULT_SENDER'] or app.config['MAIL_USERNAME']
+        msg['From'] = current_app.config['MAIL_DEFAULT_SENDER'] or current_app.config['MAIL_USERNAME']
         
         # Convert body to HTML if it's plain text
         html_body = body.replace('\n', '<br>')
@@ -299,18 +1408,18 @@ def send_email_to_subscribers(subject, body):
         bcc_list = [sub['email'] for sub in subscribers]
         
         # Connect to SMTP server
-        if app.config['MAIL_USE_SSL']:
-            server = smtplib.SMTP_SSL(app.config['MAIL_SERVER'], app.config['MAIL_PORT'])
+        if current_app.config['MAIL_USE_SSL']:
+            server = smtplib.SMTP_SSL(current_app.config['MAIL_SERVER'], current_app.config['MAIL_PORT'])
         else:
-            server = smtplib.SMTP(app.config['MAIL_SERVER'], app.config['MAIL_PORT'])
-            if app.config['MAIL_USE_TLS']:
+            server = smtplib.SMTP(current_app.config['MAIL_SERVER'], current_app.config['MAIL_PORT'])
+            if current_app.config['MAIL_USE_TLS']:
                 server.starttls()
         
-        server.login(app.config['MAIL_USERNAME'], app.config['MAIL_PASSWORD'])
+        server.login(current_app.config['MAIL_USERNAME'], current_app.config['MAIL_PASSWORD'])
         
         # Send to each subscriber (using BCC in sendmail)
         server.sendmail(
-            app.config['MAIL_DEFAULT_SENDER'] or app.config['MAIL_USERNAME'],
+            current_app.config['MAIL_DEFAULT_SENDER'] or current_app.config['MAIL_USERNAME'],
             bcc_list,
             msg.as_string()
         )
@@ -330,78 +1439,85 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def refresh_static_export(article_ids=(), about=False):
+    """Re-render the exported pages showing changed articles (or the about page)"""
+    out_dir = current_app.config['STATIC_EXPORT_DIR']
+    if not out_dir:
+        return
+    try:
+        static_export.export_site(current_app._get_current_object(), out_dir, list(article_ids), about)
+    except Exception:
+        # The change is saved; the next export picks it up
+        current_app.logger.exception('Updating the static export failed')
+
 # Routes
 
-@app.route('/')
+@route('/')
 def home():
     """Home page with logo, description, and latest articles carousel"""
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT * FROM articles 
+    cursor.execute(f'''
+        SELECT {ARTICLE_SUMMARY_COLUMNS} FROM articles
         ORDER BY published_date DESC 
         LIMIT 10
     ''')
-    articles = cursor.fetchall()
+    articles = fetch_article_summaries(cursor)
     conn.close()
-    return render_template('home.html', articles=articles)
+    remember_preload_images([article.cover_url for article in articles[:PRELOAD_HOME_COVERS]])
+    return render_template('home.html', articles=articles, eager_covers=PRELOAD_HOME_COVERS)
 
-@app.route('/songbird-magazine')
+@route('/songbird-magazine')
 def songbird_magazine():
     """Category page for Songbird Magazine"""
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT * FROM articles 
+    cursor.execute(f'''
+        SELECT {ARTICLE_SUMMARY_COLUMNS} FROM articles
         WHERE category = 'Songbird Magazine'
         ORDER BY published_date DESC
     ''')
-    articles = cursor.fetchall()
+    articles = fetch_article_summaries(cursor)
     conn.close()
     return render_template('category.html', articles=articles, category='Songbird Magazine')
 
-@app.route('/angsty-entries')
+@route('/angsty-entries')
 def angsty_entries():
     """Category page for Angsty Entries"""
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT * FROM articles 
+    cursor.execute(f'''
+        SELECT {ARTICLE_SUMMARY_COLUMNS} FROM articles
         WHERE category = 'Angsty Entries'
         ORDER BY published_date DESC
     ''')
-    articles = cursor.fetchall()
+    articles = fetch_article_summaries(cursor)
     conn.close()
     return render_template('category.html', articles=articles, category='Angsty Entries')
 
-@app.route('/quick-reads')
+@route('/quick-reads')
 def quick_reads():
     """Category page for Quick Reads"""
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT * FROM articles 
+    cursor.execute(f'''
+        SELECT {ARTICLE_SUMMARY_COLUMNS} FROM articles
         WHERE category = 'Quick Reads'
         ORDER BY published_date DESC
     ''')
-    articles = cursor.fetchall()
+    articles = fetch_article_summaries(cursor)
     conn.close()
     return render_template('category.html', articles=articles, category='Quick Reads')
 
-@app.route('/archive')
+@route('/archive')
 def archive():
     """Complete archive page"""
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT * FROM articles 
+    return render_listing('archive.html', f'''
+        SELECT {ARTICLE_SUMMARY_COLUMNS} FROM articles
         ORDER BY published_date DESC
     ''')
-    articles = cursor.fetchall()
-    conn.close()
-    return render_template('archive.html', articles=articles)
 
-@app.route('/about')
+@route('/about')
 def about():
     """About the Author page"""
     conn = get_db()
@@ -420,7 +1536,122 @@ def about():
     
     return render_template('about.html', about_data=about_data)
 
-@app.route('/subscribe', methods=['GET', 'POST'])
+# Articles listed in /feed.xml
+FEED_ARTICLES = 20
+
+# Seconds feed readers and crawlers may reuse the feed and sitemap before revalidating
+DOCUMENT_MAX_AGE = 300
+
+# Public pages listed in the sitemap besides the articles
+SITEMAP_PAGES = ('home', 'songbird_magazine', 'angsty_entries', 'quick_reads', 'archive', 'about')
+
+def absolute_url(endpoint, **values):
+    """External URL of an endpoint, on SITE_URL when it is set.
+
+    Without SITE_URL the host is the one the request being served came in
+    on, so only admin saves may build stored documents that way.
+    """
+    site_url = current_app.config['SITE_URL']
+    if not site_url:
+        return url_for(endpoint, _external=True, **values)
+    return site_url.rstrip('/') + url_for(endpoint, _external=False, **values)
+
+def build_documents(conn):
+    """Render the feed and the sitemap (split when long) as {name: bytes}"""
+    cursor = conn.execute(f'''
+        SELECT {ARTICLE_SUMMARY_COLUMNS} FROM articles
+        ORDER BY published_date DESC
+        LIMIT ?
+    ''', (FEED_ARTICLES,))
+    documents = {'feed.xml': feeds.build_feed(
+        'Twenty-Something Year Old Journalist', absolute_url('home'), absolute_url('feed'),
+        'New articles from the Twenty-Something Year Old Journalist blog',
+        ((row['title'], absolute_url('article_detail', slug=row['slug']), row['published_date'],
+          listing_summary(row['short_summary'], row['excerpt'])) for row in cursor),
+    )}
+    
+    def entries():
+        for endpoint in SITEMAP_PAGES:
+            yield absolute_url(endpoint), None
+        for row in conn.execute('SELECT slug, published_date FROM articles ORDER BY published_date DESC'):
+            yield absolute_url('article_detail', slug=row['slug']), row['published_date']
+    
+    documents.update(feeds.build_sitemaps(entries(), lambda number: absolute_url('sitemap_part', number=number)))
+    return documents
+
+def rebuild_documents(conn):
+    """Regenerate the stored feed and sitemaps; call in the admin save that changes the articles they list.
+
+    A document whose bytes come out the same keeps its ETag and
+    Last-Modified, so pollers keep getting 304s.
+    """
+    documents = build_documents(conn)
+    now = datetime.now(timezone.utc).replace(microsecond=0, tzinfo=None).isoformat()
+    conn.executemany('''
+        INSERT INTO generated_documents (name, body, etag, last_modified) VALUES (?, ?, ?, ?)
+        ON CONFLICT (name) DO UPDATE SET body = excluded.body, etag = excluded.etag, last_modified = excluded.last_modified
+        WHERE etag != excluded.etag
+    ''', [(name, body, hashlib.sha256(body).hexdigest()[:32], now) for name, body in documents.items()])
+    conn.execute('DELETE FROM generated_documents WHERE name NOT IN (SELECT value FROM json_each(?))',
+                 (json.dumps(list(documents)),))
+
+def rebuild_site_documents():
+    """Regenerate the stored feed and sitemaps outside a request, linking to SITE_URL"""
+    # absolute_url() only takes paths from url_for() when SITE_URL is set
+    with current_app.test_request_context():
+        write_transaction(rebuild_documents)
+
+def serve_document(name, mimetype):
+    """Serve a stored document, answering conditional requests without reading its body"""
+    conn = get_db()
+    query = 'SELECT etag, last_modified FROM generated_documents WHERE name = ?'
+    row = conn.execute(query, (name,)).fetchone()
+    # Built by admin saves and `flask build-documents` only, never by whoever asks first
+    if row is None:
+        conn.close()
+        abort(404)
+    
+    etag = row['etag']
+    last_modified = datetime.fromisoformat(row['last_modified']).replace(tzinfo=timezone.utc)
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        conn.close()
+        response = current_app.response_class(status=304)
+    else:
+        state = get_state()
+        cached = state.documents.get(name)
+        if cached is None or cached[0] != etag:
+            body = conn.execute('SELECT body FROM generated_documents WHERE name = ? AND etag = ?',
+                                (name, etag)).fetchone()
+            if body is None:
+                # Rebuilt by another worker since the first read
+                conn.close()
+                return serve_document(name, mimetype)
+            cached = state.documents[name] = (etag, bytes(body['body']))
+        conn.close()
+        response = current_app.response_class(cached[1], mimetype=mimetype)
+    
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.public = True
+    response.cache_control.max_age = DOCUMENT_MAX_AGE
+    return response
+
+@route('/feed.xml')
+def feed():
+    """RSS feed of the latest articles"""
+    return serve_document('feed.xml', 'application/rss+xml')
+
+@route('/sitemap.xml')
+def sitemap():
+    """Sitemap of the public pages, or an index of sitemap parts for large sites"""
+    return serve_document('sitemap.xml', 'application/xml')
+
+@route('/sitemap-<int:number>.xml')
+def sitemap_part(number):
+    """One part of a sitemap split at feeds.SITEMAP_MAX_URLS"""
+    return serve_document(f'sitemap-{number}.xml', 'application/xml')
+
+@route('/subscribe', methods=['GET', 'POST'])
 def subscribe():
     """Subscribe page"""
     if request.method == 'POST':
@@ -435,33 +1666,101 @@ def subscribe():
             flash('Please enter a valid email address.', 'error')
             return render_template('subscribe.html')
         
-        conn = get_db()
-        cursor = conn.cursor()
+        # One statement decides new versus existing: RETURNING yields the id only
+        # when a row was inserted. Concurrent signups are committed in batches.
+        rows = write('''
+            INSERT INTO subscribers (email, name) VALUES (?, ?)
+            ON CONFLICT (email) DO NOTHING
+            RETURNING id
+        ''', (email, name if name else None))
         
-        # Check if email already exists
-        cursor.execute('SELECT id FROM subscribers WHERE email = ?', (email,))
-        existing = cursor.fetchone()
-        
-        if existing:
-            conn.close()
+        if not rows:
             flash('You\'re already subscribed!', 'info')
             return render_template('subscribe.html', subscribed=True, existing=True)
         
-        # Insert new subscriber
-        try:
-            cursor.execute('INSERT INTO subscribers (email, name) VALUES (?, ?)', (email, name if name else None))
-            conn.commit()
-            conn.close()
-            flash('Thanks for subscribing!', 'success')
-            return render_template('subscribe.html', subscribed=True, existing=False)
-        except sqlite3.IntegrityError:
-            conn.close()
-            flash('You\'re already subscribed!', 'info')
-            return render_template('subscribe.html', subscribed=True, existing=True)
+        flash('Thanks for subscribing!', 'success')
+        return render_template('subscribe.html', subscribed=True, existing=False)
     
     return render_template('subscribe.html')
 
-@app.route('/article/<slug>')
+COMMENTS_PER_PAGE = 20
+
+def fetch_comments_page(conn, article_id, after=None):
+    """A page of approved comments, newest first, and the cursor of the next page.
+
+    Walks idx_comments_article_approved_created, so no sort is needed however
+    many comments the article has.
+    """
+    query = '''
+        SELECT id, display_name, content, created_at FROM comments
+        WHERE article_id = ? AND is_approved = 1
+    '''
+    params = (article_id,)
+    if after:
+        query += ' AND (created_at, id) < (?, ?)'
+        params += after
+    query += ' ORDER BY created_at DESC, id DESC LIMIT ?'
+    rows = conn.execute(query, params + (COMMENTS_PER_PAGE + 1,)).fetchall()
+    comments = [dict(row) for row in rows[:COMMENTS_PER_PAGE]]
+    next_cursor = keyset_cursor(comments[-1]) if len(rows) > COMMENTS_PER_PAGE else None
+    return comments, next_cursor
+
+def get_first_comments(conn, article):
+    """(approved comment count, first page, next cursor) for an article, cached per version.
+
+    The cache key includes articles.comments_version, which every change to
+    the article's comments increments, so all workers see changes at once.
+    """
+    key = (article['id'], article['comments_version'])
+    state = get_state()
+    with state.lock:
+        cached = state.comment_cache.get(key)
+        if cached is not None:
+            state.comment_cache.move_to_end(key)
+            return cached
+    
+    count = conn.execute('SELECT COUNT(*) FROM comments WHERE article_id = ? AND is_approved = 1',
+                         (article['id'],)).fetchone()[0]
+    comments, next_cursor = fetch_comments_page(conn, article['id'])
+    cached = (count, comments, next_cursor)
+    with state.lock:
+        state.comment_cache[key] = cached
+        while len(state.comment_cache) > current_app.config['COMMENT_CACHE_SIZE']:
+            state.comment_cache.popitem(last=False)
+    return cached
+
+def invalidate_comments(conn, article_id):
+    """Mark an article's comments as changed; call inside the transaction that changes them"""
+    conn.execute('UPDATE articles SET comments_version = comments_version + 1 WHERE id = ?', (article_id,))
+    state = get_state()
+    with state.lock:
+        for key in [key for key in state.comment_cache if key[0] == article_id]:
+            del state.comment_cache[key]
+
+def get_article_body(conn, article):
+    """The compiled body of an article (its editor HTML if it was never compiled).
+
+    Decompressed bodies are kept in an LRU of BODY_CACHE_SIZE characters,
+    keyed by articles.body_version, which every save increments.
+    """
+    key = (article['id'], article['body_version'])
+    state = get_state()
+    body = state.body_cache.get(key)
+    if body is None:
+        body = bodies.load(conn, article['id'])
+        if body is None:
+            body = bodies.load(conn, article['id'], 'source') or ''
+        state.body_cache.put(key, body, current_app.config['BODY_CACHE_SIZE'])
+    return body
+
+def get_like_state(conn, article_id, viewer_token):
+    """(like count, whether this viewer liked it) for an article"""
+    like_count = conn.execute('SELECT COUNT(*) FROM likes WHERE article_id = ?', (article_id,)).fetchone()[0]
+    has_liked = conn.execute('SELECT id FROM likes WHERE article_id = ? AND viewer_token = ?',
+                             (article_id, viewer_token)).fetchone() is not None
+    return like_count, has_liked
+
+@route('/article/<slug>')
 def article_detail(slug):
     """Article detail page"""
     conn = get_db()
@@ -474,40 +1773,71 @@ def article_detail(slug):
         flash('Article not found.', 'error')
         return redirect(url_for('home'))
     
-    article_id = article['id']
+    remember_preload_images([image_url(article['cover_image_filename'])])
+    body = get_article_body(conn, article)
     
-    # Get likes count
-    cursor.execute('SELECT COUNT(*) as count FROM likes WHERE article_id = ?', (article_id,))
-    like_count = cursor.fetchone()['count']
+    if request.environ.get(static_export.ENVIRON_KEY):
+        # The same file is served to every reader, who fetches likes and comments from article_state
+        conn.close()
+        return render_template('article.html', article=article, body=body, static_page=True)
     
-    # Check if current viewer has liked
+    article_id = article['id']
     viewer_token = get_or_create_viewer_token()
-    cursor.execute('SELECT id FROM likes WHERE article_id = ? AND viewer_token = ?', (article_id, viewer_token))
-    has_liked = cursor.fetchone() is not None
+    like_count, has_liked = get_like_state(conn, article_id, viewer_token)
     
-    # Get approved comments (newest first)
-    cursor.execute('''
-        SELECT * FROM comments 
-        WHERE article_id = ? AND is_approved = 1
-        ORDER BY created_at DESC
-    ''', (article_id,))
-    comments = cursor.fetchall()
+    # First page of approved comments (newest first); the rest load on demand
+    comment_count, comments, next_comments_cursor = get_first_comments(conn, article)
     
     conn.close()
     
     # Create response and set cookie if needed
     response = make_response(render_template('article.html', 
         article=article, 
+        body=body,
         like_count=like_count, 
         has_liked=has_liked,
-        comments=comments))
+        comments=comments,
+        comment_count=comment_count,
+        next_comments_cursor=next_comments_cursor))
     
     if not request.cookies.get('viewer_token'):
         response = set_viewer_token_cookie(response, viewer_token)
     
     return response
 
-@app.route('/article/<slug>/like', methods=['POST'])
+@route('/article/<slug>/state')
+def article_state(slug):
+    """JSON likes and first page of comments for an article page from the static export"""
+    conn = get_db()
+    article = conn.execute('SELECT id, comments_version FROM articles WHERE slug = ?', (slug,)).fetchone()
+    if not article:
+        conn.close()
+        return jsonify({'error': 'Article not found'}), 404
+    viewer_token = get_or_create_viewer_token()
+    like_count, has_liked = get_like_state(conn, article['id'], viewer_token)
+    comment_count, comments, next_cursor = get_first_comments(conn, article)
+    conn.close()
+    
+    response = jsonify({'like_count': like_count, 'has_liked': has_liked, 'comment_count': comment_count,
+                        'comments': comments, 'next_cursor': next_cursor})
+    if not request.cookies.get('viewer_token'):
+        response = set_viewer_token_cookie(response, viewer_token)
+    return response
+
+@route('/article/<slug>/comments')
+def article_comments(slug):
+    """JSON page of approved comments older than the `after` cursor"""
+    after = parse_keyset_cursor(request.args.get('after', ''))
+    conn = get_db()
+    article = conn.execute('SELECT id FROM articles WHERE slug = ?', (slug,)).fetchone()
+    if not article:
+        conn.close()
+        return jsonify({'error': 'Article not found'}), 404
+    comments, next_cursor = fetch_comments_page(conn, article['id'], after)
+    conn.close()
+    return jsonify({'comments': comments, 'next_cursor': next_cursor})
+
+@route('/article/<slug>/like', methods=['POST'])
 def toggle_like(slug):
     """Toggle like for an article"""
     conn = get_db()
@@ -522,34 +1852,26 @@ def toggle_like(slug):
         return jsonify({'error': 'Article not found'}), 404
     
     article_id = article['id']
+    conn.close()
     viewer_token = get_or_create_viewer_token()
     
-    # Check if already liked
-    cursor.execute('SELECT id FROM likes WHERE article_id = ? AND viewer_token = ?', (article_id, viewer_token))
-    existing_like = cursor.fetchone()
-    
-    if existing_like:
-        # Remove like
-        cursor.execute('DELETE FROM likes WHERE article_id = ? AND viewer_token = ?', (article_id, viewer_token))
-        has_liked = False
-    else:
-        # Add like
-        cursor.execute('INSERT INTO likes (article_id, viewer_token) VALUES (?, ?)', (article_id, viewer_token))
-        has_liked = True
-    
-    # Get updated count
-    cursor.execute('SELECT COUNT(*) as count FROM likes WHERE article_id = ?', (article_id,))
-    like_count = cursor.fetchone()['count']
+    def toggle(conn):
+        # Remove the like if there was one, otherwise add it, then count
+        removed = conn.execute('DELETE FROM likes WHERE article_id = ? AND viewer_token = ? RETURNING id',
+                               (article_id, viewer_token)).fetchall()
+        if not removed:
+            conn.execute('INSERT INTO likes (article_id, viewer_token) VALUES (?, ?)', (article_id, viewer_token))
+        like_count = conn.execute('SELECT COUNT(*) FROM likes WHERE article_id = ?', (article_id,)).fetchone()[0]
+        return not removed, like_count
     
-    conn.commit()
-    conn.close()
+    has_liked, like_count = write_transaction(toggle)
     
     response = jsonify({'has_liked': has_liked, 'like_count': like_count})
     if not request.cookies.get('viewer_token'):
         response = set_viewer_token_cookie(response, viewer_token)
     return response
 
-@app.route('/article/<slug>/comment', methods=['POST'])
+@route('/article/<slug>/comment', methods=['POST'])
 def post_comment(slug):
     """Post a comment on an article"""
     conn = get_db()
@@ -613,6 +1935,7 @@ def post_comment(slug):
         conn.close()
         flash('Name is too long. Maximum 40 characters.', 'error')
         return redirect(url_for('article_detail', slug=slug))
+    conn.close()
     
     # Set default name if empty
     if not display_name:
@@ -622,16 +1945,22 @@ def post_comment(slug):
     display_name = html.escape(display_name)
     content = html.escape(content)
     
-    # Insert comment
-    cursor.execute('''
-        INSERT INTO comments (article_id, display_name, content, is_approved)
-        VALUES (?, ?, ?, 1)
-    ''', (article_id, display_name, content))
+    # Insert comment, held for moderation if the site asks for it
+    approval_required = current_app.config['COMMENTS_REQUIRE_APPROVAL']
     
-    conn.commit()
-    conn.close()
+    def insert_comment(conn):
+        conn.execute('''
+            INSERT INTO comments (article_id, display_name, content, is_approved, viewer_token)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (article_id, display_name, content, 0 if approval_required else 1, viewer_token))
+        invalidate_comments(conn, article_id)
+    
+    write_transaction(insert_comment)
     
-    flash('Comment posted successfully!', 'success')
+    if approval_required:
+        flash('Thanks! Your comment will appear once it has been approved.', 'success')
+    else:
+        flash('Comment posted successfully!', 'success')
     response = redirect(url_for('article_detail', slug=slug))
     if not request.cookies.get('viewer_token'):
         response = set_viewer_token_cookie(response, viewer_token)
@@ -639,12 +1968,12 @@ def post_comment(slug):
 
 # Admin routes
 
-@app.route('/admin/login', methods=['GET', 'POST'])
+@route('/admin/login', methods=['GET', 'POST'])
 def admin_login():
     """Admin login page"""
     if request.method == 'POST':
         password = request.form.get('password')
-        if password == 'kyleekallick2002':
+        if password == current_app.config['ADMIN_PASSWORD']:
             session['admin_logged_in'] = True
             flash('Successfully logged in!', 'success')
             return redirect(url_for('admin_dashboard'))
@@ -653,25 +1982,21 @@ def admin_login():
     
     return render_template('admin_login.html')
 
-@app.route('/admin/logout')
+@route('/admin/logout')
 def admin_logout():
     """Admin logout"""
     session.pop('admin_logged_in', None)
     flash('Successfully logged out.', 'success')
     return redirect(url_for('home'))
 
-@app.route('/admin')
+@route('/admin')
 @admin_required
 def admin_dashboard():
     """Admin dashboard"""
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM articles ORDER BY published_date DESC')
-    articles = cursor.fetchall()
-    conn.close()
-    return render_template('admin_dashboard.html', articles=articles)
+    return render_listing('admin_dashboard.html',
+                          f'SELECT {ARTICLE_SUMMARY_COLUMNS} FROM articles ORDER BY published_date DESC')
 
-@app.route('/admin/new', methods=['GET', 'POST'])
+@route('/admin/new', methods=['GET', 'POST'])
 @admin_required
 def admin_new_article():
     """Create new article"""
@@ -687,39 +2012,42 @@ def admin_new_article():
         if 'cover_image' in request.files:
             file = request.files['cover_image']
             if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                filename = f"{timestamp}_{filename}"
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                file.save(filepath)
-                cover_image_filename = filename
-        
-        slug = generate_slug(title)
-        
-        # Ensure slug is unique
-        conn = get_db()
-        cursor = conn.cursor()
-        counter = 1
-        original_slug = slug
-        while True:
-            cursor.execute('SELECT id FROM articles WHERE slug = ?', (slug,))
-            if cursor.fetchone():
-                slug = f"{original_slug}-{counter}"
-                counter += 1
-            else:
-                break
+                saved = save_upload(file)
+                if saved:
+                    cover_image_filename = saved
+                else:
+                    flash('The cover image was not a valid image and was ignored.', 'error')
         
         short_summary = request.form.get('short_summary', 'Short summary of the article will go here eventually').strip()
         if not short_summary:
             short_summary = 'Short summary of the article will go here eventually'
         
-        cursor.execute('''
-            INSERT INTO articles (title, slug, author_name, category, published_date, cover_image_filename, content_html, short_summary)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (title, slug, author_name, category, published_date, cover_image_filename, content_html, short_summary))
+        compiled = compile_article_content(content_html)
+        cover_color, cover_preview = cover_placeholder(cover_image_filename)
         
-        conn.commit()
-        conn.close()
+        def insert_article(conn):
+            # Ensure slug is unique
+            slug = generate_slug(title)
+            counter = 1
+            original_slug = slug
+            while conn.execute('SELECT id FROM articles WHERE slug = ?', (slug,)).fetchone():
+                slug = f"{original_slug}-{counter}"
+                counter += 1
+            
+            article_id = conn.execute('''
+                INSERT INTO articles (title, slug, author_name, category, published_date, cover_image_filename, short_summary,
+                                      excerpt, reading_minutes, cover_color, cover_preview)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (title, slug, author_name, category, published_date, cover_image_filename, short_summary,
+                  compiled.excerpt, compiled.reading_minutes, cover_color, cover_preview)).lastrowid
+            bodies.store(conn, article_id, content_html, compiled.html)
+            # A new article has no earlier body for record_revision() to keep as a baseline
+            revisions.record(conn, article_id, title, content_html)
+            rebuild_documents(conn)
+            return article_id
+        
+        article_id = write_transaction(insert_article)
+        refresh_static_export([article_id])
         
         # Handle email to subscribers if requested
         send_email = request.form.get('send_email_to_subscribers') == 'on'
@@ -741,7 +2069,7 @@ def admin_new_article():
     
     return render_template('admin_new.html')
 
-@app.route('/admin/preview', methods=['POST'])
+@route('/admin/preview', methods=['POST'])
 @admin_required
 def admin_preview_article():
     """Preview article before saving"""
@@ -758,12 +2086,11 @@ def admin_preview_article():
     if 'cover_image' in request.files:
         file = request.files['cover_image']
         if file and file.filename and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"{timestamp}_{filename}"
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            cover_image_filename = filename
+            cover_image_filename = save_upload(file, preview=True) or cover_image_filename
+            expire_preview_uploads(current_app.config['PREVIEW_UPLOAD_MAX_AGE'])
+    
+    compiled = compile_article_content(content_html)
+    cover_color, cover_preview = cover_placeholder(cover_image_filename)
     
     # Create a mock article object for preview
     preview_article = {
@@ -774,17 +2101,21 @@ def admin_preview_article():
         'category': category,
         'published_date': published_date,
         'cover_image_filename': cover_image_filename,
-        'content_html': content_html,
+        'cover_color': cover_color,
+        'cover_preview': cover_preview,
+        'reading_minutes': compiled.reading_minutes,
         'short_summary': short_summary
     }
     
     return render_template('article.html', 
                          article=preview_article,
+                         body=compiled.html,
                          like_count=0,
                          has_liked=False,
-                         comments=[])
+                         comments=[],
+                         comment_count=0)
 
-@app.route('/admin/edit/<int:article_id>', methods=['GET', 'POST'])
+@route('/admin/edit/<int:article_id>', methods=['GET', 'POST'])
 @admin_required
 def admin_edit_article(article_id):
     """Edit existing article"""
@@ -802,42 +2133,56 @@ def admin_edit_article(article_id):
             short_summary = 'Short summary of the article will go here eventually'
         
         # Handle cover image upload (optional)
-        cursor.execute('SELECT cover_image_filename FROM articles WHERE id = ?', (article_id,))
+        cursor.execute('''
+            SELECT title, slug, published_date, short_summary, excerpt, cover_image_filename, cover_color, cover_preview
+            FROM articles WHERE id = ?
+        ''', (article_id,))
         existing = cursor.fetchone()
         cover_image_filename = existing['cover_image_filename']
         
         if 'cover_image' in request.files:
             file = request.files['cover_image']
             if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                filename = f"{timestamp}_{filename}"
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                file.save(filepath)
-                cover_image_filename = filename
+                saved = save_upload(file)
+                if saved:
+                    cover_image_filename = saved
+                else:
+                    flash('The cover image was not a valid image and was ignored.', 'error')
         
-        slug = generate_slug(title)
+        conn.close()
         
-        # Ensure slug is unique (except for current article)
-        counter = 1
-        original_slug = slug
-        while True:
-            cursor.execute('SELECT id FROM articles WHERE slug = ? AND id != ?', (slug, article_id))
-            if cursor.fetchone():
+        compiled = compile_article_content(content_html)
+        cover_color, cover_preview = existing['cover_color'], existing['cover_preview']
+        if cover_image_filename != existing['cover_image_filename']:
+            cover_color, cover_preview = cover_placeholder(cover_image_filename)
+        
+        def update_article(conn):
+            # Ensure slug is unique (except for current article)
+            slug = generate_slug(title)
+            counter = 1
+            original_slug = slug
+            while conn.execute('SELECT id FROM articles WHERE slug = ? AND id != ?', (slug, article_id)).fetchone():
                 slug = f"{original_slug}-{counter}"
                 counter += 1
-            else:
-                break
+            
+            record_revision(conn, article_id, title, content_html)
+            conn.execute('''
+                UPDATE articles 
+                SET title = ?, slug = ?, author_name = ?, category = ?, published_date = ?, 
+                    cover_image_filename = ?, short_summary = ?,
+                    excerpt = ?, reading_minutes = ?, cover_color = ?, cover_preview = ?, body_version = body_version + 1
+                WHERE id = ?
+            ''', (title, slug, author_name, category, published_date, cover_image_filename, short_summary,
+                  compiled.excerpt, compiled.reading_minutes, cover_color, cover_preview, article_id))
+            bodies.store(conn, article_id, content_html, compiled.html)
+            # The feed and sitemap only show these fields; a body edit leaves them as they are
+            listed = (title, slug, published_date, listing_summary(short_summary, compiled.excerpt))
+            if listed != (existing['title'], existing['slug'], existing['published_date'],
+                          listing_summary(existing['short_summary'], existing['excerpt'])):
+                rebuild_documents(conn)
         
-        cursor.execute('''
-            UPDATE articles 
-            SET title = ?, slug = ?, author_name = ?, category = ?, published_date = ?, 
-                cover_image_filename = ?, content_html = ?, short_summary = ?
-            WHERE id = ?
-        ''', (title, slug, author_name, category, published_date, cover_image_filename, content_html, short_summary, article_id))
-        
-        conn.commit()
-        conn.close()
+        write_transaction(update_article)
+        refresh_static_export([article_id])
         
         # Handle email to subscribers if requested
         send_email = request.form.get('send_email_to_subscribers') == 'on'
@@ -859,6 +2204,9 @@ def admin_edit_article(article_id):
     
     cursor.execute('SELECT * FROM articles WHERE id = ?', (article_id,))
     article = cursor.fetchone()
+    if article:
+        article = dict(article, content_html=bodies.load(conn, article_id, 'source'),
+                       short_summary=article['short_summary'] or DEFAULT_SUMMARY)
     conn.close()
     
     if not article:
@@ -867,7 +2215,84 @@ def admin_edit_article(article_id):
     
     return render_template('admin_edit.html', article=article)
 
-@app.route('/admin/upload_image', methods=['POST'])
+def record_revision(conn, article_id, title, content_html):
+    """Add a save of an article to its history; call it before the body is replaced"""
+    if revisions.latest(conn, article_id) is None:
+        # The first save since history was kept: the body it replaces goes first
+        current = conn.execute('SELECT title FROM articles WHERE id = ?', (article_id,)).fetchone()
+        source = bodies.load(conn, article_id, 'source')
+        if current is not None and source is not None:
+            revisions.record(conn, article_id, current['title'], source, baseline=True)
+    revisions.record(conn, article_id, title, content_html)
+
+@route('/admin/edit/<int:article_id>/revisions')
+@admin_required
+def admin_revisions(article_id):
+    """Saved revisions of an article"""
+    conn = get_db()
+    article = conn.execute('SELECT id, title, slug FROM articles WHERE id = ?', (article_id,)).fetchone()
+    if not article:
+        conn.close()
+        flash('Article not found.', 'error')
+        return redirect(url_for('admin_dashboard'))
+    saved = revisions.list_revisions(conn, article_id)
+    conn.close()
+    return render_template('admin_revisions.html', article=article, revisions=saved)
+
+@route('/admin/edit/<int:article_id>/revisions/diff')
+@admin_required
+def admin_revision_diff(article_id):
+    """Changes between two revisions of an article (default: the latest and the one before)"""
+    conn = get_db()
+    article = conn.execute('SELECT id, title, slug FROM articles WHERE id = ?', (article_id,)).fetchone()
+    newest = revisions.latest(conn, article_id)
+    if not article or newest is None:
+        conn.close()
+        flash('This article has no revisions.', 'error')
+        return redirect(url_for('admin_dashboard'))
+    new_number = request.args.get('b', newest['number'], type=int)
+    old_number = request.args.get('a', type=int)
+    if old_number is None:
+        old_number = revisions.previous_number(conn, article_id, new_number)
+    old = revisions.rebuild(conn, article_id, old_number)
+    new = revisions.rebuild(conn, article_id, new_number)
+    conn.close()
+    if old is None or new is None:
+        flash('That revision does not exist.', 'error')
+        return redirect(url_for('admin_revisions', article_id=article_id))
+    return render_template('admin_revision_diff.html', article=article, old_number=old_number, new_number=new_number,
+                           hunks=revisions.diff(old, new))
+
+@route('/admin/edit/<int:article_id>/revisions/<int:number>/restore', methods=['POST'])
+@admin_required
+def admin_restore_revision(article_id, number):
+    """Make an earlier revision the body of an article, as a new revision"""
+    conn = get_db()
+    content_html = revisions.rebuild(conn, article_id, number)
+    conn.close()
+    if content_html is None:
+        flash('That revision does not exist.', 'error')
+        return redirect(url_for('admin_revisions', article_id=article_id))
+    compiled = compile_article_content(content_html)
+    
+    def restore_body(conn):
+        article = conn.execute('SELECT title, short_summary, excerpt FROM articles WHERE id = ?', (article_id,)).fetchone()
+        record_revision(conn, article_id, article['title'], content_html)
+        conn.execute('''
+            UPDATE articles SET excerpt = ?, reading_minutes = ?, body_version = body_version + 1 WHERE id = ?
+        ''', (compiled.excerpt, compiled.reading_minutes, article_id))
+        bodies.store(conn, article_id, content_html, compiled.html)
+        # The feed shows the excerpt of articles whose summary is the placeholder
+        if (listing_summary(article['short_summary'], compiled.excerpt)
+                != listing_summary(article['short_summary'], article['excerpt'])):
+            rebuild_documents(conn)
+    
+    write_transaction(restore_body)
+    refresh_static_export([article_id])
+    flash(f'Restored revision {number}.', 'success')
+    return redirect(url_for('admin_revisions', article_id=article_id))
+
+@route('/admin/upload_image', methods=['POST'])
 @admin_required
 def upload_image():
     """Handle image uploads from rich text editor"""
@@ -876,11 +2301,9 @@ def upload_image():
     
     file = request.files['image']
     if file and file.filename and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"{timestamp}_{filename}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        filename = save_upload(file)
+        if not filename:
+            return {'error': 'Not a supported image, or too large'}, 400
         
         # Return URL relative to static folder
         url = url_for('static', filename=f'uploads/{filename}')
@@ -888,7 +2311,7 @@ def upload_image():
     
     return {'error': 'Invalid file type'}, 400
 
-@app.route('/admin/edit-about', methods=['GET', 'POST'])
+@route('/admin/edit-about', methods=['GET', 'POST'])
 @admin_required
 def admin_edit_about():
     """Edit About the Author page"""
@@ -910,31 +2333,31 @@ def admin_edit_about():
         if 'author_photo' in request.files:
             file = request.files['author_photo']
             if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                filename = f"{timestamp}_{filename}"
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                file.save(filepath)
-                author_photo_filename = filename
+                saved = save_upload(file)
+                if saved:
+                    author_photo_filename = saved
+                else:
+                    flash('The photo was not a valid image and was ignored.', 'error')
         
-        # Check if about_page record exists
-        cursor.execute('SELECT id FROM about_page LIMIT 1')
-        exists = cursor.fetchone()
+        conn.close()
         
-        if exists:
-            cursor.execute('''
-                UPDATE about_page 
-                SET author_name = ?, author_photo_filename = ?, author_bio_text = ?
-                WHERE id = ?
-            ''', (author_name, author_photo_filename, author_bio_text, exists['id']))
-        else:
-            cursor.execute('''
-                INSERT INTO about_page (author_name, author_photo_filename, author_bio_text)
-                VALUES (?, ?, ?)
-            ''', (author_name, author_photo_filename, author_bio_text))
+        def save_about(conn):
+            # Check if about_page record exists
+            exists = conn.execute('SELECT id FROM about_page LIMIT 1').fetchone()
+            if exists:
+                conn.execute('''
+                    UPDATE about_page 
+                    SET author_name = ?, author_photo_filename = ?, author_bio_text = ?
+                    WHERE id = ?
+                ''', (author_name, author_photo_filename, author_bio_text, exists['id']))
+            else:
+                conn.execute('''
+                    INSERT INTO about_page (author_name, author_photo_filename, author_bio_text)
+                    VALUES (?, ?, ?)
+                ''', (author_name, author_photo_filename, author_bio_text))
         
-        conn.commit()
-        conn.close()
+        write_transaction(save_about)
+        refresh_static_export(about=True)
         
         flash('About page updated successfully!', 'success')
         return redirect(url_for('admin_dashboard'))
@@ -954,71 +2377,299 @@ def admin_edit_about():
     
     return render_template('admin_edit_about.html', about_data=about_data)
 
-@app.route('/admin/comments')
+MODERATION_PER_PAGE = 50
+
+MODERATION_ACTIONS = {
+    'approve': 'UPDATE comments SET is_approved = 1',
+    'unapprove': 'UPDATE comments SET is_approved = 0',
+    'delete': 'DELETE FROM comments',
+}
+
+def moderation_filter(values):
+    """WHERE conditions, parameters and the active filters from moderation form values.
+
+    Every combination is served by one of the comment indexes ending in
+    created_at, so pages come out in order without a sort.
+    """
+    conditions = []
+    params = []
+    filters = {}
+    article_id = values.get('article', '')
+    if article_id.isdigit():
+        conditions.append('article_id = ?')
+        params.append(int(article_id))
+        filters['article'] = article_id
+    viewer = values.get('viewer', '').strip()
+    status = values.get('status', '')
+    if status in ('pending', 'approved'):
+        # Unary + keeps the planner on the much narrower viewer index when both are given
+        conditions.append('+is_approved = ?' if viewer else 'is_approved = ?')
+        params.append(1 if status == 'approved' else 0)
+        filters['status'] = status
+    if viewer:
+        conditions.append('viewer_token = ?')
+        params.append(viewer)
+        filters['viewer'] = viewer
+    return conditions, params, filters
+
+@route('/admin/comments')
 @admin_required
 def admin_comments():
-    """Admin page to manage comments"""
+    """Admin moderation queue: comments newest first, filtered and a page at a time"""
+    conditions, params, filters = moderation_filter(request.args)
+    after = parse_keyset_cursor(request.args.get('after', ''))
+    if after:
+        conditions.append('(created_at, id) < (?, ?)')
+        params.extend(after)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT c.*, a.title, a.slug 
-        FROM comments c
-        JOIN articles a ON c.article_id = a.id
-        ORDER BY c.created_at DESC
-        LIMIT 100
-    ''')
+    # Page through comments alone so the index drives the order, then look up titles
+    cursor.execute(f'''
+        SELECT c.*, a.title, a.slug
+        FROM (
+            SELECT * FROM comments {where}
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+        ) c
+        LEFT JOIN articles a ON c.article_id = a.id
+        ORDER BY c.created_at DESC, c.id DESC
+    ''', params + [MODERATION_PER_PAGE + 1])
     comments = cursor.fetchall()
+    cursor.execute('SELECT id, title FROM articles ORDER BY published_date DESC')
+    articles = cursor.fetchall()
     conn.close()
-    return render_template('admin_comments.html', comments=comments)
+    
+    next_cursor = None
+    if len(comments) > MODERATION_PER_PAGE:
+        comments = comments[:MODERATION_PER_PAGE]
+        next_cursor = keyset_cursor(comments[-1])
+    
+    return render_template('admin_comments.html', comments=comments, articles=articles, filters=filters,
+                           next_cursor=next_cursor, first_page=after is None)
+
+@route('/admin/comments/bulk', methods=['POST'])
+@admin_required
+def admin_bulk_comments():
+    """Approve, unapprove or delete the selected comments, or all comments matching the filter"""
+    action = request.form.get('action')
+    conditions, params, filters = moderation_filter(request.form)
+    if action not in MODERATION_ACTIONS:
+        flash('Unknown moderation action.', 'error')
+        return redirect(url_for('admin_comments', **filters))
+    
+    if request.form.get('scope') == 'filter':
+        if not filters:
+            flash('Choose an article, status or viewer before acting on all matching comments.', 'error')
+            return redirect(url_for('admin_comments', **filters))
+    else:
+        ids = [int(value) for value in request.form.getlist('comment_ids') if value.isdigit()]
+        if not ids:
+            flash('No comments selected.', 'error')
+            return redirect(url_for('admin_comments', **filters))
+        conditions = ['id IN (SELECT value FROM json_each(?))']
+        params = [json.dumps(ids)]
+    
+    def moderate(conn):
+        rows = conn.execute(f"{MODERATION_ACTIONS[action]} WHERE {' AND '.join(conditions)} RETURNING article_id", params)
+        article_ids = [row['article_id'] for row in rows.fetchall()]
+        for article_id in set(article_ids):
+            invalidate_comments(conn, article_id)
+        return article_ids
+    
+    article_ids = write_transaction(moderate)
+    
+    past_tense = {'approve': 'Approved', 'unapprove': 'Unapproved', 'delete': 'Deleted'}[action]
+    flash(f'{past_tense} {len(article_ids)} comments.', 'success')
+    return redirect(url_for('admin_comments', **filters))
 
-@app.route('/admin/comments/delete/<int:comment_id>', methods=['POST'])
+@route('/admin/comments/delete/<int:comment_id>', methods=['POST'])
 @admin_required
 def admin_delete_comment(comment_id):
     """Delete a comment"""
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM comments WHERE id = ?', (comment_id,))
-    conn.commit()
-    conn.close()
+    def delete_comment(conn):
+        for deleted in conn.execute('DELETE FROM comments WHERE id = ? RETURNING article_id', (comment_id,)).fetchall():
+            invalidate_comments(conn, deleted['article_id'])
+    
+    write_transaction(delete_comment)
     flash('Comment deleted successfully.', 'success')
-    return redirect(url_for('admin_comments'))
+    # Posted from the moderation queue, which sends its current filters along
+    _, _, filters = moderation_filter(request.form)
+    return redirect(url_for('admin_comments', **filters))
+
+SUBSCRIBERS_PER_PAGE = 50
 
-@app.route('/admin/subscribers')
+# Sorts after any character, so `prefix <= value < prefix + PREFIX_END` matches values starting with prefix
+PREFIX_END = '\U0010ffff'
+
+def subscriber_search(search):
+    """WHERE condition and parameters matching emails or names that start with `search`.
+
+    Written as ranges so the email and name indexes are used, not a LIKE scan.
+    """
+    email = search.lower()
+    return ('(email >= ? AND email < ?) OR (name >= ? COLLATE NOCASE AND name < ? COLLATE NOCASE)',
+            (email, email + PREFIX_END, search, search + PREFIX_END))
+
+def spreadsheet_safe(value):
+    """Keep spreadsheet apps from running a cell as a formula"""
+    return "'" + value if value[:1] in ('=', '+', '-', '@') else value
+
+@route('/admin/subscribers')
 @admin_required
 def admin_subscribers():
-    """Admin page to view subscribers"""
+    """Admin page to view subscribers, newest first, a page at a time"""
+    search = request.args.get('q', '').strip()
+    after = parse_keyset_cursor(request.args.get('after', ''))
+    
+    conditions = []
+    params = ()
+    if search:
+        condition, params = subscriber_search(search)
+        conditions.append(f'({condition})')
+    if after:
+        conditions.append('(created_at, id) < (?, ?)')
+        params += after
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    
     conn = get_db()
     cursor = conn.cursor()
-    cursor.execute('SELECT * FROM subscribers ORDER BY created_at DESC')
+    cursor.execute(f'''
+        SELECT id, email, name, created_at FROM subscribers {where}
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?
+    ''', params + (SUBSCRIBERS_PER_PAGE + 1,))
     subscribers = cursor.fetchall()
+    cursor.execute('SELECT COUNT(*) FROM subscribers')
+    total = cursor.fetchone()[0]
     conn.close()
-    return render_template('admin_subscribers.html', subscribers=subscribers)
+    
+    # One row more than a page tells whether there is a next page
+    next_cursor = None
+    if len(subscribers) > SUBSCRIBERS_PER_PAGE:
+        subscribers = subscribers[:SUBSCRIBERS_PER_PAGE]
+        next_cursor = keyset_cursor(subscribers[-1])
+    
+    return render_template('admin_subscribers.html', subscribers=subscribers, total=total, search=search,
+                           next_cursor=next_cursor, first_page=after is None)
+
+@route('/admin/subscribers/import', methods=['POST'])
+@admin_required
+def admin_subscribers_import():
+    """Add subscribers from an uploaded CSV file"""
+    upload = request.files.get('csv_file')
+    if not upload or not upload.filename:
+        flash('Please choose a CSV file to import.', 'error')
+        return redirect(url_for('admin_subscribers'))
+    
+    # Large uploads are spooled to a temporary file, which is read as a stream
+    lines = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', errors='replace', newline='')
+    try:
+        result = import_subscribers(lines)
+    except csv.Error:
+        flash('That file could not be read as CSV.', 'error')
+        return redirect(url_for('admin_subscribers'))
+    
+    flash(f'Imported {result.inserted} new subscribers '
+          f'({result.duplicates} already subscribed, {result.invalid} invalid addresses skipped).', 'success')
+    return redirect(url_for('admin_subscribers'))
+
+@route('/admin/subscribers/export.csv')
+@admin_required
+def admin_subscribers_export():
+    """Download subscribers as CSV, written from the cursor while it is read"""
+    search = request.args.get('q', '').strip()
+    where, params = subscriber_search(search) if search else ('', ())
+    query = f'''
+        SELECT email, name, created_at FROM subscribers {'WHERE ' + where if where else ''}
+        ORDER BY created_at DESC, id DESC
+    '''
+    chunk_size = current_app.config['STREAM_CHUNK_SIZE']
+    
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(['email', 'name', 'subscribed_at'])
+        for row in iter_rows(query, params, replica=True):
+            writer.writerow([spreadsheet_safe(row['email']), spreadsheet_safe(row['name'] or ''), row['created_at']])
+            if buffer.tell() >= chunk_size:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    
+    response = current_app.response_class(stream_with_context(generate()), mimetype='text/csv')
+    response.headers['Content-Disposition'] = 'attachment; filename=subscribers.csv'
+    return response
+
+INTERN_USER_AGENT = '''
+    INSERT INTO user_agents (user_agent, is_bot) VALUES (?, ?)
+    ON CONFLICT (user_agent) DO UPDATE SET is_bot = excluded.is_bot
+    RETURNING id
+'''
+
+# Page views that count in analytics: not from a user agent classified as a bot
+HUMAN_PAGE_VIEWS = '(user_agent_id IS NULL OR user_agent_id NOT IN (SELECT id FROM user_agents WHERE is_bot = 1))'
+
+def tracking_user_agent(reported=None):
+    """The user agent to record for a tracking call.
+
+    That is what the page reported, unless the request itself came from a
+    bot: a script can put anything in the body.
+    """
+    header = useragents.normalize(request.headers.get('User-Agent'))
+    user_agent = useragents.normalize(reported) or header
+    if useragents.is_bot(header) and not useragents.is_bot(user_agent):
+        return header
+    return user_agent
+
+def drop_bot_event(user_agent):
+    """Whether to skip storing a tracking call: bots are kept only at BOT_SAMPLE_RATE"""
+    return useragents.is_bot(user_agent) and random.random() >= current_app.config['BOT_SAMPLE_RATE']
+
+def get_user_agent_id(user_agent):
+    """The id of a user agent in user_agents, added the first time it is seen"""
+    if user_agent is None:
+        return None
+    state = get_state()
+    with state.lock:
+        user_agent_id = state.user_agent_ids.get(user_agent)
+        if user_agent_id is not None:
+            state.user_agent_ids.move_to_end(user_agent)
+            return user_agent_id
+    
+    user_agent_id = write(INTERN_USER_AGENT, (user_agent, int(useragents.is_bot(user_agent))))[0]['id']
+    with state.lock:
+        state.user_agent_ids[user_agent] = user_agent_id
+        while len(state.user_agent_ids) > current_app.config['USER_AGENT_CACHE_SIZE']:
+            state.user_agent_ids.popitem(last=False)
+    return user_agent_id
 
 # Tracking endpoints
-@app.route('/track/view/start', methods=['POST'])
+@route('/track/view/start', methods=['POST'])
 def track_view_start():
     """Start tracking a page view"""
+    user_agent = tracking_user_agent(request.json.get('user_agent'))
+    if drop_bot_event(user_agent):
+        return jsonify({'view_id': None})
+    
     viewer_token = get_or_create_viewer_token()
     path = request.json.get('path', request.path)
     referrer = request.json.get('referrer', request.referrer)
-    user_agent = request.json.get('user_agent', request.headers.get('User-Agent'))
     
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO page_views (viewer_token, path, referrer, user_agent)
+    view_id = write('''
+        INSERT INTO page_views (viewer_token, path, referrer, user_agent_id)
         VALUES (?, ?, ?, ?)
-    ''', (viewer_token, path, referrer, user_agent))
-    view_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+        RETURNING id
+    ''', (viewer_token, path, referrer, get_user_agent_id(user_agent)))[0]['id']
     
     response = jsonify({'view_id': view_id})
     if not request.cookies.get('viewer_token'):
         response = set_viewer_token_cookie(response, viewer_token)
     return response
 
-@app.route('/track/view/end', methods=['POST'])
+@route('/track/view/end', methods=['POST'])
 def track_view_end():
     """End tracking a page view"""
     if not request.is_json:
@@ -1039,43 +2690,39 @@ def track_view_end():
     
     duration = min(max(int(duration), 0), 7200)  # Clamp 0-7200 seconds
     
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('''
+    write('''
         UPDATE page_views 
         SET duration_seconds = ?
         WHERE id = ?
     ''', (duration, view_id))
-    conn.commit()
-    conn.close()
     
     return jsonify({'success': True})
 
-@app.route('/track/article/start', methods=['POST'])
+@route('/track/article/start', methods=['POST'])
 def track_article_start():
     """Start tracking an article view"""
+    # Article views keep no user agent, so a sampled bot view could not be told apart: drop them all
+    if useragents.is_bot(tracking_user_agent()):
+        return jsonify({'view_id': None})
+    
     viewer_token = get_or_create_viewer_token()
     article_id = request.json.get('article_id')
     
     if not article_id:
         return jsonify({'error': 'article_id required'}), 400
     
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('''
+    view_id = write('''
         INSERT INTO article_views (article_id, viewer_token)
         VALUES (?, ?)
-    ''', (article_id, viewer_token))
-    view_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+        RETURNING id
+    ''', (article_id, viewer_token))[0]['id']
     
     response = jsonify({'view_id': view_id})
     if not request.cookies.get('viewer_token'):
         response = set_viewer_token_cookie(response, viewer_token)
     return response
 
-@app.route('/track/article/end', methods=['POST'])
+@route('/track/article/end', methods=['POST'])
 def track_article_end():
     """End tracking an article view"""
     if not request.is_json:
@@ -1095,19 +2742,15 @@ def track_article_end():
     
     duration = min(max(int(duration), 0), 7200)  # Clamp 0-7200 seconds
     
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('''
+    write('''
         UPDATE article_views 
         SET duration_seconds = ?
         WHERE id = ?
     ''', (duration, view_id))
-    conn.commit()
-    conn.close()
     
     return jsonify({'success': True})
 
-@app.route('/admin/email-config', methods=['GET', 'POST'])
+@route('/admin/email-config', methods=['GET', 'POST'])
 @admin_required
 def admin_email_config():
     """Admin page to configure email settings"""
@@ -1123,28 +2766,28 @@ def admin_email_config():
         mail_password = request.form.get('mail_password', '')
         mail_default_sender = request.form.get('mail_default_sender', '')
         
-        # Check if config exists
-        cursor.execute('SELECT id FROM email_config LIMIT 1')
-        existing = cursor.fetchone()
+        conn.close()
         
-        if existing:
-            cursor.execute('''
-                UPDATE email_config 
-                SET mail_server = ?, mail_port = ?, mail_use_tls = ?, mail_use_ssl = ?,
-                    mail_username = ?, mail_password = ?, mail_default_sender = ?
-                WHERE id = ?
-            ''', (mail_server, mail_port, mail_use_tls, mail_use_ssl, 
-                  mail_username, mail_password, mail_default_sender, existing['id']))
-        else:
-            cursor.execute('''
-                INSERT INTO email_config (mail_server, mail_port, mail_use_tls, mail_use_ssl,
-                                         mail_username, mail_password, mail_default_sender)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (mail_server, mail_port, mail_use_tls, mail_use_ssl,
-                  mail_username, mail_password, mail_default_sender))
+        def save_config(conn):
+            # Check if config exists
+            existing = conn.execute('SELECT id FROM email_config LIMIT 1').fetchone()
+            if existing:
+                conn.execute('''
+                    UPDATE email_config 
+                    SET mail_server = ?, mail_port = ?, mail_use_tls = ?, mail_use_ssl = ?,
+                        mail_username = ?, mail_password = ?, mail_default_sender = ?
+                    WHERE id = ?
+                ''', (mail_server, mail_port, mail_use_tls, mail_use_ssl, 
+                      mail_username, mail_password, mail_default_sender, existing['id']))
+            else:
+                conn.execute('''
+                    INSERT INTO email_config (mail_server, mail_port, mail_use_tls, mail_use_ssl,
+                                             mail_username, mail_password, mail_default_sender)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (mail_server, mail_port, mail_use_tls, mail_use_ssl,
+                      mail_username, mail_password, mail_default_sender))
         
-        conn.commit()
-        conn.close()
+        write_transaction(save_config)
         
         # Reload email config
         load_email_config()
@@ -1170,7 +2813,7 @@ def admin_email_config():
     
     return render_template('admin_email_config.html', config=config)
 
-@app.route('/admin/analytics')
+@route('/admin/analytics')
 @admin_required
 def admin_analytics():
     """Admin analytics dashboard"""
@@ -1178,7 +2821,8 @@ def admin_analytics():
     if days not in [30, 60, 90]:
         days = 60
     
-    conn = get_db()
+    # The joins over every view are the heaviest reads there are; a snapshot takes them off the live database
+    conn, snapshot_time = get_replica_db()
     cursor = conn.cursor()
     
     # Website views over time (last N days)
@@ -1186,6 +2830,7 @@ def admin_analytics():
         SELECT DATE(started_at) as date, COUNT(*) as count
         FROM page_views
         WHERE started_at >= datetime('now', '-{days} days')
+        AND {HUMAN_PAGE_VIEWS}
         GROUP BY DATE(started_at)
         ORDER BY date ASC
     ''')
@@ -1212,6 +2857,7 @@ def admin_analytics():
         FROM page_views
         WHERE duration_seconds IS NOT NULL
         AND started_at >= datetime('now', '-{days} days')
+        AND {HUMAN_PAGE_VIEWS}
     ''')
     time_stats = cursor.fetchone()
     
@@ -1250,17 +2896,72 @@ def admin_analytics():
                          article_stats=article_stats,
                          time_stats=time_stats,
                          article_time_stats=article_time_stats,
-                         days=days)
+                         days=days,
+                         snapshot_time=snapshot_time)
 
-if __name__ == '__main__':
-    init_db()
-    
-    # Reload email config after database is initialized
-    load_email_config()
-    
-    # Migrate existing articles to have short_summary if missing
+@route('/admin/metrics')
+@admin_required
+def admin_metrics():
+    """Admin page with request, SQL and template timings across all workers"""
+    histograms, profiles = collect_metrics()
+    
+    endpoint_stats = []
+    for (name, endpoint), histogram in histograms.items():
+        if name != 'request_duration_seconds':
+            continue
+        statements = histograms.get(('request_sql_statements', endpoint))
+        sql_time = histograms.get(('request_sql_duration_seconds', endpoint))
+        endpoint_stats.append({
+            'endpoint': endpoint,
+            'count': histogram.count,
+            'mean_ms': histogram.mean * 1000,
+            'p50_ms': histogram.quantile(0.5) * 1000,
+            'p95_ms': histogram.quantile(0.95) * 1000,
+            'p99_ms': histogram.quantile(0.99) * 1000,
+            'statements': statements.mean if statements else 0,
+            'sql_ms': sql_time.mean * 1000 if sql_time else 0,
+        })
+    endpoint_stats.sort(key=lambda row: row['mean_ms'] * row['count'], reverse=True)
+    
+    template_stats = []
+    for (name, template), histogram in histograms.items():
+        if name != 'template_render_seconds':
+            continue
+        template_stats.append({
+            'template': template,
+            'count': histogram.count,
+            'mean_ms': histogram.mean * 1000,
+            'p95_ms': histogram.quantile(0.95) * 1000,
+        })
+    template_stats.sort(key=lambda row: row['mean_ms'] * row['count'], reverse=True)
+    
+    return render_template('admin_metrics.html',
+                         endpoint_stats=endpoint_stats,
+                         template_stats=template_stats,
+                         profiles=profiles,
+                         sample_rate=current_app.config['PROFILE_SAMPLE_RATE'])
+
+@route('/admin/metrics/prometheus')
+def admin_metrics_prometheus():
+    """Metrics in the Prometheus text format, for the admin or a scraper holding METRICS_TOKEN"""
+    token = current_app.config['METRICS_TOKEN']
+    authorized = session.get('admin_logged_in') or (
+        token and request.headers.get('Authorization') == f'Bearer {token}')
+    if not authorized:
+        return 'Unauthorized', 401
+    
+    histograms, _ = collect_metrics()
+    response = make_response(metrics.render_prometheus(histograms))
+    response.mimetype = 'text/plain'
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    return response
+
+def seed_db():
+    """Apply data migrations and seed placeholder content into an empty database"""
     conn = get_db()
     cursor = conn.cursor()
+    
+    # Migrate existing articles to have short_summary if missing
     cursor.execute('UPDATE articles SET short_summary = ? WHERE short_summary IS NULL OR short_summary = ""', 
                    ('Short summary of the article will go here eventually',))
     conn.commit()
@@ -1334,13 +3035,15 @@ if __name__ == '__main__':
         for article in seed_articles:
             slug = generate_slug(article['title'])
             cursor.execute('''
-                INSERT INTO articles (title, slug, author_name, category, published_date, cover_image_filename, content_html, short_summary)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO articles (title, slug, author_name, category, published_date, cover_image_filename, short_summary)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
             ''', (article['title'], slug, article['author_name'], article['category'], 
-                  article['published_date'], article['cover_image_filename'], article['content_html'], 
+                  article['published_date'], article['cover_image_filename'], 
                   'Short summary of the article will go here eventually'))
+            bodies.store(conn, cursor.lastrowid, article['content_html'], None)
         
         conn.commit()
+        recompile_articles(only_missing=True)
         print("Database seeded with placeholder articles!")
     
     # Seed about_page with default data if empty
@@ -1357,8 +3060,138 @@ if __name__ == '__main__':
         print("Database seeded with default about page data!")
     
     conn.close()
+
+def init_db_command():
+    """Create the database schema and seed placeholder content."""
+    init_db()
+    seed_db()
+    if current_app.config['SITE_URL']:
+        rebuild_site_documents()
+    print("Database initialized.")
+
+def build_documents_command():
+    """Rebuild the stored feed and sitemaps, linking to SITE_URL."""
+    if not current_app.config['SITE_URL']:
+        raise click.UsageError('Set SITE_URL to the public address the feed and sitemap link to.')
+    get_db().close()
+    rebuild_site_documents()
+    print("Rebuilt the feed and sitemap.")
+
+@click.option('--missing-only', is_flag=True, help='Only compile articles that have no compiled body yet.')
+def compile_content_command(missing_only):
+    """Recompile stored article bodies from their editor HTML."""
+    count = recompile_articles(only_missing=missing_only)
+    if current_app.config['SITE_URL']:
+        # Excerpts may have changed, and the feed shows them for articles without a summary
+        rebuild_site_documents()
+    print(f"Compiled {count} articles.")
+
+@click.option('--all', 'recompute', is_flag=True, help='Recompute placeholders that already exist.')
+def backfill_placeholders_command(recompute):
+    """Compute the loading placeholders of article cover images."""
+    done, failed = backfill_cover_placeholders(recompute)
+    print(f"Computed placeholders for {done} cover images; {failed} could not be decoded.")
+
+@click.option('--max-rows', default=1000, show_default=True, help='Largest table a statement may scan in full.')
+def audit_queries_command(max_rows):
+    """Run EXPLAIN QUERY PLAN on every statement the routes issue."""
+    import query_audit
+    findings = query_audit.run_audit(create_app, max_rows)
+    for finding in findings:
+        print(finding)
+    if findings:
+        raise SystemExit(f"{len(findings)} problems found.")
+    print("No full scans of large tables found.")
+
+@click.argument('csv_file', type=click.File('r', encoding='utf-8-sig', errors='replace', lazy=False))
+def import_subscribers_command(csv_file):
+    """Add subscribers from a CSV file with email and optional name columns ("-" reads stdin)."""
+    start = time.perf_counter()
+    result = import_subscribers(csv_file)
+    elapsed = time.perf_counter() - start
+    rows = sum(result)
+    print(f"Imported {result.inserted} subscribers: {result.duplicates} duplicates, {result.invalid} invalid "
+          f"({rows} rows in {elapsed:.1f} s, {rows / elapsed if elapsed else 0:.0f} rows/s).")
+
+@click.option('--min-age', default=24 * 3600, show_default=True,
+              help='Keep unreferenced files younger than this many seconds.')
+@click.option('--dry-run', is_flag=True, help='Only list the files that would be deleted.')
+def gc_uploads_command(min_age, dry_run):
+    """Delete uploaded files no article, revision or about page refers to, and expired previews."""
+    removed = collect_upload_garbage(min_age, dry_run)
+    for name in removed:
+        print(name)
+    print(f"{'Would delete' if dry_run else 'Deleted'} {len(removed)} files.")
+
+@click.option('--out', type=click.Path(file_okay=False), help='Directory to write the site to (default STATIC_EXPORT_DIR).')
+def export_site_command(out):
+    """Render the public pages and assets into a directory a file server can serve."""
+    out_dir = out or current_app.config['STATIC_EXPORT_DIR']
+    if not out_dir:
+        raise click.UsageError('Pass --out or set STATIC_EXPORT_DIR.')
+    start = time.perf_counter()
+    pages = static_export.export_site(current_app._get_current_object(), out_dir)
+    print(f"Exported {len(pages)} pages to {out_dir} in {time.perf_counter() - start:.1f} s.")
+
+def build_critical_css_command():
+    """Extract and save the critical CSS of each public page template."""
+    if not current_app.config['CRITICAL_CSS_CACHE']:
+        raise click.UsageError('CRITICAL_CSS_CACHE is empty, so critical CSS is not used.')
+    templates = build_critical_css(current_app._get_current_object())
+    for template, css in sorted(templates.items()):
+        print(f'{template}: {len(css)} bytes')
+
+def backup_db_command():
+    """Take a verified snapshot of the database into BACKUP_DIR."""
+    config = current_app.config
+    if not config['BACKUP_DIR']:
+        raise click.UsageError('Set BACKUP_DIR to the directory snapshots are kept in.')
+    get_db().close()
+    start = time.perf_counter()
+    path = backups.backup(config['DATABASE'], config['BACKUP_DIR'], config['BACKUP_KEEP'])
+    print(f"Backed up {config['DATABASE']} to {path} in {time.perf_counter() - start:.1f} s.")
+
+@click.argument('snapshot', required=False, type=click.Path(exists=True, dir_okay=False))
+@click.option('--yes', is_flag=True, help='Do not ask for confirmation.')
+def restore_db_command(snapshot, yes):
+    """Replace the database with a snapshot (default: the latest one of it in BACKUP_DIR)."""
+    config = current_app.config
+    if snapshot is None:
+        snapshot = backups.latest_snapshot(config['BACKUP_DIR'], config['DATABASE']) if config['BACKUP_DIR'] else None
+        if snapshot is None:
+            raise click.UsageError('Pass a snapshot file or set BACKUP_DIR to a directory with snapshots of DATABASE.')
+    if not yes:
+        click.confirm(f"Replace {config['DATABASE']} with {snapshot}?", abort=True)
+    try:
+        backups.verify(snapshot)
+        if config['BACKUP_DIR'] and os.path.exists(config['DATABASE']):
+            # The current content becomes the newest snapshot, so the restore can be undone
+            saved = backups.backup(config['DATABASE'], config['BACKUP_DIR'], prefix='pre-restore')
+            print(f'Saved the current database as {saved}.')
+        backups.restore(snapshot, config['DATABASE'])
+    except backups.BackupError as e:
+        raise click.ClickException(str(e))
+    print(f"Restored {config['DATABASE']} from {snapshot}. Restart the app so workers drop cached pages.")
+
+@click.option('--keep-days', default=revisions.KEEP_DAYS, show_default=True,
+              help='Keep every revision younger than this; older ones only the last of each day.')
+def compact_revisions_command(keep_days):
+    """Thin out old article revisions."""
+    conn = get_db()
+    article_ids = [row[0] for row in conn.execute('SELECT DISTINCT article_id FROM article_revisions')]
+    conn.close()
+    removed = 0
+    for article_id in article_ids:
+        # One article per transaction, so saves are not held up for long
+        removed += write_transaction(lambda conn: revisions.compact(conn, article_id, keep_days))
+    print(f"Removed {removed} revisions of {len(article_ids)} articles.")
+
+app = create_app()
+
+if __name__ == '__main__':
+    with app.app_context():
+        seed_db()
+    warm_critical_css(app)
     
-    # Only run with debug in development
-    if __name__ == '__main__':
-        port = int(os.environ.get('PORT', 5000))
-        app.run(host='0.0.0.0', port=port, debug=False)
+    port = int(os.environ.get('PORT', 5000))
+    app.run(host='0.0.0.0', port=port, debug=False)
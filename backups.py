@@ -0,0 +1,228 @@
+"""Online backups of the database as rotating, verified snapshots.
+
+backup() copies the live database with the SQLite backup API a few pages at
+a time, sleeping between steps, so readers and writers are never held up
+for more than one step. The copy is written next to the snapshots under a
+temporary name, switched out of WAL mode so it is a single self-contained
+file, checked with PRAGMA integrity_check and only then renamed to
+snapshot-<UTC time>-<source>.db, <source> being a digest of the database's
+real path; the oldest snapshots of that database beyond `keep` are removed.
+Everything that looks for snapshots only considers the ones of the database
+it is given, so databases backed up into the same directory never read or
+restore each other's snapshots.
+
+A write to the database from another connection makes the backup API start
+over. When that keeps happening (a busy site), the rest of the copy is done
+in a single step instead: with the database in WAL mode that is one read
+transaction, which writers do not wait for either.
+
+Snapshots are never modified once renamed, so they can be opened as a read
+replica with open_snapshot() for queries that do not need the latest rows.
+restore() copies a verified snapshot back over the database.
+
+    flask --app app backup-db
+    flask --app app restore-db [snapshot]
+"""
+import contextlib
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import urllib.request
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows: scheduled backups are not serialized across workers
+    fcntl = None
+
+# Pages copied per step (4 MiB with the default 4 KiB pages), and the pause between steps
+STEP_PAGES = 1024
+STEP_SLEEP = 0.01
+# Restarts caused by concurrent writes before the rest of the copy is taken in one step
+MAX_RESTARTS = 3
+
+SNAPSHOT_NAME = re.compile(r'^snapshot-(\d{8}T\d{6}\.\d{6}Z)-([0-9a-f]{12})\.db$')
+SNAPSHOT_TIME = '%Y%m%dT%H%M%S.%fZ'
+LOCK_FILE = '.backup.lock'
+
+class BackupError(Exception):
+    """A snapshot failed its integrity check or could not be made"""
+
+class TooManyRestarts(Exception):
+    pass
+
+def snapshot_time(path):
+    """When a snapshot was taken, from its name"""
+    stamp = SNAPSHOT_NAME.match(os.path.basename(path)).group(1)
+    return datetime.strptime(stamp, SNAPSHOT_TIME).replace(tzinfo=timezone.utc)
+
+def source_tag(database):
+    """Digest of the real path of `database`, naming the snapshots taken of it"""
+    return hashlib.sha256(os.path.realpath(database).encode()).hexdigest()[:12]
+
+def list_snapshots(backup_dir, database):
+    """Paths of the snapshots of `database` in `backup_dir`, oldest first"""
+    tag = source_tag(database)
+    try:
+        names = os.listdir(backup_dir)
+    except FileNotFoundError:
+        return []
+    snapshots = []
+    for name in names:
+        match = SNAPSHOT_NAME.match(name)
+        if match and match.group(2) == tag:
+            snapshots.append(os.path.join(backup_dir, name))
+    return sorted(snapshots)
+
+def latest_snapshot(backup_dir, database):
+    snapshots = list_snapshots(backup_dir, database)
+    return snapshots[-1] if snapshots else None
+
+def integrity_errors(conn):
+    """Problems PRAGMA integrity_check finds, or [] for a sound database"""
+    rows = [row[0] for row in conn.execute('PRAGMA integrity_check')]
+    return [] if rows == ['ok'] else rows
+
+def verify(path):
+    """Raise BackupError unless the file at `path` passes an integrity check"""
+    try:
+        conn = open_snapshot(path)
+        try:
+            errors = integrity_errors(conn)
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError as e:
+        errors = [str(e)]
+    if errors:
+        raise BackupError(f'{path} failed its integrity check: {"; ".join(errors[:5])}')
+
+def open_snapshot(path, factory=sqlite3.Connection):
+    """A read-only connection to a snapshot; immutable, so it takes no locks"""
+    uri = 'file:' + urllib.request.pathname2url(os.path.abspath(path)) + '?mode=ro&immutable=1'
+    return sqlite3.connect(uri, uri=True, factory=factory)
+
+def copy_database(source, target, pages=STEP_PAGES, sleep=STEP_SLEEP):
+    """Copy one open database into another in steps of `pages` (-1 copies everything in one step)"""
+    if pages < 0:
+        source.backup(target)
+        return
+    restarts = 0
+    last_remaining = None
+
+    def progress(status, remaining, total):
+        nonlocal restarts, last_remaining
+        if last_remaining is not None and remaining > last_remaining:
+            restarts += 1
+            if restarts > MAX_RESTARTS:
+                raise TooManyRestarts()
+        last_remaining = remaining
+
+    try:
+        source.backup(target, pages=pages, progress=progress, sleep=sleep)
+    except TooManyRestarts:
+        source.backup(target)
+
+def prune(backup_dir, database, keep):
+    """Remove all but the `keep` newest snapshots of `database`, and copies abandoned by an interrupted backup"""
+    for path in list_snapshots(backup_dir, database)[:-keep]:
+        os.remove(path)
+    for name in os.listdir(backup_dir):
+        if name.endswith('.db.part'):
+            path = os.path.join(backup_dir, name)
+            if time.time() - os.path.getmtime(path) > 24 * 3600:
+                os.remove(path)
+
+def backup(database, backup_dir, keep=24, pages=STEP_PAGES, sleep=STEP_SLEEP, prefix='snapshot'):
+    """Take a verified snapshot of `database` into `backup_dir` and return its path.
+
+    With another `prefix` the copy is not one of the rotating snapshots: it
+    is neither read as the replica nor removed by prune().
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    now = datetime.now(timezone.utc)
+    path = os.path.join(backup_dir, f'{prefix}-{now.strftime(SNAPSHOT_TIME)}-{source_tag(database)}.db')
+    part = path + '.part'
+
+    source = sqlite3.connect(database)
+    target = sqlite3.connect(part)
+    try:
+        copy_database(source, target, pages, sleep)
+        # A self-contained file: no -wal or -shm needed to read it
+        target.execute('PRAGMA journal_mode = DELETE')
+        errors = integrity_errors(target)
+    finally:
+        target.close()
+        source.close()
+    if errors:
+        os.remove(part)
+        raise BackupError(f'The copy of {database} failed its integrity check: {"; ".join(errors[:5])}')
+    os.replace(part, path)
+    prune(backup_dir, database, keep)
+    return path
+
+def restore(snapshot, database):
+    """Verify `snapshot` and copy it over `database` in one step.
+
+    Other connections wait for the copy like for any write and see the
+    restored content afterwards. Workers keep their in-memory caches, so
+    restart them after restoring.
+    """
+    verify(snapshot)
+    source = open_snapshot(snapshot)
+    target = sqlite3.connect(database, timeout=60)
+    try:
+        source.backup(target)
+        errors = integrity_errors(target)
+    finally:
+        target.close()
+        source.close()
+    if errors:
+        raise BackupError(f'{database} failed its integrity check after the restore: {"; ".join(errors[:5])}')
+
+@contextlib.contextmanager
+def backup_lock(backup_dir):
+    """Yield whether this process got the backup lock; another worker may hold it"""
+    os.makedirs(backup_dir, exist_ok=True)
+    with open(os.path.join(backup_dir, LOCK_FILE), 'w') as lock:
+        if fcntl is None:
+            yield True
+            return
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        yield True
+
+def seconds_until_due(backup_dir, database, interval):
+    latest = latest_snapshot(backup_dir, database)
+    if latest is None:
+        return 0
+    age = (datetime.now(timezone.utc) - snapshot_time(latest)).total_seconds()
+    return max(interval - age, 0)
+
+def start_scheduler(database, backup_dir, interval, keep, logger):
+    """Back up every `interval` seconds from a daemon thread.
+
+    Every worker may run one; the lock file and the time of the latest
+    snapshot make sure only one of them takes each backup.
+    """
+    def run():
+        while True:
+            time.sleep(seconds_until_due(backup_dir, database, interval))
+            try:
+                with backup_lock(backup_dir) as locked:
+                    if locked and seconds_until_due(backup_dir, database, interval) == 0:
+                        path = backup(database, backup_dir, keep)
+                        logger.info('Backed up %s to %s', database, path)
+            except Exception:
+                logger.exception('Scheduled backup of %s failed', database)
+            # Whoever took the backup, wait a little before looking again
+            time.sleep(min(interval, 60))
+
+    thread = threading.Thread(target=run, name='sqlite-backup', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,164 @@
+"""Database size and read latency with article bodies inline versus compressed.
+
+Builds a database in the old layout, with each article's editor HTML and
+compiled body as TEXT columns of the articles table, then lets the app
+migrate a copy of it into the compressed article_bodies table. Both are
+vacuumed and compared on:
+
+- file size, and the pages of the articles table alone
+- a listing scan of articles (the archive query) with SQLite's default 2 MB page cache
+- reading one article's body: a TEXT column against decompressing a row
+- GET /article/<slug> through the app, with the decompressed-body LRU and without it
+
+    python benchmarks/article_bodies.py [--articles 1000] [--runs 2000]
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from common import CATEGORIES, create_database, report
+from generate_data import article_body
+
+LISTING_QUERY = '''
+    SELECT id, title, slug, category, published_date, cover_image_filename, short_summary
+    FROM articles ORDER BY published_date DESC, id DESC
+'''
+
+def build_inline(db_path, count, seed):
+    """A database with the bodies in articles, as before article_bodies"""
+    from content import compile_content
+    create_database(db_path)
+    conn = sqlite3.connect(db_path)
+    # The column order of databases created before article_bodies: short_summary and
+    # the later columns come after content_html, so reading them walks its overflow pages
+    conn.execute('DROP TABLE articles')
+    conn.execute('''
+        CREATE TABLE articles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, slug TEXT UNIQUE NOT NULL,
+            author_name TEXT NOT NULL, category TEXT NOT NULL, published_date DATE NOT NULL,
+            cover_image_filename TEXT NOT NULL, content_html TEXT NOT NULL, short_summary TEXT,
+            content_compiled TEXT, excerpt TEXT, reading_minutes INTEGER, comments_version INTEGER NOT NULL DEFAULT 0,
+            cover_color TEXT, cover_preview TEXT, body_version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        body = article_body(rng)
+        compiled = compile_content(body)
+        rows.append((f'Article {i}', f'article-{i}', 'Kylee', CATEGORIES[i % 3], f'2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}',
+                     'cover_image.png', f'Summary of article {i}', body, compiled.html, compiled.excerpt,
+                     compiled.reading_minutes))
+    conn.executemany('''
+        INSERT INTO articles (title, slug, author_name, category, published_date, cover_image_filename, short_summary,
+                              content_html, content_compiled, excerpt, reading_minutes)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+    conn.close()
+    return sum(len(row[7]) for row in rows) / count
+
+def table_bytes(conn, table):
+    return conn.execute('SELECT COALESCE(SUM(pgsize), 0) FROM dbstat WHERE name = ?', (table,)).fetchone()[0]
+
+def vacuum(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute('VACUUM')
+    sizes = {table: table_bytes(conn, table) for table in ('articles', 'article_bodies')}
+    conn.close()
+    return os.path.getsize(db_path), sizes
+
+def time_listing(db_path, runs):
+    conn = sqlite3.connect(db_path)
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        conn.execute(LISTING_QUERY).fetchall()
+        samples.append(time.perf_counter() - start)
+    conn.close()
+    return samples
+
+def time_body_reads(read, count, runs, seed):
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(runs):
+        article_id = rng.randint(1, count)
+        start = time.perf_counter()
+        read(article_id)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def time_pages(db_path, count, runs, seed, cache_size):
+    import app as blog
+    instance = blog.create_app({'DATABASE': db_path, 'TEMPLATE_CACHE_DIR': None, 'METRICS_ENABLED': False,
+                                'SLOW_QUERY_THRESHOLD': 0, 'BODY_CACHE_SIZE': cache_size, 'CRITICAL_CSS_CACHE': ''})
+    client = instance.test_client()
+    rng = random.Random(seed)
+    # Readers mostly read the newest few articles
+    slugs = [f'article-{min(int(rng.paretovariate(1.2)) - 1, count - 1)}' for _ in range(runs)]
+    for slug in slugs[:50]:
+        client.get(f'/article/{slug}')
+    samples = []
+    for slug in slugs:
+        start = time.perf_counter()
+        response = client.get(f'/article/{slug}')
+        samples.append(time.perf_counter() - start)
+        assert response.status_code == 200
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--articles', type=int, default=1000)
+    parser.add_argument('--runs', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    import app as blog
+    import bodies
+    with tempfile.TemporaryDirectory() as workdir:
+        inline_path = os.path.join(workdir, 'inline.db')
+        compressed_path = os.path.join(workdir, 'compressed.db')
+        average = build_inline(inline_path, args.articles, args.seed)
+        shutil.copyfile(inline_path, compressed_path)
+
+        start = time.perf_counter()
+        instance = blog.create_app({'DATABASE': compressed_path, 'TEMPLATE_CACHE_DIR': None})
+        with instance.app_context():
+            blog.get_db().close()
+        migrated = time.perf_counter() - start
+
+        inline_size, inline_tables = vacuum(inline_path)
+        compressed_size, compressed_tables = vacuum(compressed_path)
+        print(f'{args.articles} articles, editor HTML averaging {average / 1024:.1f} KB; '
+              f'migration took {migrated:.2f} s (codec {bodies.CODEC})')
+        print(f'database file            inline {inline_size / 2**20:8.2f} MB   compressed {compressed_size / 2**20:8.2f} MB')
+        print(f'articles table           inline {inline_tables["articles"] / 2**20:8.2f} MB   '
+              f'compressed {compressed_tables["articles"] / 2**20:8.2f} MB '
+              f'(+ {compressed_tables["article_bodies"] / 2**20:.2f} MB in article_bodies)')
+        print()
+
+        listing_runs = max(args.runs // 20, 20)
+        report('listing scan, inline', time_listing(inline_path, listing_runs))
+        report('listing scan, compressed', time_listing(compressed_path, listing_runs))
+
+        inline_conn = sqlite3.connect(inline_path)
+        compressed_conn = sqlite3.connect(compressed_path)
+        report('body read, TEXT column', time_body_reads(
+            lambda article_id: inline_conn.execute('SELECT content_compiled FROM articles WHERE id = ?',
+                                                   (article_id,)).fetchone(),
+            args.articles, args.runs, args.seed))
+        report('body read, decompressed', time_body_reads(
+            lambda article_id: bodies.load(compressed_conn, article_id), args.articles, args.runs, args.seed))
+        inline_conn.close()
+        compressed_conn.close()
+
+        report('article page, no body cache', time_pages(compressed_path, args.articles, args.runs, args.seed, 0))
+        report('article page, body cache', time_pages(compressed_path, args.articles, args.runs, args.seed,
+                                                       32 * 1024 * 1024))
+
+if __name__ == '__main__':
+    main()
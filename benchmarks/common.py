@@ -0,0 +1,41 @@
+"""Helpers shared by the benchmark scripts."""
+import os
+import sqlite3
+import statistics
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+CATEGORIES = ['Songbird Magazine', 'Angsty Entries', 'Quick Reads']
+
+def create_database(db_path):
+    """Create an empty database with the app's schema"""
+    import app as blog
+    instance = blog.create_app({'DATABASE': db_path, 'TEMPLATE_CACHE_DIR': None})
+    with instance.app_context():
+        blog.get_db().close()
+
+def fill_articles(db_path, count, content_html='<p>Body</p>'):
+    """Create a database holding `count` articles"""
+    create_database(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.executemany('''
+        INSERT INTO articles (title, slug, author_name, category, published_date, cover_image_filename, short_summary)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', [(f'Article {i}', f'article-{i}', 'Kylee', CATEGORIES[i % 3], f'2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}',
+           'cover_image.png' if i % 4 == 0 else f'cover_{i % 50}.png', f'Summary of article {i}')
+          for i in range(count)])
+    import bodies
+    body = bodies.compress(content_html)
+    conn.executemany('INSERT INTO article_bodies (article_id, codec, source, compiled) VALUES (?, ?, ?, ?)',
+                     [(i + 1, bodies.CODEC, body, body) for i in range(count)])
+    conn.commit()
+    conn.close()
+
+def report(label, samples, width=40):
+    """Print median/min/max of timing samples given in seconds"""
+    samples_ms = [s * 1000 for s in samples]
+    print(f'{label:<{width}} median {statistics.median(samples_ms):8.2f} ms   '
+          f'min {min(samples_ms):8.2f} ms   max {max(samples_ms):8.2f} ms')
@@ -0,0 +1,64 @@
+"""Bytes a browser needs before it can first render each public page.
+
+Counts the HTML up to the end of <head> plus every stylesheet the head
+links with rel="stylesheet" (outside <noscript>), which block rendering
+until downloaded. Local stylesheets are measured; remote ones (the Google
+Fonts CSS) are counted as extra blocking requests. Compares the plain
+blocking style.css with inlined critical CSS, raw and gzipped.
+
+    python benchmarks/critical_css.py
+"""
+import gzip
+import os
+import re
+import tempfile
+import urllib.parse
+
+from common import ROOT, fill_articles
+
+BLOCKING_LINK = re.compile(r'<link\b[^>]*\brel="stylesheet"[^>]*>')
+HREF = re.compile(r'\bhref="([^"]+)"')
+NOSCRIPT = re.compile(r'<noscript>.*?</noscript>', re.DOTALL)
+
+PAGES = ['/', '/songbird-magazine', '/archive', '/about', '/article/article-1']
+
+def blocking_bytes(html):
+    """(raw bytes, gzipped bytes, remote blocking requests) before first render"""
+    head = html[:html.index('</head>') + len('</head>')]
+    raw = head.encode()
+    gzipped = len(gzip.compress(raw))
+    total = len(raw)
+    remote = 0
+    for link in BLOCKING_LINK.findall(NOSCRIPT.sub('', head)):
+        href = HREF.search(link).group(1)
+        if not href.startswith('/static/'):
+            remote += 1
+            continue
+        with open(os.path.join(ROOT, 'static', urllib.parse.unquote(href[len('/static/'):])), 'rb') as f:
+            data = f.read()
+        total += len(data)
+        gzipped += len(gzip.compress(data))
+    return total, gzipped, remote
+
+def measure(blog, db_path, cache):
+    instance = blog.create_app({'DATABASE': db_path, 'TEMPLATE_CACHE_DIR': None, 'CRITICAL_CSS_CACHE': cache})
+    blog.warm_critical_css(instance)
+    client = instance.test_client()
+    return {path: blocking_bytes(client.get(path).get_data(as_text=True)) for path in PAGES}
+
+def main():
+    import app as blog
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'bench.db')
+        fill_articles(db_path, 200, content_html='<h2>Heading</h2><p>Body</p><blockquote>Quote</blockquote>')
+        plain = measure(blog, db_path, '')
+        inlined = measure(blog, db_path, os.path.join(workdir, 'critical.json'))
+
+    print(f'{"page":<22}{"blocking style.css":>28}{"critical CSS inlined":>28}')
+    print(f'{"":<22}{"raw":>10}{"gzip":>9}{"remote":>9}{"raw":>10}{"gzip":>9}{"remote":>9}')
+    for path in PAGES:
+        before, after = plain[path], inlined[path]
+        print(f'{path:<22}{before[0]:>10}{before[1]:>9}{before[2]:>9}{after[0]:>10}{after[1]:>9}{after[2]:>9}')
+
+if __name__ == '__main__':
+    main()
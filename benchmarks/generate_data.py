@@ -0,0 +1,190 @@
+"""Fill a fresh database with synthetic content and traffic.
+
+Articles get bodies of realistic length (a few hundred to several thousand
+words of paragraphs, headings, quotes and the occasional image), compiled the
+same way the admin editor saves them. Comments, likes, subscribers, page
+views and article views are spread over the year before generation. The
+same --seed always produces the same rows (with timestamps relative to when
+the script runs), so results can be compared between commits.
+
+    python benchmarks/generate_data.py out.db [--articles 1000] [--page-views 2000000] ...
+"""
+import argparse
+import itertools
+import os
+import random
+import sqlite3
+import time
+
+from common import CATEGORIES, create_database
+
+DEFAULTS = {
+    'articles': 1000,
+    'comments': 20000,
+    'likes': 50000,
+    'subscribers': 10000,
+    'page_views': 2000000,
+    'article_views': 1000000,
+}
+
+WORDS = ('the a of and to in is was for on that with as it at by this from be are or his her they '
+         'song bird night letter quiet morning river paper window winter summer voice light house '
+         'remember almost always never leaving waiting wrote heard walked broken small open long '
+         'thought moment again something nothing everyone together alone between before after').split()
+
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 14_2) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2 Safari/605.1.15',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_2 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148',
+    'Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0',
+    'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)',
+]
+
+REFERRERS = [None, None, None, 'https://www.google.com/', 'https://www.instagram.com/', 'https://t.co/']
+
+BATCH_SIZE = 10000
+YEAR_SECONDS = 365 * 24 * 3600
+
+def sentence(rng):
+    words = rng.choices(WORDS, k=rng.randint(6, 24))
+    return ' '.join(words).capitalize() + '.'
+
+def paragraph(rng):
+    text = ' '.join(sentence(rng) for _ in range(rng.randint(2, 7)))
+    style = rng.random()
+    if style < 0.1:
+        return f'<p><strong>{text}</strong></p>'
+    if style < 0.15:
+        return f'<p class="ql-align-center">{text}</p>'
+    return f'<p>{text}</p>'
+
+def article_body(rng):
+    """Editor-style HTML; lengths are log-normal around 1,500 words"""
+    words_wanted = min(int(rng.lognormvariate(7.3, 0.6)), 12000)
+    parts = []
+    words = 0
+    while words < words_wanted:
+        roll = rng.random()
+        if roll < 0.05:
+            parts.append(f'<h2>{sentence(rng)}</h2>')
+        elif roll < 0.08:
+            parts.append(f'<blockquote>{sentence(rng)}</blockquote>')
+        elif roll < 0.1:
+            parts.append(f'<p><img src="/static/uploads/photo_{rng.randint(1, 40)}.jpg"></p>')
+        else:
+            piece = paragraph(rng)
+            parts.append(piece)
+            words += piece.count(' ') + 1
+        if rng.random() < 0.2:
+            parts.append('<p><br></p>')
+    return ''.join(parts)
+
+def timestamp(rng, now):
+    """A random time in the last year, formatted like CURRENT_TIMESTAMP"""
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(now - rng.random() * YEAR_SECONDS))
+
+def insert_batched(conn, sql, rows):
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, BATCH_SIZE))
+        if not batch:
+            break
+        conn.executemany(sql, batch)
+    conn.commit()
+
+def generate(db_path, seed=1, **volumes):
+    """Create `db_path` and fill it; `volumes` override DEFAULTS per table"""
+    import bodies
+    import useragents
+    from content import compile_content
+
+    counts = dict(DEFAULTS, **volumes)
+    rng = random.Random(seed)
+    now = time.time()
+    viewers = [f'viewer-{i:06d}' for i in range(max(counts['page_views'] // 20, 1))]
+
+    create_database(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA synchronous = OFF')
+
+    body_rows = []
+
+    def articles():
+        for i in range(counts['articles']):
+            body = article_body(rng)
+            compiled = compile_content(body)
+            published = time.strftime('%Y-%m-%d', time.gmtime(now - (counts['articles'] - i) * 86400 / 3))
+            cover = 'cover_image.png' if i % 10 == 0 else f'cover_{i % 60}.png'
+            body_rows.append((i + 1, bodies.CODEC, bodies.compress(body), bodies.compress(compiled.html)))
+            yield (sentence(rng)[:60], f'article-{i}', 'Kylee', CATEGORIES[i % len(CATEGORIES)], published,
+                   cover, compiled.excerpt[:150], compiled.excerpt, compiled.reading_minutes)
+    insert_batched(conn, '''
+        INSERT INTO articles (title, slug, author_name, category, published_date, cover_image_filename,
+                              short_summary, excerpt, reading_minutes)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', articles())
+    insert_batched(conn, 'INSERT INTO article_bodies (article_id, codec, source, compiled) VALUES (?, ?, ?, ?)', body_rows)
+
+    article_ids = range(1, counts['articles'] + 1)
+    # Traffic is skewed towards a few popular articles
+    popular = lambda: min(int(rng.paretovariate(1.2)), counts['articles'])
+
+    insert_batched(conn, '''
+        INSERT INTO comments (article_id, display_name, content, created_at, is_approved) VALUES (?, ?, ?, ?, ?)
+    ''', ((popular(), f'Reader {rng.randint(1, 5000)}', sentence(rng), timestamp(rng, now), int(rng.random() > 0.05))
+          for _ in range(counts['comments'])))
+
+    insert_batched(conn, 'INSERT OR IGNORE INTO likes (article_id, viewer_token, created_at) VALUES (?, ?, ?)',
+                   ((rng.choice(article_ids), rng.choice(viewers), timestamp(rng, now)) for _ in range(counts['likes'])))
+
+    insert_batched(conn, 'INSERT INTO subscribers (email, name, created_at) VALUES (?, ?, ?)',
+                   ((f'reader{i}@example.com', f'Reader {i}', timestamp(rng, now)) for i in range(counts['subscribers'])))
+
+    paths = ['/', '/archive', '/about', '/songbird-magazine', '/angsty-entries', '/quick-reads']
+    insert_batched(conn, 'INSERT INTO user_agents (user_agent, is_bot) VALUES (?, ?)',
+                   ((user_agent, int(useragents.is_bot(user_agent))) for user_agent in USER_AGENTS))
+    user_agent_ids = range(1, len(USER_AGENTS) + 1)
+    insert_batched(conn, '''
+        INSERT INTO page_views (viewer_token, path, referrer, user_agent_id, started_at, duration_seconds)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', ((rng.choice(viewers),
+           f'/article/article-{popular() - 1}' if rng.random() < 0.6 else rng.choice(paths),
+           rng.choice(REFERRERS), rng.choice(user_agent_ids), timestamp(rng, now),
+           int(rng.expovariate(1 / 90)) if rng.random() < 0.8 else None)
+          for _ in range(counts['page_views'])))
+
+    insert_batched(conn, '''
+        INSERT INTO article_views (article_id, viewer_token, started_at, duration_seconds) VALUES (?, ?, ?, ?)
+    ''', ((popular(), rng.choice(viewers), timestamp(rng, now),
+           int(rng.expovariate(1 / 180)) if rng.random() < 0.8 else None)
+          for _ in range(counts['article_views'])))
+
+    conn.execute('ANALYZE')
+    conn.commit()
+    conn.close()
+    return counts
+
+def add_volume_arguments(parser):
+    for name, default in DEFAULTS.items():
+        parser.add_argument('--' + name.replace('_', '-'), type=int, default=default, dest=name)
+    parser.add_argument('--seed', type=int, default=1)
+
+def volumes_from_args(args):
+    return {name: getattr(args, name) for name in DEFAULTS}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('database', help='path of the database to create')
+    add_volume_arguments(parser)
+    args = parser.parse_args()
+
+    if os.path.exists(args.database):
+        parser.error(f'{args.database} already exists')
+    start = time.perf_counter()
+    counts = generate(args.database, seed=args.seed, **volumes_from_args(args))
+    size = os.path.getsize(args.database) / 1024 / 1024
+    print(', '.join(f'{count} {name}' for name, count in counts.items()))
+    print(f'Generated {args.database} ({size:.0f} MiB) in {time.perf_counter() - start:.1f} s')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Per-row cost of rendering article listings.
+
+Compares the old listing path (SELECT * into sqlite3.Row objects, with the
+cover_image_url and safe_get filters and url_for() evaluated per row in the
+template) against ArticleSummary objects that arrive with URLs and defaults
+already resolved.
+
+    python benchmarks/listing_render.py [--articles 10000] [--runs 5]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from common import fill_articles, report
+
+# The per-row markup of archive.html as it was before ArticleSummary
+ROW_TEMPLATE_ROWS = '''
+{% for article in articles %}
+<img src="{{ article['cover_image_filename'] | cover_image_url }}" alt="{{ article['title'] }}">
+<h2>{{ article['title'] }}</h2>
+<p>{{ article['category'] }} • {{ article['published_date'] }}</p>
+<p>{{ article | safe_get('short_summary', 'Short summary of the article will go here eventually') }}</p>
+<a href="{{ url_for('article_detail', slug=article['slug']) }}">continue reading →</a>
+{% endfor %}
+'''
+
+ROW_TEMPLATE_SUMMARIES = '''
+{% for article in articles %}
+<img src="{{ article.cover_url }}" alt="{{ article.title }}">
+<h2>{{ article.title }}</h2>
+<p>{{ article.category }} • {{ article.published_date }}</p>
+<p>{{ article.short_summary }}</p>
+<a href="{{ article.url }}">continue reading →</a>
+{% endfor %}
+'''
+
+def safe_get(row, key, default=''):
+    """The filter the old templates used for every row's short_summary"""
+    try:
+        value = row[key]
+        return value if value is not None else default
+    except (KeyError, IndexError, TypeError):
+        return default
+
+def time_rows(blog, instance, runs):
+    from flask import render_template_string
+    samples = []
+    with instance.test_request_context('/archive'):
+        for _ in range(runs + 1):
+            start = time.perf_counter()
+            conn = blog.get_db()
+            articles = conn.execute('SELECT * FROM articles ORDER BY published_date DESC').fetchall()
+            conn.close()
+            render_template_string(ROW_TEMPLATE_ROWS, articles=articles)
+            samples.append(time.perf_counter() - start)
+    return samples[1:]
+
+def time_summaries(blog, instance, runs):
+    from flask import render_template_string
+    samples = []
+    with instance.test_request_context('/archive'):
+        for _ in range(runs + 1):
+            start = time.perf_counter()
+            conn = blog.get_db()
+            cursor = conn.execute(f'SELECT {blog.ARTICLE_SUMMARY_COLUMNS} FROM articles ORDER BY published_date DESC')
+            articles = blog.fetch_article_summaries(cursor)
+            conn.close()
+            render_template_string(ROW_TEMPLATE_SUMMARIES, articles=articles)
+            samples.append(time.perf_counter() - start)
+    return samples[1:]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--articles', type=int, default=10000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+    
+    import app as blog
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'bench.db')
+        fill_articles(db_path, args.articles, content_html='<p>' + 'Body text. ' * 1000 + '</p>')
+        instance = blog.create_app({'DATABASE': db_path, 'TEMPLATE_CACHE_DIR': None})
+        instance.add_template_filter(safe_get, 'safe_get')
+        
+        for label, func in [('sqlite3.Row + filters', time_rows), ('ArticleSummary', time_summaries)]:
+            samples = func(blog, instance, args.runs)
+            report(f'{label} ({args.articles} rows)', samples)
+            best = min(samples)
+            print(f'{"":<40} {best / args.articles * 1e6:8.2f} us/row')
+
+if __name__ == '__main__':
+    main()
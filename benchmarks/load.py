@@ -0,0 +1,291 @@
+"""Load test over a mix of public, tracking and admin requests.
+
+Generates a synthetic database (see generate_data.py), or uses an existing
+one, then sends a weighted mix of requests from several threads either
+through the Flask test client (in-process) or to a local gunicorn started
+with gunicorn.conf.py. Prints p50/p95/p99 latency and throughput per
+endpoint and writes the results as JSON; pass an earlier results file to
+--compare to see the change per endpoint.
+
+    python benchmarks/load.py [--target client|gunicorn] [--threads 4] [--requests 2000]
+                              [--database existing.db] [--compare results/old.json]
+"""
+import argparse
+import http.client
+import http.cookies
+import json
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+from common import ROOT
+from generate_data import add_volume_arguments, generate, volumes_from_args
+
+ADMIN_PASSWORD = 'benchmark'
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+# name -> (weight, request builder); builders return (method, path, form, json_body)
+MIX = {
+    'home': (20, lambda rng, n: ('GET', '/', None, None)),
+    'archive': (8, lambda rng, n: ('GET', '/archive', None, None)),
+    'category': (10, lambda rng, n: ('GET', rng.choice(['/songbird-magazine', '/angsty-entries', '/quick-reads']), None, None)),
+    'article_detail': (30, lambda rng, n: ('GET', f'/article/article-{popular_article(rng, n)}', None, None)),
+    'toggle_like': (5, lambda rng, n: ('POST', f'/article/article-{popular_article(rng, n)}/like', None, None)),
+    'post_comment': (2, lambda rng, n: ('POST', f'/article/article-{popular_article(rng, n)}/comment',
+                                         {'display_name': 'Load test', 'content': 'A comment from the load test.'}, None)),
+    'track_view_start': (8, lambda rng, n: ('POST', '/track/view/start', None, {'path': '/', 'referrer': ''})),
+    'track_view_end': (6, lambda rng, n: ('POST', '/track/view/end', None,
+                                          {'view_id': rng.randint(1, 1000), 'duration_seconds': rng.randint(1, 300)})),
+    'track_article_start': (6, lambda rng, n: ('POST', '/track/article/start', None, {'article_id': popular_article(rng, n) + 1})),
+    'track_article_end': (4, lambda rng, n: ('POST', '/track/article/end', None,
+                                             {'view_id': rng.randint(1, 1000), 'duration_seconds': rng.randint(1, 600)})),
+    'admin_analytics': (1, lambda rng, n: ('GET', '/admin/analytics', None, None)),
+}
+
+def popular_article(rng, article_count):
+    return min(int(rng.paretovariate(1.2)), article_count) - 1
+
+class ClientTransport:
+    """Requests through a Flask test client; keeps its own cookies"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def send(self, method, path, form=None, json_body=None):
+        response = self.client.open(path, method=method, data=form, json=json_body)
+        response.get_data()
+        response.close()
+        return response.status_code
+
+class HTTPTransport:
+    """Requests over HTTP to a running server, with a minimal cookie jar"""
+
+    def __init__(self, host, port):
+        self.connection = http.client.HTTPConnection(host, port, timeout=60)
+        self.cookies = {}
+
+    def send(self, method, path, form=None, json_body=None):
+        headers = {}
+        body = None
+        if form is not None:
+            body = urllib.parse.urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif json_body is not None:
+            body = json.dumps(json_body)
+            headers['Content-Type'] = 'application/json'
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            response.read()
+        except (http.client.HTTPException, OSError):
+            self.connection.close()
+            raise
+        for header in response.headers.get_all('Set-Cookie') or ():
+            cookie = http.cookies.SimpleCookie(header)
+            for name, morsel in cookie.items():
+                self.cookies[name] = morsel.value
+        if response.headers.get('Connection', '').lower() == 'close':
+            self.connection.close()
+        return response.status
+
+def percentile(sorted_samples, q):
+    if not sorted_samples:
+        return 0.0
+    index = min(int(round(q * (len(sorted_samples) - 1))), len(sorted_samples) - 1)
+    return sorted_samples[index]
+
+def summarize(samples, errors, elapsed):
+    samples = sorted(samples)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'throughput_rps': len(samples) / elapsed if elapsed else 0.0,
+        'mean_ms': statistics.fmean(samples) * 1000 if samples else 0.0,
+        'p50_ms': percentile(samples, 0.50) * 1000,
+        'p95_ms': percentile(samples, 0.95) * 1000,
+        'p99_ms': percentile(samples, 0.99) * 1000,
+        'max_ms': samples[-1] * 1000 if samples else 0.0,
+    }
+
+def worker(make_transport, seed, count, deadline, article_count, samples, errors, lock):
+    rng = random.Random(seed)
+    names = list(MIX)
+    weights = [MIX[name][0] for name in names]
+    transport = make_transport()
+    transport.send('POST', '/admin/login', {'password': ADMIN_PASSWORD})
+
+    local_samples = {name: [] for name in names}
+    local_errors = {name: 0 for name in names}
+    done = 0
+    while done < count and time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        method, path, form, json_body = MIX[name][1](rng, article_count)
+        start = time.perf_counter()
+        try:
+            status = transport.send(method, path, form, json_body)
+        except (http.client.HTTPException, OSError):
+            status = None
+        elapsed = time.perf_counter() - start
+        if status is None or status >= 500:
+            local_errors[name] += 1
+        else:
+            local_samples[name].append(elapsed)
+        done += 1
+
+    with lock:
+        for name in names:
+            samples[name].extend(local_samples[name])
+            errors[name] += local_errors[name]
+
+def run_load(make_transport, threads, total_requests, duration, article_count, seed):
+    samples = {name: [] for name in MIX}
+    errors = {name: 0 for name in MIX}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration if duration else float('inf')
+    per_thread = -(-total_requests // threads)
+    workers = [threading.Thread(target=worker, args=(make_transport, seed + i, per_thread, deadline, article_count,
+                                                     samples, errors, lock))
+               for i in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    endpoints = {name: summarize(samples[name], errors[name], elapsed) for name in MIX if samples[name] or errors[name]}
+    everything = [s for name in MIX for s in samples[name]]
+    return summarize(everything, sum(errors.values()), elapsed), endpoints, elapsed
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_gunicorn(db_path, upload_folder, workers):
+    port = free_port()
+    env = dict(os.environ, DATABASE=db_path, UPLOAD_FOLDER=upload_folder, ADMIN_PASSWORD=ADMIN_PASSWORD,
+               WEB_CONCURRENCY=str(workers), SLOW_QUERY_THRESHOLD='0')
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+                                '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', 'app:app'],
+                               cwd=ROOT, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if HTTPTransport('127.0.0.1', port).send('GET', '/about') < 500:
+                return process, port
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit('gunicorn did not start')
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_table(total, endpoints, previous=None):
+    print(f'{"endpoint":<22}{"requests":>9}{"errors":>7}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}')
+    rows = sorted(endpoints.items()) + [('total', total)]
+    for name, stats in rows:
+        line = (f'{name:<22}{stats["requests"]:>9}{stats["errors"]:>7}{stats["throughput_rps"]:>9.1f}'
+                f'{stats["p50_ms"]:>9.2f}{stats["p95_ms"]:>9.2f}{stats["p99_ms"]:>9.2f}')
+        if previous:
+            old = previous['total'] if name == 'total' else previous['endpoints'].get(name)
+            if old and old['p95_ms']:
+                line += f'   p95 {(stats["p95_ms"] / old["p95_ms"] - 1) * 100:+6.1f}%'
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target', choices=['client', 'gunicorn'], default='client')
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--requests', type=int, default=2000, help='total requests to send')
+    parser.add_argument('--duration', type=float, default=0, help='stop after this many seconds instead')
+    parser.add_argument('--database', help='copy and use this database instead of generating one')
+    parser.add_argument('--output', help='results file (default results/<commit>-<time>.json)')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    add_volume_arguments(parser)
+    parser.set_defaults(page_views=200000, article_views=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'load.db')
+        upload_folder = os.path.join(workdir, 'uploads')
+        if args.database:
+            shutil.copyfile(args.database, db_path)
+            volumes = None
+        else:
+            start = time.perf_counter()
+            volumes = generate(db_path, seed=args.seed, **volumes_from_args(args))
+            print(f'Generated data in {time.perf_counter() - start:.1f} s')
+        import sqlite3
+        conn = sqlite3.connect(db_path)
+        article_count = conn.execute('SELECT COUNT(*) FROM articles').fetchone()[0]
+        conn.close()
+
+        process = None
+        if args.target == 'client':
+            import app as blog
+            instance = blog.create_app({'DATABASE': db_path, 'UPLOAD_FOLDER': upload_folder,
+                                        'ADMIN_PASSWORD': ADMIN_PASSWORD, 'TEMPLATE_CACHE_DIR': None,
+                                        'SLOW_QUERY_THRESHOLD': 0})
+            make_transport = lambda: ClientTransport(instance)
+        else:
+            process, port = start_gunicorn(db_path, upload_folder, args.workers)
+            make_transport = lambda: HTTPTransport('127.0.0.1', port)
+        try:
+            # Warm up templates and the page cache before measuring
+            warm = make_transport()
+            for name in MIX:
+                method, path, form, json_body = MIX[name][1](random.Random(0), article_count)
+                if method == 'GET':
+                    warm.send(method, path, form, json_body)
+            total, endpoints, elapsed = run_load(make_transport, args.threads, args.requests, args.duration,
+                                                 article_count, args.seed)
+        finally:
+            if process:
+                process.terminate()
+                process.wait()
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_table(total, endpoints, previous)
+
+    commit = git_commit()
+    results = {
+        'commit': commit,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'target': args.target,
+        'threads': args.threads,
+        'workers': args.workers if args.target == 'gunicorn' else None,
+        'elapsed_seconds': elapsed,
+        'volumes': volumes,
+        'seed': args.seed,
+        'python': sys.version.split()[0],
+        'total': total,
+        'endpoints': endpoints,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f'{commit or "unknown"}-{time.strftime("%Y%m%d-%H%M%S")}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'Results written to {output}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Storage per edit and rebuild time of article revision history.
+
+Saves a large article many times, each save changing, adding or removing a
+few paragraphs as an editing session would, and compares the bytes
+article_revisions grows by against keeping a compressed full copy per
+save. Then times recording a save, rebuilding random revisions and
+diffing neighbouring ones.
+
+    python benchmarks/revision_storage.py [--size-kb 260] [--edits 200]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from common import create_database, report
+from generate_data import article_body, paragraph
+
+def large_body(rng, size_kb):
+    parts = []
+    while sum(map(len, parts)) < size_kb * 1024:
+        parts.append(article_body(rng))
+    return ''.join(parts)
+
+def edit(rng, text):
+    """Change, add or remove a few paragraphs"""
+    pieces = text.split('</p>')
+    for _ in range(rng.randint(1, 3)):
+        index = rng.randrange(len(pieces) - 1)
+        roll = rng.random()
+        if roll < 0.6:
+            pieces[index] = paragraph(rng)[:-len('</p>')]
+        elif roll < 0.85:
+            pieces.insert(index, paragraph(rng)[:-len('</p>')])
+        elif len(pieces) > 10:
+            del pieces[index]
+    return '</p>'.join(pieces)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size-kb', type=int, default=260)
+    parser.add_argument('--edits', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    import bodies
+    import revisions
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'bench.db')
+        create_database(db_path)
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+
+        text = large_body(rng, args.size_kb)
+        full_copies = 0
+        record_samples = []
+        for _ in range(args.edits):
+            text = edit(rng, text)
+            full_copies += len(bodies.compress(text))
+            start = time.perf_counter()
+            revisions.record(conn, 1, 'Article', text)
+            record_samples.append(time.perf_counter() - start)
+        conn.commit()
+
+        stored = conn.execute('SELECT SUM(LENGTH(data)) FROM article_revisions').fetchone()[0]
+        deltas = [row[0] for row in conn.execute("SELECT LENGTH(data) FROM article_revisions WHERE kind = 'delta'")]
+        print(f'{args.edits} saves of a {len(text) / 1024:.0f} KB article (codec {bodies.CODEC})')
+        print(f'compressed full copies   {full_copies / 2**20:8.2f} MB   {full_copies / args.edits / 1024:8.1f} KB per save')
+        print(f'revision history         {stored / 2**20:8.2f} MB   {stored / args.edits / 1024:8.1f} KB per save '
+              f'(median delta {statistics.median(deltas)} bytes, a full copy every {revisions.SNAPSHOT_INTERVAL})')
+        print()
+
+        report('record a save', record_samples)
+        numbers = [rng.randint(1, args.edits) for _ in range(200)]
+        samples = []
+        for number in numbers:
+            start = time.perf_counter()
+            revisions.rebuild(conn, 1, number)
+            samples.append(time.perf_counter() - start)
+        report('rebuild a revision', samples)
+        samples = []
+        for number in numbers[:50]:
+            start = time.perf_counter()
+            revisions.diff(revisions.rebuild(conn, 1, max(number - 1, 1)), revisions.rebuild(conn, 1, number))
+            samples.append(time.perf_counter() - start)
+        report('diff neighbouring revisions', samples)
+        conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Startup-time benchmark.
+
+Measures how long it takes to import the app module, build an app with
+create_app() and serve the first request against a fresh database, then builds
+a batch of isolated app instances (one database file each) side by side.
+
+    python benchmarks/startup.py [--runs 10] [--instances 20]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import ROOT, report
+
+def time_import(runs):
+    """Time `import app` in fresh interpreters"""
+    code = 'import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)'
+    samples = []
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, '-c', code], cwd=ROOT)
+        samples.append(float(output))
+    return samples
+
+def time_first_request(runs, workdir):
+    """Time create_app() and the first request on a fresh database"""
+    import app as blog
+    create_samples = []
+    request_samples = []
+    for i in range(runs):
+        start = time.perf_counter()
+        instance = blog.create_app({'DATABASE': os.path.join(workdir, f'first_{i}.db')})
+        create_samples.append(time.perf_counter() - start)
+        
+        client = instance.test_client()
+        start = time.perf_counter()
+        client.get('/')
+        request_samples.append(time.perf_counter() - start)
+    return create_samples, request_samples
+
+def run_isolated_instances(count, workdir):
+    """Build `count` apps with separate databases and check they stay isolated"""
+    import app as blog
+    start = time.perf_counter()
+    clients = []
+    for i in range(count):
+        instance = blog.create_app({'DATABASE': os.path.join(workdir, f'isolated_{i}.db')})
+        clients.append(instance.test_client())
+    for i, client in enumerate(clients):
+        client.post('/subscribe', data={'email': f'reader{i}@example.com'})
+    elapsed = time.perf_counter() - start
+    
+    import sqlite3
+    for i in range(count):
+        conn = sqlite3.connect(os.path.join(workdir, f'isolated_{i}.db'))
+        rows = conn.execute('SELECT email FROM subscribers').fetchall()
+        conn.close()
+        assert rows == [(f'reader{i}@example.com',)], rows
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--instances', type=int, default=20)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        report('import app', time_import(args.runs))
+        create_samples, request_samples = time_first_request(args.runs, workdir)
+        report('create_app()', create_samples)
+        report('first request (fresh db)', request_samples)
+        elapsed = run_isolated_instances(args.instances, workdir)
+        print(f'{args.instances} isolated instances built and exercised in {elapsed * 1000:.1f} ms')
+
+if __name__ == '__main__':
+    main()
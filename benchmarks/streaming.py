@@ -0,0 +1,53 @@
+"""Time to first byte and peak memory of the archive page.
+
+Renders /archive over a database of 50k articles with STREAM_LISTINGS off
+(fetchall + render_template) and on (chunked cursor reads + streamed
+template), recording the time until the first body chunk, the total time and
+the peak Python memory allocated while serving the request.
+
+    python benchmarks/streaming.py [--articles 50000]
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from common import fill_articles
+
+def measure(blog, db_path, stream):
+    instance = blog.create_app({'DATABASE': db_path, 'TEMPLATE_CACHE_DIR': None, 'STREAM_LISTINGS': stream})
+    client = instance.test_client()
+    client.get('/archive').close()  # compile templates and open the database once
+    
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get('/archive', buffered=False)
+    chunks = iter(response.response)
+    first = next(chunks)
+    ttfb = time.perf_counter() - start
+    size = len(first)
+    for chunk in chunks:
+        size += len(chunk)
+    total = time.perf_counter() - start
+    response.close()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return ttfb, total, peak, size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--articles', type=int, default=50000)
+    args = parser.parse_args()
+    
+    import app as blog
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'bench.db')
+        fill_articles(db_path, args.articles)
+        for label, stream in [('render_template', False), ('streamed', True)]:
+            ttfb, total, peak, size = measure(blog, db_path, stream)
+            print(f'{label:<16} TTFB {ttfb * 1000:8.1f} ms   total {total * 1000:8.1f} ms   '
+                  f'peak memory {peak / 1024 / 1024:7.1f} MiB   body {size / 1024 / 1024:6.1f} MiB')
+
+if __name__ == '__main__':
+    main()
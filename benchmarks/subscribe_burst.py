@@ -0,0 +1,110 @@
+"""Signup burst against a threaded server: no lost and no duplicate subscribers.
+
+Serves the app from a threaded WSGI server and has many client threads POST
+/subscribe at once, each address sent twice from different threads. Checks
+that every address was reported new exactly once and already-subscribed
+once, that the table holds each address exactly once, and prints the
+request rate and the average number of signups committed per transaction.
+
+    python benchmarks/subscribe_burst.py [--emails 5000] [--threads 32]
+"""
+import argparse
+import http.client
+import logging
+import os
+import queue
+import sqlite3
+import tempfile
+import threading
+import time
+import urllib.parse
+
+from werkzeug.serving import make_server
+
+from common import create_database
+
+def client(port, jobs, outcomes, lock):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    counts = {'new': 0, 'existing': 0, 'error': 0}
+    while True:
+        try:
+            email = jobs.get_nowait()
+        except queue.Empty:
+            break
+        body = urllib.parse.urlencode({'email': email, 'name': 'Burst'})
+        try:
+            connection.request('POST', '/subscribe', body=body,
+                               headers={'Content-Type': 'application/x-www-form-urlencoded'})
+            response = connection.getresponse()
+            page = response.read().decode()
+        except (http.client.HTTPException, OSError):
+            connection.close()
+            counts['error'] += 1
+            continue
+        if response.status != 200:
+            counts['error'] += 1
+        elif 'Thanks for subscribing' in page:
+            counts['new'] += 1
+        elif 'already subscribed' in page:
+            counts['existing'] += 1
+        else:
+            counts['error'] += 1
+    with lock:
+        for key, value in counts.items():
+            outcomes[key] += value
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--emails', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=32)
+    args = parser.parse_args()
+
+    import app as blog
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'bench.db')
+        create_database(db_path)
+        instance = blog.create_app({'DATABASE': db_path, 'TEMPLATE_CACHE_DIR': None, 'SLOW_QUERY_THRESHOLD': 0})
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        server = make_server('127.0.0.1', 0, instance, threaded=True)
+        server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+        server_thread.start()
+
+        jobs = queue.Queue()
+        emails = [f'burst{i}@example.com' for i in range(args.emails)]
+        for email in emails:
+            jobs.put(email)
+        for email in emails:
+            jobs.put(email.upper())  # the same address again, normalized by subscribe()
+
+        outcomes = {'new': 0, 'existing': 0, 'error': 0}
+        lock = threading.Lock()
+        threads = [threading.Thread(target=client, args=(server.server_port, jobs, outcomes, lock))
+                   for _ in range(args.threads)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        server.shutdown()
+
+        conn = sqlite3.connect(db_path)
+        rows, distinct = conn.execute('SELECT COUNT(*), COUNT(DISTINCT email) FROM subscribers').fetchone()
+        conn.close()
+        writer = instance.extensions['blog'].writer
+
+        requests = 2 * args.emails
+        print(f'{requests} signups from {args.threads} threads in {elapsed:.2f} s ({requests / elapsed:.0f} req/s)')
+        print(f'responses: {outcomes["new"]} new, {outcomes["existing"]} already subscribed, {outcomes["error"]} errors')
+        print(f'table: {rows} rows, {distinct} distinct emails')
+        if writer and writer.batches:
+            print(f'writer: {writer.statements} statements in {writer.batches} transactions '
+                  f'({writer.statements / writer.batches:.1f} per commit)')
+        ok = (outcomes['new'] == args.emails and outcomes['existing'] == args.emails and not outcomes['error']
+              and rows == distinct == args.emails)
+        print('OK: no lost or duplicate subscribers' if ok else 'FAILED')
+        if not ok:
+            raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
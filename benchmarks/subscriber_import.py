@@ -0,0 +1,71 @@
+"""Throughput of the bulk subscriber import.
+
+Writes a CSV of 100k addresses (a few percent invalid or repeated, with
+mixed case and stray whitespace) and imports it into a fresh database with
+import_subscribers(), then imports it a second time when every address is
+already subscribed. For comparison, a sample of the rows also goes through
+the one-at-a-time path of subscribe(): SELECT, INSERT and commit per row.
+
+    python benchmarks/subscriber_import.py [--rows 100000]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from common import create_database
+
+def write_csv(path, rows):
+    rng = random.Random(1)
+    with open(path, 'w', newline='') as f:
+        f.write('Email,Name\n')
+        for i in range(rows):
+            roll = rng.random()
+            if roll < 0.02:
+                f.write(f'not-an-email-{i},Broken\n')
+            elif roll < 0.05:
+                f.write(f'reader{rng.randrange(max(i, 1))}@example.com,Repeat\n')
+            else:
+                f.write(f'  Reader{i}@Example.com ,Reader {i}\n')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--single-rows', type=int, default=2000, help='rows sent through the one-at-a-time path')
+    args = parser.parse_args()
+    
+    import app as blog
+    with tempfile.TemporaryDirectory() as workdir:
+        csv_path = os.path.join(workdir, 'subscribers.csv')
+        write_csv(csv_path, args.rows)
+        db_path = os.path.join(workdir, 'bench.db')
+        create_database(db_path)
+        instance = blog.create_app({'DATABASE': db_path, 'TEMPLATE_CACHE_DIR': None})
+        
+        with instance.app_context():
+            for label in ('fresh database', 'all duplicates'):
+                start = time.perf_counter()
+                with open(csv_path, encoding='utf-8-sig', newline='') as f:
+                    result = blog.import_subscribers(f)
+                elapsed = time.perf_counter() - start
+                print(f'{label:<18} {args.rows / elapsed:>10.0f} rows/s   {elapsed:6.2f} s   '
+                      f'inserted {result.inserted}, duplicates {result.duplicates}, invalid {result.invalid}')
+        
+        # The subscribe() path: existence check, insert and commit for every address
+        single_path = os.path.join(workdir, 'single.db')
+        create_database(single_path)
+        conn = sqlite3.connect(single_path)
+        start = time.perf_counter()
+        for i in range(args.single_rows):
+            email = f'reader{i}@example.com'
+            if blog.validate_email(email) and not conn.execute('SELECT id FROM subscribers WHERE email = ?', (email,)).fetchone():
+                conn.execute('INSERT INTO subscribers (email, name) VALUES (?, ?)', (email, f'Reader {i}'))
+                conn.commit()
+        elapsed = time.perf_counter() - start
+        conn.close()
+        print(f'{"one at a time":<18} {args.single_rows / elapsed:>10.0f} rows/s   ({args.single_rows} rows)')
+
+if __name__ == '__main__':
+    main()
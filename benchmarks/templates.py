@@ -0,0 +1,69 @@
+"""Template rendering benchmark.
+
+Measures the first /archive request of a cold worker (a fresh interpreter)
+with and without the on-disk bytecode cache, and the steady-state render time
+of archive.html with 1k articles.
+
+    python benchmarks/templates.py [--articles 1000] [--runs 5]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import ROOT, fill_articles, report
+
+COLD_REQUEST = '''
+import sys, time
+t = time.perf_counter()
+import app as blog
+instance = blog.create_app({'DATABASE': sys.argv[1], 'TEMPLATE_CACHE_DIR': sys.argv[2] or None})
+instance.test_client().get('/archive')
+print(time.perf_counter() - t)
+'''
+
+def time_cold_request(db_path, cache_dir, runs):
+    samples = []
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, '-c', COLD_REQUEST, db_path, cache_dir or ''], cwd=ROOT)
+        samples.append(float(output))
+    return samples
+
+def time_steady_render(db_path, runs):
+    """Time render_template('archive.html') with the template already compiled"""
+    import app as blog
+    from flask import render_template
+    instance = blog.create_app({'DATABASE': db_path})
+    with instance.test_request_context('/archive'):
+        conn = blog.get_db()
+        cursor = conn.execute(f'SELECT {blog.ARTICLE_SUMMARY_COLUMNS} FROM articles ORDER BY published_date DESC')
+        articles = blog.fetch_article_summaries(cursor)
+        conn.close()
+        render_template('archive.html', articles=articles)
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            render_template('archive.html', articles=articles)
+            samples.append(time.perf_counter() - start)
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--articles', type=int, default=1000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'bench.db')
+        cache_dir = os.path.join(workdir, 'jinja_cache')
+        fill_articles(db_path, args.articles)
+        
+        report('cold first /archive, no bytecode cache', time_cold_request(db_path, None, args.runs))
+        time_cold_request(db_path, cache_dir, 1)  # populate the cache
+        report('cold first /archive, warm bytecode cache', time_cold_request(db_path, cache_dir, args.runs))
+        report(f'steady render archive.html ({args.articles} rows)', time_steady_render(db_path, args.runs * 10))
+
+if __name__ == '__main__':
+    main()
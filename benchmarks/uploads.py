@@ -0,0 +1,119 @@
+"""Peak memory of concurrent large image uploads.
+
+Serves the app from a threaded WSGI server and has several client threads
+POST a large PNG to /admin/upload_image at the same time, streaming the
+multipart body from disk. Records the peak Python memory allocated by the
+server while they run and checks every upload was stored under its hash.
+
+    python benchmarks/uploads.py [--uploads 8] [--size-mb 15]
+"""
+import argparse
+import hashlib
+import http.client
+import logging
+import os
+import struct
+import tempfile
+import threading
+import time
+import tracemalloc
+import zlib
+
+from werkzeug.serving import make_server
+
+from common import create_database
+
+BOUNDARY = 'benchmark-boundary'
+
+def write_png(path, size):
+    """A 1000x1000 PNG header followed by a private chunk padding it to `size` bytes"""
+    def chunk(kind, body):
+        return struct.pack('>I', len(body)) + kind + body + struct.pack('>I', zlib.crc32(kind + body))
+    head = b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>II', 1000, 1000) + b'\x08\x02\x00\x00\x00')
+    hasher = hashlib.sha256(head)
+    padding = size - len(head) - 12
+    with open(path, 'wb') as f:
+        f.write(head + struct.pack('>I', padding) + b'bnch')
+        hasher.update(struct.pack('>I', padding) + b'bnch')
+        block = b'\0' * (1024 * 1024)
+        crc = zlib.crc32(b'bnch')
+        remaining = padding
+        while remaining:
+            piece = block[:min(remaining, len(block))]
+            f.write(piece)
+            hasher.update(piece)
+            crc = zlib.crc32(piece, crc)
+            remaining -= len(piece)
+        f.write(struct.pack('>I', crc))
+        hasher.update(struct.pack('>I', crc))
+    return hasher.hexdigest()
+
+def upload(port, path, cookie, results, index):
+    start = (f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="image"; filename="big.png"\r\n'
+             'Content-Type: image/png\r\n\r\n').encode()
+    end = f'\r\n--{BOUNDARY}--\r\n'.encode()
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    connection.putrequest('POST', '/admin/upload_image')
+    connection.putheader('Content-Type', f'multipart/form-data; boundary={BOUNDARY}')
+    connection.putheader('Content-Length', str(len(start) + os.path.getsize(path) + len(end)))
+    connection.putheader('Cookie', cookie)
+    connection.endheaders()
+    connection.send(start)
+    with open(path, 'rb') as f:
+        for piece in iter(lambda: f.read(64 * 1024), b''):
+            connection.send(piece)
+    connection.send(end)
+    response = connection.getresponse()
+    results[index] = (response.status, response.read().decode())
+    connection.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--uploads', type=int, default=8)
+    parser.add_argument('--size-mb', type=float, default=15)
+    args = parser.parse_args()
+
+    import app as blog
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'bench.db')
+        create_database(db_path)
+        instance = blog.create_app({'DATABASE': db_path, 'TEMPLATE_CACHE_DIR': None,
+                                    'UPLOAD_FOLDER': os.path.join(workdir, 'uploads')})
+        client = instance.test_client()
+        with client.session_transaction() as session:
+            session['admin_logged_in'] = True
+        cookie = f'session={client.get_cookie("session").value}'
+
+        size = int(args.size_mb * 1024 * 1024)
+        paths = [os.path.join(workdir, f'upload{i}.png') for i in range(args.uploads)]
+        digests = [write_png(path, size - i) for i, path in enumerate(paths)]
+
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        server = make_server('127.0.0.1', 0, instance, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        results = [None] * args.uploads
+        threads = [threading.Thread(target=upload, args=(server.server_port, path, cookie, results, i))
+                   for i, path in enumerate(paths)]
+        tracemalloc.start()
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        server.shutdown()
+
+        stored = set(os.listdir(os.path.join(workdir, 'uploads')))
+        ok = all(status == 200 for status, _ in results) and all(f'{digest}.png' in stored for digest in digests)
+        total_mb = args.uploads * args.size_mb
+        print(f'{args.uploads} concurrent uploads of {args.size_mb:.0f} MiB ({total_mb:.0f} MiB) in {elapsed:.2f} s')
+        print(f'peak Python memory while serving: {peak / 2**20:.1f} MiB')
+        print('OK: every upload stored under its hash' if ok else f'FAILED: {results}')
+        if not ok:
+            raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
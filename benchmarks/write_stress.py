@@ -0,0 +1,147 @@
+"""Write stress across worker processes: no request fails with "database is locked".
+
+Starts several server processes on one database file, as gunicorn workers
+would be, each a threaded WSGI server with its own batched writer, and has
+many client threads send a mix of likes, signups and the four tracking
+calls to all of them at once. Checks that every request succeeded, that
+the tables hold exactly the rows the responses reported, and prints the
+request rate, the writes committed per transaction and the batches that
+had to be retried after waiting for another process.
+
+    python benchmarks/write_stress.py [--workers 4] [--threads 64] [--requests 200]
+"""
+import argparse
+import http.client
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import urllib.parse
+
+from common import fill_articles
+
+ARTICLES = 20
+
+def serve(db_path, ports, stats, stop):
+    import app as blog
+    from werkzeug.serving import make_server
+    instance = blog.create_app({'DATABASE': db_path, 'TEMPLATE_CACHE_DIR': None, 'SLOW_QUERY_THRESHOLD': 0,
+                                'METRICS_ENABLED': False})
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, instance, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    ports.put(server.server_port)
+    stop.wait()
+    server.shutdown()
+    writer = instance.extensions['blog'].writer
+    stats.put((writer.statements, writer.batches, writer.retried) if writer else (0, 0, 0))
+
+def client(number, ports, requests, outcomes, lock):
+    """Send `requests` rounds of writes as one viewer, spread over the server processes"""
+    token = f'stress-{number}'
+    connections = [http.client.HTTPConnection('127.0.0.1', port, timeout=60) for port in ports]
+    counts = {'requests': 0, 'errors': 0, 'page_views': 0, 'article_views': 0, 'subscribers': 0}
+
+    def send(method, path, body=None, content_type='application/json'):
+        connection = connections[counts['requests'] % len(connections)]
+        counts['requests'] += 1
+        headers = {'Cookie': f'viewer_token={token}', 'Content-Type': content_type}
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            data = response.read()
+        except (http.client.HTTPException, OSError):
+            connection.close()
+            counts['errors'] += 1
+            return None
+        if response.status != 200:
+            counts['errors'] += 1
+            return None
+        return data
+
+    for round_number in range(requests):
+        slug = f'article-{(number + round_number) % ARTICLES}'
+        send('POST', f'/article/{slug}/like')
+
+        data = send('POST', '/track/view/start', json.dumps({'path': f'/article/{slug}', 'user_agent': 'stress'}))
+        if data is not None:
+            counts['page_views'] += 1
+            send('POST', '/track/view/end', json.dumps({'view_id': json.loads(data)['view_id'], 'duration_seconds': 3}))
+
+        data = send('POST', '/track/article/start', json.dumps({'article_id': 1}))
+        if data is not None:
+            counts['article_views'] += 1
+            send('POST', '/track/article/end', json.dumps({'view_id': json.loads(data)['view_id'], 'duration_seconds': 3}))
+
+        if round_number % 10 == 0:
+            body = urllib.parse.urlencode({'email': f'{token}-{round_number}@example.com'})
+            if send('POST', '/subscribe', body, 'application/x-www-form-urlencoded') is not None:
+                counts['subscribers'] += 1
+    with lock:
+        for key, value in counts.items():
+            outcomes[key] += value
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=64)
+    parser.add_argument('--requests', type=int, default=200, help='rounds of writes per client thread')
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('fork')
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'bench.db')
+        fill_articles(db_path, ARTICLES)
+
+        ports, stats, stop = context.Queue(), context.Queue(), context.Event()
+        workers = [context.Process(target=serve, args=(db_path, ports, stats, stop)) for _ in range(args.workers)]
+        for worker in workers:
+            worker.start()
+        worker_ports = [ports.get(timeout=60) for _ in workers]
+
+        outcomes = {'requests': 0, 'errors': 0, 'page_views': 0, 'article_views': 0, 'subscribers': 0}
+        lock = threading.Lock()
+        threads = [threading.Thread(target=client, args=(number, worker_ports, args.requests, outcomes, lock))
+                   for number in range(args.threads)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        stop.set()
+        totals = [stats.get(timeout=60) for _ in workers]
+        for worker in workers:
+            worker.join()
+
+        conn = sqlite3.connect(db_path)
+        counts = {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                  for table in ('page_views', 'article_views', 'subscribers')}
+        unfinished = conn.execute('SELECT COUNT(*) FROM page_views WHERE duration_seconds IS NULL').fetchone()[0]
+        unfinished += conn.execute('SELECT COUNT(*) FROM article_views WHERE duration_seconds IS NULL').fetchone()[0]
+        conn.close()
+
+        statements = sum(total[0] for total in totals)
+        batches = sum(total[1] for total in totals)
+        retried = sum(total[2] for total in totals)
+        print(f'{outcomes["requests"]} write requests from {args.threads} threads to {args.workers} processes '
+              f'in {elapsed:.2f} s ({outcomes["requests"] / elapsed:.0f} req/s)')
+        print(f'errors: {outcomes["errors"]}')
+        print(f'tables: {counts["page_views"]} page views, {counts["article_views"]} article views, '
+              f'{counts["subscribers"]} subscribers, {unfinished} views without a duration')
+        if batches:
+            print(f'writers: {statements} writes in {batches} transactions ({statements / batches:.1f} per commit), '
+                  f'{retried} batches retried')
+        ok = (not outcomes['errors'] and not unfinished
+              and all(counts[table] == outcomes[table] for table in counts))
+        print('OK: no failed writes' if ok else 'FAILED')
+        if not ok:
+            raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Compressed storage of article bodies.
+
+The editor HTML of an article and its compiled body live in the
+article_bodies table, compressed, rather than in articles: listing queries
+and everything else that scans articles then reads a few hundred bytes per
+row instead of tens of kilobytes, and more of the table fits in SQLite's
+page cache. Bodies are compressed with zstd when the zstandard package is
+installed and with zlib otherwise; each row records its codec, so rows
+written either way can be read as long as zstandard stays installed once
+it has been used.
+
+BodyCache keeps decompressed bodies of recently read articles in memory,
+bounded by their total size.
+"""
+import threading
+import zlib
+from collections import OrderedDict
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CODEC = 'zstd' if zstandard else 'zlib'
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 10
+
+def compress(text, codec=CODEC):
+    data = text.encode()
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return zlib.compress(data, ZLIB_LEVEL)
+
+def decompress(data, codec):
+    if data is None:
+        return None
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('This article body is compressed with zstd; install the zstandard package to read it')
+        return zstandard.ZstdDecompressor().decompress(data).decode()
+    return zlib.decompress(data).decode()
+
+def store(conn, article_id, source, compiled):
+    """Save the editor HTML and compiled body of an article, replacing what it had"""
+    conn.execute('''
+        INSERT INTO article_bodies (article_id, codec, source, compiled) VALUES (?, ?, ?, ?)
+        ON CONFLICT (article_id) DO UPDATE SET codec = excluded.codec, source = excluded.source, compiled = excluded.compiled
+    ''', (article_id, CODEC, compress(source), compress(compiled) if compiled is not None else None))
+
+def load(conn, article_id, column='compiled'):
+    """The decompressed `source` or `compiled` body of an article, or None"""
+    if column not in ('source', 'compiled'):
+        raise ValueError(column)
+    row = conn.execute(f'SELECT codec, {column} FROM article_bodies WHERE article_id = ?', (article_id,)).fetchone()
+    return decompress(row[1], row[0]) if row else None
+
+class BodyCache:
+    """Least recently used decompressed bodies, up to a total number of characters"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.size = 0
+
+    def get(self, key):
+        with self.lock:
+            body = self.entries.get(key)
+            if body is not None:
+                self.entries.move_to_end(key)
+            return body
+
+    def put(self, key, body, max_size):
+        # A body over a quarter of the budget would push out most of the others
+        if len(body) > max_size // 4:
+            return
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self.entries[key] = body
+            self.size += len(body)
+            while self.size > max_size:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
@@ -0,0 +1,247 @@
+"""Save-time compiler for article HTML produced by the Quill editor.
+
+compile_content() sanitizes the editor output against an allowlist, drops
+redundant markup and indentation whitespace, prepares images for lazy
+loading and derives a plain-text excerpt and reading time. It runs once when
+an article is saved; article pages serve the stored result as-is.
+"""
+import html
+import re
+from collections import namedtuple
+from html.parser import HTMLParser
+
+ALLOWED_TAGS = {
+    'p', 'br', 'span', 'strong', 'b', 'em', 'i', 'u', 's', 'sub', 'sup',
+    'a', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'li',
+    'blockquote', 'pre', 'code', 'img', 'hr',
+}
+
+BLOCK_TAGS = {
+    'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'li',
+    'blockquote', 'pre', 'hr', 'br',
+}
+
+VOID_TAGS = {'br', 'img', 'hr'}
+
+# Dropped together with everything inside them
+DROP_CONTENT_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'template', 'noscript', 'svg', 'math'}
+
+ALLOWED_STYLES = {'color', 'background-color', 'text-align'}
+
+# Declarations that only restate the browser default
+REDUNDANT_STYLES = {
+    ('background-color', 'transparent'),
+    ('color', 'inherit'),
+    ('text-align', 'left'),
+    ('text-align', 'start'),
+}
+
+SAFE_STYLE_VALUE = re.compile(r'^[#\w\s(),.%-]+$')
+SAFE_LINK = re.compile(r'^(?:https?:|mailto:|/|#|[^:/?#]+(?:[/?#]|$))', re.IGNORECASE)
+SAFE_IMAGE_SRC = re.compile(r'^(?:https?:|/|data:image/(?:png|jpeg|gif|webp);base64,)', re.IGNORECASE)
+WHITESPACE = re.compile(r'\s+')
+
+EXCERPT_LENGTH = 200
+WORDS_PER_MINUTE = 200
+
+CompiledContent = namedtuple('CompiledContent', ['html', 'excerpt', 'reading_minutes'])
+
+class _ContentCompiler(HTMLParser):
+    def __init__(self, resolve_image_size):
+        super().__init__(convert_charrefs=False)
+        self.resolve_image_size = resolve_image_size
+        self.out = []
+        self.text = []
+        # Open elements as (tag, emitted, output index at open)
+        self.stack = []
+        self.drop_depth = 0
+        self.pre_depth = 0
+        self.at_block_boundary = True
+        self.last_was_text = False
+
+    # Output helpers
+
+    def emit_tag(self, tag, markup):
+        if tag in BLOCK_TAGS:
+            if self.last_was_text and not self.pre_depth:
+                self.out[-1] = self.out[-1].rstrip(' ')
+            self.at_block_boundary = True
+            self.text.append(' ')
+        else:
+            self.at_block_boundary = False
+        self.last_was_text = False
+        self.out.append(markup)
+
+    def emit_text(self, markup, plain):
+        if not self.pre_depth:
+            if self.at_block_boundary:
+                markup = markup.lstrip(' ')
+                plain = plain.lstrip(' ')
+            if self.last_was_text and self.out[-1].endswith(' '):
+                markup = markup.lstrip(' ')
+        if not markup:
+            return
+        self.out.append(markup)
+        self.text.append(plain)
+        self.at_block_boundary = False
+        self.last_was_text = True
+
+    # Attribute filters
+
+    def clean_style(self, value):
+        declarations = []
+        for declaration in value.split(';'):
+            name, _, style_value = declaration.partition(':')
+            name = name.strip().lower()
+            style_value = style_value.strip()
+            if (name in ALLOWED_STYLES and style_value and SAFE_STYLE_VALUE.match(style_value)
+                    and (name, style_value.lower()) not in REDUNDANT_STYLES):
+                declarations.append(f'{name}: {style_value}')
+        return '; '.join(declarations)
+
+    def clean_attrs(self, tag, attrs):
+        cleaned = []
+        for name, value in attrs:
+            if value is None:
+                continue
+            if name == 'class':
+                value = ' '.join(c for c in value.split() if c.startswith('ql-'))
+            elif name == 'style':
+                value = self.clean_style(value)
+            elif tag == 'a' and name == 'href':
+                value = value.strip()
+                if not SAFE_LINK.match(value):
+                    continue
+            elif tag == 'a' and name == 'target':
+                if value != '_blank':
+                    continue
+            elif tag == 'img' and name == 'src':
+                value = value.strip()
+                if not SAFE_IMAGE_SRC.match(value):
+                    continue
+            elif tag == 'img' and name in ('alt', 'width', 'height'):
+                if name != 'alt' and not value.isdigit():
+                    continue
+            else:
+                continue
+            if value or name == 'alt':
+                cleaned.append((name, value))
+        return cleaned
+
+    def img_attrs(self, attrs):
+        attrs = dict(attrs)
+        if 'src' not in attrs:
+            return None
+        if 'width' not in attrs or 'height' not in attrs:
+            size = self.resolve_image_size(attrs['src']) if self.resolve_image_size else None
+            if size:
+                attrs['width'], attrs['height'] = str(size[0]), str(size[1])
+        attrs.setdefault('alt', '')
+        attrs['loading'] = 'lazy'
+        attrs['decoding'] = 'async'
+        return list(attrs.items())
+
+    # Parser callbacks
+
+    def handle_starttag(self, tag, attrs):
+        if self.drop_depth or tag in DROP_CONTENT_TAGS:
+            if tag not in VOID_TAGS:
+                self.drop_depth += 1
+            return
+        if tag not in ALLOWED_TAGS:
+            if tag not in VOID_TAGS:
+                self.stack.append((tag, False, len(self.out)))
+            return
+
+        attrs = self.clean_attrs(tag, attrs)
+        if tag == 'img':
+            attrs = self.img_attrs(attrs)
+            if attrs is None:
+                return
+        if tag == 'a' and dict(attrs).get('target') == '_blank':
+            attrs.append(('rel', 'noopener noreferrer'))
+
+        # A span without attributes adds nothing
+        emitted = not (tag == 'span' and not attrs)
+        if emitted:
+            rendered = ''.join(f' {name}="{html.escape(value)}"' for name, value in attrs)
+            self.emit_tag(tag, f'<{tag}{rendered}>')
+        if tag not in VOID_TAGS:
+            self.stack.append((tag, emitted, len(self.out) - 1 if emitted else len(self.out)))
+            if tag == 'pre':
+                self.pre_depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self.drop_depth:
+            if tag not in VOID_TAGS:
+                self.drop_depth -= 1
+            return
+        if tag in VOID_TAGS or not any(open_tag == tag for open_tag, _, _ in self.stack):
+            return
+        while self.stack:
+            open_tag, emitted, index = self.stack.pop()
+            if emitted:
+                self.close_element(open_tag, index)
+                if open_tag == 'pre':
+                    self.pre_depth -= 1
+            if open_tag == tag:
+                break
+
+    def close_element(self, tag, index):
+        # Drop elements that ended up with no content, except list items
+        if tag != 'li' and all(not piece.strip() for piece in self.out[index + 1:]):
+            del self.out[index:]
+            self.last_was_text = False
+            return
+        self.emit_tag(tag, f'</{tag}>')
+
+    def handle_data(self, data):
+        if self.drop_depth:
+            return
+        if self.pre_depth:
+            self.emit_text(html.escape(data, quote=False), data)
+        else:
+            data = WHITESPACE.sub(' ', data)
+            self.emit_text(html.escape(data, quote=False), data)
+
+    def handle_entityref(self, name):
+        if not self.drop_depth:
+            self.emit_text(f'&{name};', html.unescape(f'&{name};'))
+
+    def handle_charref(self, name):
+        if not self.drop_depth:
+            self.emit_text(f'&#{name};', html.unescape(f'&#{name};'))
+
+    def close_all(self):
+        while self.stack:
+            open_tag, emitted, index = self.stack.pop()
+            if emitted:
+                self.close_element(open_tag, index)
+
+def make_excerpt(text, length=EXCERPT_LENGTH):
+    """Cut plain text to about `length` characters at a word boundary"""
+    if len(text) <= length:
+        return text
+    cut = text[:length].rsplit(' ', 1)[0]
+    return cut.rstrip(' ,;:.') + '…'
+
+def compile_content(source_html, resolve_image_size=None):
+    """Compile editor HTML into the stored article body.
+
+    `resolve_image_size(src)` may return (width, height) for an image source
+    so it can be written into the <img> tag. Returns a CompiledContent.
+    """
+    compiler = _ContentCompiler(resolve_image_size)
+    compiler.feed(source_html or '')
+    compiler.close()
+    compiler.close_all()
+
+    plain = WHITESPACE.sub(' ', ''.join(compiler.text).replace('\xa0', ' ')).strip()
+    words = len(plain.split())
+    reading_minutes = max(1, round(words / WORDS_PER_MINUTE)) if words else 0
+    return CompiledContent(''.join(compiler.out).strip(), make_excerpt(plain), reading_minutes)
@@ -0,0 +1,149 @@
+"""Critical CSS: the part of the stylesheet a page needs for its first paint.
+
+extract() keeps the rules of a stylesheet whose selectors match elements in
+a rendered page, so a page template can inline them in <head> and load the
+full stylesheet without blocking rendering. Matching is by tag, class and
+id only: pseudo-classes and attribute selectors are ignored, rules that
+only apply on interaction (:hover, :focus, ...) are left to the full
+stylesheet, and descendant tag rules under a container in the page (such as
+`.article-content blockquote`) are kept because the content inside varies
+from page to page.
+"""
+import re
+from html.parser import HTMLParser
+
+COMMENT = re.compile(r'/\*.*?\*/', re.DOTALL)
+WHITESPACE = re.compile(r'\s+')
+# Spaces that can go: around punctuation in declarations (not + or -, which calc() needs) and combinators in selectors
+DECLARATION_SPACE = re.compile(r'\s*([{};:,])\s*')
+SELECTOR_SPACE = re.compile(r'\s*([,>+~])\s*')
+INTERACTION = re.compile(r':(?:hover|focus|focus-within|focus-visible|active|visited)\b')
+PSEUDO = re.compile(r'::?[\w-]+(?:\([^)]*\))?')
+ATTRIBUTE = re.compile(r'\[[^\]]*\]')
+COMBINATOR = re.compile(r'\s*[>+~]\s*|\s+')
+COMPOUND = re.compile(r'^(?P<tag>[\w-]+|\*)?(?P<rest>.*)$')
+CLASS = re.compile(r'\.([\w-]+)')
+ID = re.compile(r'#([\w-]+)')
+
+# At-rules whose blocks hold ordinary rules to filter; any other block (@font-face, @keyframes) is kept whole
+GROUPING_RULES = ('@media', '@supports')
+
+class PageNames(HTMLParser):
+    """Tags, classes and ids of the elements in a page, outside scripts"""
+
+    def __init__(self):
+        super().__init__()
+        self.tags = {'html', 'body'}
+        self.classes = set()
+        self.ids = set()
+        self.skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('script', 'noscript', 'template'):
+            self.skip += 1
+        if self.skip:
+            return
+        self.tags.add(tag)
+        for name, value in attrs:
+            if name == 'class' and value:
+                self.classes.update(value.split())
+            elif name == 'id' and value:
+                self.ids.add(value)
+
+    def handle_endtag(self, tag):
+        if tag in ('script', 'noscript', 'template') and self.skip:
+            self.skip -= 1
+
+def page_names(html):
+    parser = PageNames()
+    parser.feed(html)
+    parser.close()
+    return parser
+
+def parse_blocks(css):
+    """Split CSS into (prelude, body) pairs at the top level; bodies of at-rules are left unparsed"""
+    blocks = []
+    depth = 0
+    start = 0
+    prelude = None
+    for index, char in enumerate(css):
+        if char == '{':
+            if depth == 0:
+                prelude = css[start:index].strip()
+                start = index + 1
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                blocks.append((prelude, css[start:index].strip()))
+                start = index + 1
+        elif char == ';' and depth == 0:
+            # A statement at-rule such as @import or @charset
+            blocks.append((css[start:index].strip(), None))
+            start = index + 1
+    return blocks
+
+def split_selectors(prelude):
+    """Split a selector list on commas outside parentheses"""
+    selectors = []
+    depth = 0
+    current = []
+    for char in prelude:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            selectors.append(''.join(current).strip())
+            current = []
+            continue
+        current.append(char)
+    selectors.append(''.join(current).strip())
+    return [selector for selector in selectors if selector]
+
+def compound_matches(compound, names):
+    match = COMPOUND.match(compound)
+    tag = match.group('tag')
+    rest = match.group('rest')
+    if tag and tag != '*' and tag.lower() not in names.tags:
+        return False
+    return (all(name in names.classes for name in CLASS.findall(rest))
+            and all(name in names.ids for name in ID.findall(rest)))
+
+def selector_matches(selector, names):
+    if INTERACTION.search(selector):
+        return False
+    selector = ATTRIBUTE.sub('', PSEUDO.sub('', selector)).strip()
+    compounds = [compound for compound in COMBINATOR.split(selector) if compound]
+    if not compounds:
+        return True  # Only pseudo-classes, e.g. :root
+    if all(compound_matches(compound, names) for compound in compounds):
+        return True
+    # A container on the page with tag-only descendants: content varies per page
+    return (compound_matches(compounds[0], names) and (CLASS.search(compounds[0]) or ID.search(compounds[0]))
+            and all(COMPOUND.match(compound).group('rest') == '' for compound in compounds[1:]))
+
+def minify(text, space=DECLARATION_SPACE):
+    return space.sub(r'\1', WHITESPACE.sub(' ', text)).strip()
+
+def filter_rules(blocks, names):
+    kept = []
+    for prelude, body in blocks:
+        if body is None:
+            kept.append(minify(prelude) + ';')
+        elif prelude.startswith(GROUPING_RULES):
+            inner = filter_rules(parse_blocks(body), names)
+            if inner:
+                kept.append(WHITESPACE.sub(' ', prelude) + '{' + ''.join(inner) + '}')
+        elif prelude.startswith('@'):
+            kept.append(minify(prelude) + '{' + minify(body) + '}')
+        else:
+            # A whole selector list is kept when one of it matches: `h1, h2, h3` stays one rule
+            if any(selector_matches(selector, names) for selector in split_selectors(prelude)):
+                kept.append(minify(prelude, SELECTOR_SPACE) + '{' + minify(body).rstrip(';') + '}')
+    return kept
+
+def extract(stylesheet, html):
+    """Minified rules of `stylesheet` that apply to the elements of `html`"""
+    blocks = parse_blocks(COMMENT.sub('', stylesheet))
+    return ''.join(filter_rules(blocks, page_names(html)))
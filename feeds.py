@@ -0,0 +1,87 @@
+"""RSS feed and sitemap documents built from article summaries.
+
+The builders only produce bytes; the app stores them in the
+generated_documents table when articles change and serves them from there
+with an ETag, so feed readers and crawlers polling them mostly get 304s.
+"""
+import itertools
+import re
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from xml.sax.saxutils import escape
+
+# Most URLs in one sitemap file (the limit set by the sitemaps protocol)
+SITEMAP_MAX_URLS = 50000
+
+DATE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+def parse_date(value):
+    """A published_date as a UTC datetime, or None if it is not YYYY-MM-DD"""
+    if not value or not DATE.match(str(value)):
+        return None
+    try:
+        return datetime.strptime(str(value), '%Y-%m-%d').replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+def build_feed(title, site_url, feed_url, description, items):
+    """RSS 2.0 feed of (title, url, published_date, summary) items"""
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom">\n<channel>\n'
+        f'<title>{escape(title)}</title>\n<link>{escape(site_url)}</link>\n'
+        f'<description>{escape(description)}</description>\n'
+        f'<atom:link href="{escape(feed_url)}" rel="self" type="application/rss+xml"/>\n'
+    ]
+    for item_title, url, published_date, summary in items:
+        parts.append(f'<item>\n<title>{escape(item_title)}</title>\n<link>{escape(url)}</link>\n'
+                     f'<guid isPermaLink="true">{escape(url)}</guid>\n')
+        published = parse_date(published_date)
+        if published:
+            parts.append(f'<pubDate>{format_datetime(published)}</pubDate>\n')
+        if summary:
+            parts.append(f'<description>{escape(summary)}</description>\n')
+        parts.append('</item>\n')
+    parts.append('</channel>\n</rss>\n')
+    return ''.join(parts).encode()
+
+def build_urlset(entries):
+    """A sitemap of (url, lastmod) entries; lastmod may be None"""
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n'
+             '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n']
+    for url, lastmod in entries:
+        parts.append(f'<url><loc>{escape(url)}</loc>')
+        if parse_date(lastmod):
+            parts.append(f'<lastmod>{lastmod}</lastmod>')
+        parts.append('</url>\n')
+    parts.append('</urlset>\n')
+    return ''.join(parts).encode()
+
+def build_sitemap_index(urls):
+    """A sitemap index listing the given sitemap URLs"""
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n'
+             '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n']
+    parts.extend(f'<sitemap><loc>{escape(url)}</loc></sitemap>\n' for url in urls)
+    parts.append('</sitemapindex>\n')
+    return ''.join(parts).encode()
+
+def build_sitemaps(entries, part_url, max_urls=SITEMAP_MAX_URLS):
+    """{'sitemap.xml': ..., 'sitemap-1.xml': ...} for an iterable of (url, lastmod).
+
+    Up to `max_urls` entries make a single sitemap.xml. Past that they are
+    split into numbered parts and sitemap.xml becomes an index of
+    part_url(1), part_url(2), and so on.
+    """
+    entries = iter(entries)
+    first = list(itertools.islice(entries, max_urls + 1))
+    if len(first) <= max_urls:
+        return {'sitemap.xml': build_urlset(first)}
+
+    documents = {'sitemap-1.xml': build_urlset(first[:max_urls])}
+    chunk = first[max_urls:]
+    while chunk:
+        chunk.extend(itertools.islice(entries, max_urls - len(chunk)))
+        documents[f'sitemap-{len(documents) + 1}.xml'] = build_urlset(chunk)
+        chunk = list(itertools.islice(entries, max_urls))
+    documents['sitemap.xml'] = build_sitemap_index(part_url(number) for number in range(1, len(documents) + 1))
+    return documents
@@ -0,0 +1,38 @@
+# Gunicorn configuration: `gunicorn app:app` picks this file up automatically.
+import gc
+import os
+import shutil
+import tempfile
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+
+# Import the app once in the master and fork workers from it. The app object
+# opens no database connections or files at import time, so workers share the
+# imported code pages copy-on-write and create their own connections on first
+# request.
+preload_app = True
+
+# Workers write their metrics snapshots here so /admin/metrics covers all of them.
+# A directory made here lives as long as the master that made it: on_exit removes
+# it. The owner is kept in the environment since a HUP reload re-reads this file.
+if not os.environ.get('METRICS_DIR'):
+    os.environ['METRICS_DIR'] = tempfile.mkdtemp(prefix='tsyoj-metrics-')
+    os.environ['METRICS_DIR_OWNER'] = str(os.getpid())
+
+def pre_fork(server, worker):
+    # Move everything allocated so far into the permanent generation so the
+    # garbage collector does not touch (and thereby copy) those pages in workers
+    gc.freeze()
+
+def when_ready(server):
+    # Compile all templates once in the master (loading them from the on-disk
+    # bytecode cache when possible) so every forked worker starts warm
+    from app import app, warm_critical_css, warm_templates
+    warm_templates(app)
+    # Built once here, before the workers start, so none of them builds it on a request
+    warm_critical_css(app)
+
+def on_exit(server):
+    if os.environ.get('METRICS_DIR_OWNER') == str(os.getpid()):
+        shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
@@ -0,0 +1,107 @@
+"""Image type and dimension detection from header bytes"""
+import base64
+import io
+import struct
+
+# JPEG start-of-frame markers carry the image size; C4, C8 and CC are not frames
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+def sniff_image(fileobj):
+    """Return (kind, width, height) for a PNG, GIF, WebP or JPEG file object, or None.
+
+    Only the header is read: a few dozen bytes, or for JPEG the segment
+    headers up to the first frame. The file position is left undefined.
+    """
+    head = fileobj.read(32)
+
+    if head.startswith(b'\x89PNG\r\n\x1a\n') and head[12:16] == b'IHDR':
+        width, height = struct.unpack('>II', head[16:24])
+        return 'png', width, height
+
+    if head[:6] in (b'GIF87a', b'GIF89a') and len(head) >= 10:
+        width, height = struct.unpack('<HH', head[6:10])
+        return 'gif', width, height
+
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP' and len(head) >= 30:
+        chunk = head[12:16]
+        if chunk == b'VP8 ' and head[23:26] == b'\x9d\x01\x2a':
+            width, height = struct.unpack('<HH', head[26:30])
+            return 'webp', width & 0x3FFF, height & 0x3FFF
+        if chunk == b'VP8L' and head[20] == 0x2F:
+            bits = int.from_bytes(head[21:25], 'little')
+            return 'webp', (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b'VP8X':
+            width = int.from_bytes(head[24:27], 'little') + 1
+            height = int.from_bytes(head[27:30], 'little') + 1
+            return 'webp', width, height
+        return None
+
+    if head[:2] == b'\xff\xd8':
+        fileobj.seek(2 - len(head), io.SEEK_CUR)
+        return _sniff_jpeg(fileobj)
+
+    return None
+
+def _sniff_jpeg(fileobj):
+    """Walk JPEG segment headers until a start-of-frame marker"""
+    while True:
+        byte = fileobj.read(1)
+        while byte == b'\xff':
+            byte = fileobj.read(1)  # fill bytes
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker == 0xD8 or 0xD0 <= marker <= 0xD7 or marker == 0x01:
+            continue  # markers without a length
+        length_bytes = fileobj.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack('>H', length_bytes)[0]
+        if marker in JPEG_SOF_MARKERS:
+            frame = fileobj.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack('>HH', frame[1:5])
+            return 'jpeg', width, height
+        if marker == 0xD9 or length < 2:
+            return None
+        fileobj.seek(length - 2, io.SEEK_CUR)
+        if fileobj.read(1) != b'\xff':
+            return None
+
+def sniff_image_bytes(data):
+    """sniff_image() for image data already in memory"""
+    return sniff_image(io.BytesIO(data))
+
+# Longest side, in pixels, of the inline preview shown while an image loads
+PLACEHOLDER_SIZE = 8
+
+def image_placeholder(path):
+    """(dominant colour as #rrggbb, tiny PNG preview as a data: URI) for an image file.
+
+    Returns None when the file cannot be decoded, or when Pillow (which does
+    the decoding) is not installed.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    try:
+        with Image.open(path) as image:
+            # JPEGs are decoded at a fraction of their size when that is enough
+            image.draft('RGB', (PLACEHOLDER_SIZE * 8, PLACEHOLDER_SIZE * 8))
+            if image.mode in ('RGBA', 'LA', 'PA', 'P') or 'transparency' in image.info:
+                rgba = image.convert('RGBA')
+                image = Image.alpha_composite(Image.new('RGBA', rgba.size, (255, 255, 255, 255)), rgba)
+            image = image.convert('RGB')
+            image.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+    quantized = image.quantize(4)
+    _, index = max(quantized.getcolors())
+    red, green, blue = quantized.getpalette()[index * 3:index * 3 + 3]
+    preview = io.BytesIO()
+    image.save(preview, 'PNG', optimize=True)
+    return (f'#{red:02x}{green:02x}{blue:02x}',
+            'data:image/png;base64,' + base64.b64encode(preview.getvalue()).decode())
@@ -0,0 +1,263 @@
+"""Lightweight request, SQL and template instrumentation.
+
+Each worker process keeps its own histograms in a MetricsRegistry. When a
+shared directory is configured, workers periodically write a JSON snapshot
+there so any worker can report numbers for the whole server by merging the
+snapshots of all of them.
+"""
+import bisect
+import cProfile
+import io
+import itertools
+import json
+import os
+import pstats
+import sqlite3
+import threading
+import time
+
+# Upper bounds of the histogram buckets, in seconds
+TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Upper bounds of the buckets for statements per request
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+HISTOGRAMS = {
+    'request_duration_seconds': ('endpoint', TIME_BUCKETS, 'Request latency by endpoint'),
+    'request_sql_statements': ('endpoint', COUNT_BUCKETS, 'SQL statements executed per request'),
+    'request_sql_duration_seconds': ('endpoint', TIME_BUCKETS, 'Time spent in SQL per request'),
+    'template_render_seconds': ('template', TIME_BUCKETS, 'Template render time'),
+}
+
+PROFILE_LINES = 40
+
+class Histogram:
+    """Per-bucket counts plus sum and count, like a Prometheus histogram.
+
+    Counts are kept per bucket, not cumulatively; render_prometheus() adds
+    them up on output.
+    """
+
+    __slots__ = ('bounds', 'counts', 'total', 'count')
+
+    def __init__(self, bounds, counts=None, total=0.0, count=0):
+        self.bounds = bounds
+        # One slot per bound plus the +Inf bucket
+        self.counts = list(counts) if counts else [0] * (len(bounds) + 1)
+        self.total = total
+        self.count = count
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def merge(self, other):
+        for i, value in enumerate(other.counts):
+            self.counts[i] += value
+        self.total += other.total
+        self.count += other.count
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating inside the bucket it falls in"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.bounds[-1]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.bounds[-1]
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self):
+        return {'counts': self.counts, 'total': self.total, 'count': self.count}
+
+class MetricsRegistry:
+    """Per-process histograms and the slowest profiled requests"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.profiles = []
+        self.last_flush = 0.0
+
+    def observe(self, name, label, value):
+        key = (name, label)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(HISTOGRAMS[name][1])
+            histogram.observe(value)
+
+    def add_profile(self, duration, endpoint, path, profiler, keep):
+        """Keep the profile if the request is among the `keep` slowest seen"""
+        with self.lock:
+            if len(self.profiles) >= keep and duration <= self.profiles[-1]['duration']:
+                return
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(PROFILE_LINES)
+        entry = {
+            'duration': duration,
+            'endpoint': endpoint,
+            'path': path,
+            'time': time.time(),
+            'pid': os.getpid(),
+            'stats': output.getvalue(),
+        }
+        with self.lock:
+            self.profiles.append(entry)
+            self.profiles.sort(key=lambda p: p['duration'], reverse=True)
+            del self.profiles[keep:]
+
+    def snapshot(self):
+        """A JSON-serializable copy of this process's metrics"""
+        with self.lock:
+            return {
+                'pid': os.getpid(),
+                'histograms': [[name, label, h.to_dict()] for (name, label), h in self.histograms.items()],
+                'profiles': list(self.profiles),
+            }
+
+    def flush(self, directory, interval):
+        """Write this process's snapshot into `directory` at most every `interval` seconds"""
+        now = time.monotonic()
+        if now - self.last_flush < interval:
+            return
+        self.last_flush = now
+        write_snapshot(directory, self.snapshot())
+
+def write_snapshot(directory, snapshot):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{snapshot['pid']}.json")
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(temp_path, path)
+
+def read_snapshots(directory, max_age):
+    """Load the snapshots written by all workers in the last `max_age` seconds"""
+    snapshots = []
+    if not directory or not os.path.isdir(directory):
+        return snapshots
+    cutoff = time.time() - max_age
+    for name in os.listdir(directory):
+        if not name.endswith('.json'):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                continue
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue  # Being replaced or removed right now
+    return snapshots
+
+def merge_snapshots(snapshots, keep_profiles=10):
+    """Combine worker snapshots into histograms keyed by (name, label) and the slowest profiles"""
+    histograms = {}
+    profiles = []
+    for snapshot in snapshots:
+        for name, label, data in snapshot['histograms']:
+            histogram = Histogram(HISTOGRAMS[name][1], data['counts'], data['total'], data['count'])
+            key = (name, label)
+            if key in histograms:
+                histograms[key].merge(histogram)
+            else:
+                histograms[key] = histogram
+        profiles.extend(snapshot['profiles'])
+    profiles.sort(key=lambda p: p['duration'], reverse=True)
+    return histograms, profiles[:keep_profiles]
+
+def render_prometheus(histograms, prefix='blog_'):
+    """Prometheus text exposition format for merged histograms"""
+    lines = []
+    for name, (label_name, bounds, description) in HISTOGRAMS.items():
+        series = sorted((label, h) for (n, label), h in histograms.items() if n == name)
+        if not series:
+            continue
+        metric = prefix + name
+        lines.append(f'# HELP {metric} {description}')
+        lines.append(f'# TYPE {metric} histogram')
+        for label, histogram in series:
+            label_value = str(label).replace('\\', '\\\\').replace('"', '\\"')
+            cumulative = 0
+            for bound, bucket_count in zip(list(bounds) + ['+Inf'], histogram.counts):
+                cumulative += bucket_count
+                lines.append(f'{metric}_bucket{{{label_name}="{label_value}",le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{{label_name}="{label_value}"}} {histogram.total}')
+            lines.append(f'{metric}_count{{{label_name}="{label_value}"}} {histogram.count}')
+    return '\n'.join(lines) + '\n'
+
+class QueryStats:
+    """Statement count and time accumulated over one request"""
+
+    __slots__ = ('statements', 'seconds')
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that reports each statement to the connection's observer"""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.connection.observe_statement(sql, parameters, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        # The first row of parameters is reported, so the statement's plan can be looked at
+        rows = iter(seq_of_parameters)
+        first = next(rows, None)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, rows if first is None else itertools.chain([first], rows))
+        finally:
+            self.connection.observe_statement(sql, first, time.perf_counter() - start)
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose statements are timed.
+
+    `observer(connection, sql, parameters, seconds)` is called after every
+    statement run through execute() or executemany(), on the connection or
+    its cursors; for executemany() `parameters` is its first row of
+    parameters, or None when there were none.
+    """
+
+    observer = None
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def observe_statement(self, sql, parameters, seconds):
+        if self.observer is not None:
+            self.observer(self, sql, parameters, seconds)
+
+def query_plan(connection, sql, parameters=()):
+    """EXPLAIN QUERY PLAN details for a statement, bypassing instrumentation"""
+    cursor = sqlite3.Cursor(connection)
+    try:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, parameters)
+        return [row[3] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+def start_profiler():
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
@@ -0,0 +1,251 @@
+"""Query plan audit for the statements issued by the app's routes.
+
+run_audit() builds an isolated app on a throwaway database in which every
+table holds more than `max_rows` rows, requests each route through the test
+client while recording the statements it runs, then runs EXPLAIN QUERY PLAN
+on each distinct statement and reports the ones that read a large table in
+full: a SCAN, with or without an index giving the order, or a temporary
+B-tree sorting or grouping its rows. An index scan under a LIMIT stops
+after that many rows and is not reported.
+
+    flask --app app audit-queries --max-rows 1000
+"""
+import io
+import os
+import re
+import sqlite3
+import tempfile
+
+import bodies
+import metrics
+
+LISTING = 'SELECT id, title, slug, author_name, category, published_date'
+SITEMAP = 'SELECT slug, published_date FROM articles'
+
+# Full scans that are inherent to what the route shows: (endpoint, start of the statement) -> reason
+ALLOWED_SCANS = {
+    ('admin_analytics', 'SELECT a.id, a.title, a.slug'): 'per-article view totals list every article',
+    ('admin_analytics', 'SELECT DATE(started_at)'): 'views per day group every view in the chosen period',
+    ('archive', LISTING): 'the archive lists every article, streamed',
+    ('admin_dashboard', LISTING): 'the dashboard lists every article, streamed',
+    ('admin_comments', 'SELECT id, title FROM articles'): 'the article filter lists every article',
+    ('admin_subscribers', 'SELECT COUNT(*) FROM subscribers'): 'the page shows how many subscribers there are',
+    ('admin_subscribers', 'SELECT id, email, name, created_at FROM subscribers WHERE (('):
+        'a search by email or name prefix sorts its matches by date',
+    ('admin_subscribers_export', 'SELECT email, name, created_at FROM subscribers'):
+        'an export writes every subscriber matching the search, by date',
+}
+# The sitemap lists every article; it is rebuilt by the admin saves that change the listing
+for endpoint in ('admin_new_article', 'admin_edit_article', 'admin_restore_revision'):
+    ALLOWED_SCANS[(endpoint, SITEMAP)] = 'the sitemap lists every article'
+
+# Endpoints that issue no SQL of their own
+UNAUDITED_ENDPOINTS = {
+    'static', 'admin_login', 'admin_logout', 'admin_preview_article', 'upload_image',
+    'admin_metrics', 'admin_metrics_prometheus',
+}
+
+TABLE_REFERENCE = re.compile(r'\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+FULL_SCAN = re.compile(r'^SCAN (\w+)( USING (?:COVERING )?INDEX .*)?$')
+TABLE_STEP = re.compile(r'^(?:SCAN|SEARCH) (\w+)')
+KEY_LOOKUP = re.compile(r' USING (?:INTEGER )?PRIMARY KEY ')
+TEMP_B_TREE = re.compile(r'^USE TEMP B-TREE FOR ')
+# Plan steps that start a query of their own, whose rows a sort outside them does not see
+SUBQUERY = re.compile(r'^(?:CO-ROUTINE|MATERIALIZE|(?:CORRELATED )?(?:SCALAR|LIST) SUBQUERY|LEFT-MOST SUBQUERY|'
+                      r'COMPOUND QUERY|UNION|INTERSECT|EXCEPT)')
+LIMIT = re.compile(r'\bLIMIT\b', re.IGNORECASE)
+SQL_KEYWORDS = {'where', 'join', 'left', 'inner', 'on', 'order', 'group', 'limit', 'set', 'values', 'using', 'as'}
+
+def fill_database(db_path, rows):
+    """Put `rows` rows into each table the routes read"""
+    conn = sqlite3.connect(db_path)
+    conn.executemany('''
+        INSERT INTO articles (title, slug, author_name, category, published_date, cover_image_filename, short_summary)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', [(f'Article {i}', f'article-{i}', 'Kylee', ('Songbird Magazine', 'Angsty Entries', 'Quick Reads')[i % 3],
+           f'2024-01-{i % 28 + 1:02d}', 'cover_image.png', 'Summary') for i in range(rows)])
+    body = bodies.compress('<p>Body</p>')
+    conn.executemany('INSERT INTO article_bodies (article_id, codec, source, compiled) VALUES (?, ?, ?, ?)',
+                     [(i + 1, bodies.CODEC, body, body) for i in range(rows)])
+    conn.executemany('''
+        INSERT INTO comments (article_id, display_name, content, created_at) VALUES (?, ?, ?, ?)
+    ''', [(i % 50 + 1, 'Reader', 'Comment', f'2024-01-01 00:{i // 60 % 60:02d}:{i % 60:02d}') for i in range(rows)])
+    conn.executemany('INSERT INTO likes (article_id, viewer_token) VALUES (?, ?)',
+                     [(i % 50 + 1, f'token-{i}') for i in range(rows)])
+    conn.executemany('INSERT INTO user_agents (user_agent, is_bot) VALUES (?, ?)',
+                     [(f'Mozilla/5.0 ({i})', int(i % 10 == 0)) for i in range(rows)])
+    conn.executemany('INSERT INTO page_views (viewer_token, path, user_agent_id) VALUES (?, ?, ?)',
+                     [(f'token-{i % 100}', f'/article/article-{i % 50}', i + 1) for i in range(rows)])
+    conn.executemany('INSERT INTO article_views (article_id, viewer_token, duration_seconds) VALUES (?, ?, ?)',
+                     [(i % 50 + 1, f'token-{i % 100}', i % 300) for i in range(rows)])
+    conn.executemany('INSERT INTO subscribers (email, name) VALUES (?, ?)',
+                     [(f'reader{i}@example.com', f'Reader {i}') for i in range(rows)])
+    conn.commit()
+    conn.close()
+
+def exercise_routes(client, password):
+    """Request every route once, public pages first and then the admin pages"""
+    slug = 'article-1'
+    requests = [
+        ('GET', '/', None),
+        ('GET', '/songbird-magazine', None),
+        ('GET', '/angsty-entries', None),
+        ('GET', '/quick-reads', None),
+        ('GET', '/archive', None),
+        ('GET', '/about', None),
+        ('GET', '/feed.xml', None),
+        ('GET', '/sitemap.xml', None),
+        ('GET', '/sitemap-1.xml', None),
+        ('GET', '/subscribe', None),
+        ('POST', '/subscribe', {'data': {'email': 'new-reader@example.com', 'name': 'New'}}),
+        ('GET', f'/article/{slug}', None),
+        ('GET', f'/article/{slug}/comments?after=2024-01-01+00:30:00|100', None),
+        ('GET', f'/article/{slug}/state', None),
+        ('POST', f'/article/{slug}/like', None),
+        ('POST', f'/article/{slug}/comment', {'data': {'content': 'Audit comment'}}),
+        ('POST', '/track/view/start', {'json': {'path': '/'}}),
+        ('POST', '/track/view/end', {'json': {'view_id': 1, 'duration_seconds': 5}}),
+        ('POST', '/track/article/start', {'json': {'article_id': 1}}),
+        ('POST', '/track/article/end', {'json': {'view_id': 1, 'duration_seconds': 5}}),
+        ('POST', '/admin/login', {'data': {'password': password}}),
+        ('GET', '/admin', None),
+        ('GET', '/admin/new', None),
+        ('GET', '/admin/edit/1', None),
+        ('POST', '/admin/edit/1', {'data': {'title': 'Article 1', 'author_name': 'Kylee', 'published_date': '2024-01-02',
+                                           'category': 'Quick Reads', 'content_html': '<p>Edited</p>'}}),
+        ('GET', '/admin/edit/1/revisions', None),
+        ('GET', '/admin/edit/1/revisions/diff', None),
+        ('GET', '/admin/edit/1/revisions/diff?a=1&b=2', None),
+        ('POST', '/admin/edit/1/revisions/1/restore', None),
+        ('POST', '/admin/new', {'data': {'title': 'Audit Article', 'author_name': 'Kylee', 'published_date': '2024-02-01',
+                                        'category': 'Quick Reads', 'content_html': '<p>New</p>'}}),
+        ('GET', '/admin/edit-about', None),
+        ('POST', '/admin/edit-about', {'data': {'author_name': 'Kylee', 'author_bio_text': 'Bio'}}),
+        ('GET', '/admin/comments', None),
+        ('GET', '/admin/comments?article=1&status=pending', None),
+        ('GET', '/admin/comments?status=approved&after=2024-01-01+00:10:00|500', None),
+        ('GET', '/admin/comments?viewer=token-1&status=approved', None),
+        ('POST', '/admin/comments/bulk', {'data': {'action': 'approve', 'comment_ids': ['2', '3']}}),
+        ('POST', '/admin/comments/bulk', {'data': {'action': 'delete', 'scope': 'filter', 'viewer': 'token-1'}}),
+        ('POST', '/admin/comments/delete/1', None),
+        ('GET', '/admin/subscribers', None),
+        ('GET', '/admin/subscribers?q=reader1', None),
+        ('GET', '/admin/subscribers?after=2024-01-01+00:00:00|500', None),
+        ('GET', '/admin/subscribers/export.csv', None),
+        ('GET', '/admin/subscribers/export.csv?q=reader', None),
+        ('POST', '/admin/subscribers/import', {'data': {'csv_file': (io.BytesIO(b'email,name\nreader1@example.com,Dup\n'), 'list.csv')}}),
+        ('GET', '/admin/email-config', None),
+        ('GET', '/admin/analytics', None),
+    ]
+    for method, path, kwargs in requests:
+        response = client.open(path, method=method, **(kwargs or {}))
+        response.get_data()
+        response.close()
+
+def table_aliases(sql):
+    """Map the names a statement uses for its tables (aliases included) to table names"""
+    aliases = {}
+    for table, alias in TABLE_REFERENCE.findall(sql):
+        aliases[table] = table
+        if alias and alias.lower() not in SQL_KEYWORDS:
+            aliases[alias] = table
+    return aliases
+
+def allowed(endpoint, sql):
+    return any(endpoint == allowed_endpoint and sql.startswith(start) for allowed_endpoint, start in ALLOWED_SCANS)
+
+def plan_scopes(conn, sql, parameters):
+    """The details of a statement's plan grouped by the (sub)query each step belongs to"""
+    scope_of = {0: 0}
+    scopes = {}
+    for step, parent, _, detail in conn.execute('EXPLAIN QUERY PLAN ' + sql, parameters):
+        scope = scope_of.get(parent, 0)
+        scope_of[step] = step if SUBQUERY.match(detail) else scope
+        scopes.setdefault(scope, []).append(detail)
+    return list(scopes.values())
+
+def audit_statement(conn, endpoint, sql, parameters, max_rows, row_counts=None):
+    """Describe each step of a statement's plan that reads a table of more than `max_rows` rows in full"""
+    if allowed(endpoint, sql):
+        return []
+    try:
+        scopes = plan_scopes(conn, sql, parameters)
+    except sqlite3.Error:
+        return []
+    row_counts = {} if row_counts is None else row_counts
+
+    def rows_in(table):
+        if table not in row_counts:
+            exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+            row_counts[table] = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0] if exists else 0
+        return row_counts[table]
+
+    aliases = table_aliases(sql)
+    findings = []
+    for plan in scopes:
+        sorts = [detail for detail in plan if TEMP_B_TREE.match(detail)]
+        # Large tables this (sub)query reads other than one row per key looked up
+        read = set()
+        for detail in plan:
+            match = TABLE_STEP.match(detail)
+            # Steps reading a subquery's rows name the subquery, which is not a table
+            if match and not KEY_LOOKUP.search(detail):
+                table = aliases.get(match.group(1), match.group(1))
+                if rows_in(table) > max_rows:
+                    read.add(table)
+        for detail in plan:
+            match = FULL_SCAN.match(detail)
+            if not match:
+                continue
+            table = aliases.get(match.group(1), match.group(1))
+            if rows_in(table) <= max_rows:
+                continue
+            # Rows read in index order up to a LIMIT, with nothing to sort first
+            if match.group(2) and LIMIT.search(sql) and not sorts:
+                continue
+            findings.append(f'{endpoint}: {sql}\n  {detail} ({row_counts[table]} rows in {table})')
+        if read:
+            findings += [f'{endpoint}: {sql}\n  {detail} (rows of {", ".join(sorted(read))})' for detail in sorts]
+    return findings
+
+def run_audit(create_app, max_rows=1000):
+    """Return a description of each statement that reads a table of more than `max_rows` rows in full"""
+    statements = {}
+    exercised = set()
+
+    def listener(connection, sql, parameters, seconds, endpoint):
+        if endpoint:
+            exercised.add(endpoint)
+            # executemany() reports its first row of parameters
+            statements.setdefault((endpoint, ' '.join(sql.split())), parameters or ())
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, 'audit.db')
+        app = create_app({
+            'DATABASE': db_path,
+            'UPLOAD_FOLDER': os.path.join(workdir, 'uploads'),
+            'UPLOAD_SPOOL_DIR': os.path.join(workdir, 'incoming'),
+            'TEMPLATE_CACHE_DIR': None,
+            'STATIC_EXPORT_DIR': None,
+            'BACKUP_DIR': None,
+            'CRITICAL_CSS_CACHE': None,
+        })
+        with app.app_context():
+            from app import get_db
+            get_db().close()
+        fill_database(db_path, max_rows + 1)
+
+        app.extensions['blog'].statement_listeners.append(listener)
+        exercise_routes(app.test_client(), app.config['ADMIN_PASSWORD'])
+
+        conn = sqlite3.connect(db_path)
+        row_counts = {}
+        findings = []
+        for (endpoint, sql), parameters in sorted(statements.items()):
+            findings += audit_statement(conn, endpoint, sql, parameters, max_rows, row_counts)
+        conn.close()
+
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint not in exercised and rule.endpoint not in UNAUDITED_ENDPOINTS:
+            findings.append(f'{rule.endpoint}: not exercised by the audit, add it to exercise_routes()')
+    return findings
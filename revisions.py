@@ -0,0 +1,238 @@
+"""Revision history of article bodies as full copies plus compressed deltas.
+
+Every save of an article adds a row to article_revisions. Most rows are a
+delta against the revision before them: the editor HTML is split into
+tokens ending at each '>', so a tag or a run of text is one token, and the
+delta lists the runs of tokens kept, dropped and inserted, as JSON
+compressed with the body codec. An edit of a few paragraphs in a 260 KB
+article then takes a few hundred bytes. Every SNAPSHOT_INTERVAL revisions,
+or when a delta would not be much smaller, the full text is stored instead,
+so rebuilding any revision applies at most SNAPSHOT_INTERVAL - 1 deltas to
+the nearest full copy before it.
+
+compact() thins old history: revisions younger than `keep_days` are all
+kept, older ones only the last of each day, and the deltas of the ones
+kept are recomputed against their new predecessors.
+
+    flask --app app compact-revisions [--keep-days 30]
+"""
+import difflib
+import json
+import re
+from datetime import datetime, timedelta, timezone
+
+import bodies
+
+# Longest run of deltas between two full copies
+SNAPSHOT_INTERVAL = 20
+# A delta at least this fraction of the compressed full text is stored as a full copy instead
+DELTA_RATIO = 0.5
+# Revisions younger than this are never removed by compact()
+KEEP_DAYS = 30
+
+TOKEN = re.compile(r'[^>]*>|[^>]+')
+
+def tokens(text):
+    return TOKEN.findall(text)
+
+def make_delta(old, new):
+    """The edit turning `old` into `new`: counts of tokens kept (> 0) or dropped (< 0), and inserted strings"""
+    a, b = tokens(old), tokens(new)
+    # Edits are usually local; matching only what lies between the common ends keeps this fast
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    ops = [start] if start else []
+    matcher = difflib.SequenceMatcher(None, a[start:len(a) - end], b[start:len(b) - end])
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append(i2 - i1)
+            continue
+        if i2 > i1:
+            ops.append(i1 - i2)
+        if j2 > j1:
+            ops.append(''.join(b[start + j1:start + j2]))
+    if end:
+        ops.append(end)
+    return ops
+
+def apply_delta(old, ops):
+    a = tokens(old)
+    out = []
+    position = 0
+    for op in ops:
+        if isinstance(op, str):
+            out.append(op)
+        elif op > 0:
+            out.extend(a[position:position + op])
+            position += op
+        else:
+            position -= op
+    return ''.join(out)
+
+def encode(kind, text, previous):
+    if kind == 'full':
+        return bodies.compress(text)
+    return bodies.compress(json.dumps(make_delta(previous, text), separators=(',', ':')))
+
+def decode(row, previous):
+    data = bodies.decompress(row['data'], row['codec'])
+    if row['kind'] == 'full':
+        return data
+    return apply_delta(previous, json.loads(data))
+
+def choose_encoding(text, previous, chain):
+    """(kind, data) for a revision following `chain` deltas since the last full copy"""
+    full = bodies.compress(text)
+    if previous is None or chain + 1 >= SNAPSHOT_INTERVAL:
+        return 'full', full
+    delta = encode('delta', text, previous)
+    if len(delta) >= len(full) * DELTA_RATIO:
+        return 'full', full
+    return 'delta', delta
+
+def latest(conn, article_id):
+    return conn.execute('''
+        SELECT number, title FROM article_revisions WHERE article_id = ? ORDER BY number DESC LIMIT 1
+    ''', (article_id,)).fetchone()
+
+def previous_number(conn, article_id, number):
+    """The number of the revision before `number`, or None; compact() leaves gaps between numbers"""
+    return conn.execute('''
+        SELECT MAX(number) FROM article_revisions WHERE article_id = ? AND number < ?
+    ''', (article_id, number)).fetchone()[0]
+
+def chain_rows(conn, article_id, number):
+    """The rows needed to rebuild revision `number`: the last full copy at or before it and the deltas after"""
+    return conn.execute('''
+        SELECT number, kind, codec, data FROM article_revisions
+        WHERE article_id = ? AND number <= ? AND number >= (
+            SELECT MAX(number) FROM article_revisions WHERE article_id = ? AND number <= ? AND kind = 'full'
+        )
+        ORDER BY number
+    ''', (article_id, number, article_id, number)).fetchall()
+
+def rebuild(conn, article_id, number):
+    """The editor HTML of an article at revision `number`, or None if there is no such revision"""
+    rows = chain_rows(conn, article_id, number)
+    if not rows or rows[-1]['number'] != number:
+        return None
+    text = None
+    for row in rows:
+        text = decode(row, text)
+    return text
+
+def record(conn, article_id, title, text, baseline=False):
+    """Add `text` as the newest revision of an article and return its number.
+
+    Nothing is added when neither the text nor the title changed. A
+    `baseline` revision is the body an article had before its history was
+    kept, so it has no date.
+    """
+    last = latest(conn, article_id)
+    previous = None
+    chain = 0
+    number = 1
+    if last is not None:
+        rows = chain_rows(conn, article_id, last['number'])
+        for row in rows:
+            previous = decode(row, previous)
+        if previous == text and last['title'] == title:
+            return last['number']
+        chain = len(rows) - 1
+        number = last['number'] + 1
+    kind, data = choose_encoding(text, previous, chain)
+    conn.execute('''
+        INSERT INTO article_revisions (article_id, number, created_at, title, kind, codec, data, length)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (article_id, number, None if baseline else now(), title, kind, bodies.CODEC, data, len(text)))
+    return number
+
+def now():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+def list_revisions(conn, article_id):
+    return conn.execute('''
+        SELECT number, created_at, title, kind, length, LENGTH(data) AS stored FROM article_revisions
+        WHERE article_id = ? ORDER BY number DESC
+    ''', (article_id,)).fetchall()
+
+def thin(rows, keep_days):
+    """Numbers of the revisions compact() keeps: all recent ones, and the last of each older day"""
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=keep_days)).strftime('%Y-%m-%d %H:%M:%S')
+    kept = set()
+    last_of_day = {}
+    for row in rows:
+        created = row['created_at']
+        if created is not None and created >= cutoff:
+            kept.add(row['number'])
+        else:
+            last_of_day[created[:10] if created else None] = row['number']
+    kept.update(last_of_day.values())
+    # The newest revision is the current body
+    kept.add(rows[-1]['number'])
+    return kept
+
+def compact(conn, article_id, keep_days=KEEP_DAYS):
+    """Thin out the old revisions of an article and return how many were removed"""
+    rows = conn.execute('''
+        SELECT number, created_at, title, kind, codec, data, length FROM article_revisions
+        WHERE article_id = ? ORDER BY number
+    ''', (article_id,)).fetchall()
+    if not rows:
+        return 0
+    kept = thin(rows, keep_days)
+    if len(kept) == len(rows):
+        return 0
+    # Walk the chain once, re-encoding each kept revision against the one kept before it
+    rewritten = []
+    text = previous = None
+    chain = 0
+    for row in rows:
+        text = decode(row, text)
+        if row['number'] not in kept:
+            continue
+        kind, data = choose_encoding(text, previous, chain)
+        chain = 0 if kind == 'full' else chain + 1
+        rewritten.append((article_id, row['number'], row['created_at'], row['title'], kind, bodies.CODEC, data,
+                          row['length']))
+        previous = text
+    conn.execute('DELETE FROM article_revisions WHERE article_id = ?', (article_id,))
+    conn.executemany('''
+        INSERT INTO article_revisions (article_id, number, created_at, title, kind, codec, data, length)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rewritten)
+    return len(rows) - len(rewritten)
+
+def stored_text(conn):
+    """The text of every full copy and everything inserted by a delta.
+
+    Whatever any revision contains is in one of them, whole when it is
+    inside one tag, so this is enough to find the uploads revisions use.
+    """
+    for row in conn.execute('SELECT kind, codec, data FROM article_revisions'):
+        data = bodies.decompress(row['data'], row['codec'])
+        if row['kind'] == 'full':
+            yield data
+        else:
+            yield from (op for op in json.loads(data) if isinstance(op, str))
+
+def diff(old, new, context=3):
+    """Hunks of (change, text) pairs, change being 'equal', 'delete' or 'insert', for showing two revisions"""
+    a, b = tokens(old), tokens(new)
+    hunks = []
+    for group in difflib.SequenceMatcher(None, a, b).get_grouped_opcodes(context):
+        hunk = []
+        for tag, i1, i2, j1, j2 in group:
+            if tag == 'equal':
+                hunk.append(('equal', ''.join(a[i1:i2])))
+                continue
+            if i2 > i1:
+                hunk.append(('delete', ''.join(a[i1:i2])))
+            if j2 > j1:
+                hunk.append(('insert', ''.join(b[j1:j2])))
+        hunks.append(hunk)
+    return hunks
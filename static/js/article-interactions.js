@@ -1,12 +1,59 @@
 document.addEventListener('DOMContentLoaded', function() {
     const likeBtn = document.getElementById('likeBtn');
+    const loadMoreBtn = document.getElementById('loadMoreComments');
+    const commentsList = document.querySelector('.comments-list');
+    
+    function showLikeState(data) {
+        const likeIcon = likeBtn.querySelector('.like-icon');
+        const likeText = likeBtn.querySelector('.like-text');
+        
+        if (data.has_liked) {
+            likeBtn.classList.add('liked');
+            likeIcon.textContent = '♥';
+            likeText.textContent = 'Liked';
+        } else {
+            likeBtn.classList.remove('liked');
+            likeIcon.textContent = '♡';
+            likeText.textContent = 'Like';
+        }
+        
+        document.getElementById('likeCount').textContent = data.like_count;
+    }
+    
+    function appendComment(comment) {
+        const item = document.createElement('div');
+        item.className = 'comment-item';
+        
+        const header = document.createElement('div');
+        header.className = 'comment-header';
+        const author = document.createElement('span');
+        author.className = 'comment-author';
+        author.textContent = comment.display_name;
+        const date = document.createElement('span');
+        date.className = 'comment-date';
+        date.textContent = (comment.created_at || '').slice(0, 10);
+        header.append(author, date);
+        
+        const content = document.createElement('div');
+        content.className = 'comment-content';
+        content.textContent = comment.content;
+        
+        item.append(header, content);
+        commentsList.appendChild(item);
+    }
+    
+    function setNextCursor(cursor) {
+        if (cursor) {
+            loadMoreBtn.setAttribute('data-next-cursor', cursor);
+            loadMoreBtn.hidden = false;
+        } else {
+            loadMoreBtn.remove();
+        }
+    }
     
     if (likeBtn) {
         likeBtn.addEventListener('click', function() {
             const articleSlug = this.getAttribute('data-article-slug');
-            const likeIcon = this.querySelector('.like-icon');
-            const likeText = this.querySelector('.like-text');
-            const likeCount = document.getElementById('likeCount');
             
             // Disable button during request
             this.disabled = true;
@@ -26,17 +73,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 }
                 
                 // Update UI
-                if (data.has_liked) {
-                    this.classList.add('liked');
-                    likeIcon.textContent = '♥';
-                    likeText.textContent = 'Liked';
-                } else {
-                    this.classList.remove('liked');
-                    likeIcon.textContent = '♡';
-                    likeText.textContent = 'Like';
-                }
-                
-                likeCount.textContent = data.like_count;
+                showLikeState(data);
             })
             .catch(error => {
                 console.error('Error:', error);
@@ -47,5 +84,55 @@ document.addEventListener('DOMContentLoaded', function() {
             });
         });
     }
+    
+    // Pages from the static export carry no likes or comments; fetch them
+    const interactions = document.querySelector('.article-interactions[data-state-url]');
+    
+    if (interactions) {
+        fetch(interactions.getAttribute('data-state-url'), {
+            credentials: 'same-origin'
+        })
+        .then(response => response.json())
+        .then(data => {
+            showLikeState(data);
+            document.getElementById('commentCount').textContent = data.comment_count;
+            
+            if (data.comments.length) {
+                data.comments.forEach(appendComment);
+            } else {
+                const empty = document.createElement('p');
+                empty.className = 'no-comments';
+                empty.textContent = 'No comments yet. Be the first to comment!';
+                commentsList.appendChild(empty);
+            }
+            setNextCursor(data.next_cursor);
+        })
+        .catch(error => {
+            console.error('Error:', error);
+        });
+    }
+    
+    // Older comments are fetched a page at a time from the JSON endpoint
+    if (loadMoreBtn) {
+        loadMoreBtn.addEventListener('click', function() {
+            const cursor = this.getAttribute('data-next-cursor');
+            this.disabled = true;
+            
+            fetch(`${this.getAttribute('data-url')}?after=${encodeURIComponent(cursor)}`, {
+                credentials: 'same-origin'
+            })
+            .then(response => response.json())
+            .then(data => {
+                data.comments.forEach(appendComment);
+                setNextCursor(data.next_cursor);
+            })
+            .catch(error => {
+                console.error('Error:', error);
+            })
+            .finally(() => {
+                this.disabled = false;
+            });
+        });
+    }
 });
 
@@ -42,7 +42,22 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
+    // Covers of slides past the first few are only fetched once the slide is
+    // about to be shown: the visible slides and the one after them
+    function loadVisibleCovers() {
+        const last = Math.min(totalItems - 1, currentIndex + itemsPerView);
+        for (let i = currentIndex; i <= last; i++) {
+            const img = items[i].querySelector('img[data-src]');
+            if (img) {
+                img.src = img.getAttribute('data-src');
+                img.removeAttribute('data-src');
+            }
+        }
+    }
+    
     function updateCarousel() {
+        loadVisibleCovers();
+        
         // Calculate card width percentage (accounting for gap)
         const cardWidthPercent = 100 / itemsPerView;
         const translateX = -currentIndex * cardWidthPercent;
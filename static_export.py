@@ -0,0 +1,228 @@
+"""Static export of the public pages.
+
+export_site() renders the home page, the category pages, the archive, the
+about page and every article through the app's own views and writes each
+one as an index.html that a plain file server can serve. Article pages are
+rendered without likes or comments; their script fetches those from the
+app. Files under static/css, static/js and static/graphics are copied with
+a hash of their content in the name, and the pages are rewritten to use
+those names, so they can be cached forever (uploads already are).
+
+    flask --app app export-site --out site/
+
+With STATIC_EXPORT_DIR set, admin saves call export_site() with the ids of
+the articles they changed, and only the pages showing those articles are
+rendered again. Likes, comments, subscriptions, tracking and the admin stay
+dynamic: the file server passes every path it has no file for to the app.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import urllib.parse
+
+from flask import url_for
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent exports are not serialized
+    fcntl = None
+
+# Set in the WSGI environ of export requests; article_detail() then leaves out per-reader state
+ENVIRON_KEY = 'blog.static_export'
+
+# Pages rendered by a full export besides the articles
+PAGE_ENDPOINTS = ('home', 'songbird_magazine', 'angsty_entries', 'quick_reads', 'archive', 'about')
+
+# The listing page of each category
+CATEGORY_ENDPOINTS = {
+    'Songbird Magazine': 'songbird_magazine',
+    'Angsty Entries': 'angsty_entries',
+    'Quick Reads': 'quick_reads',
+}
+
+# Number of latest articles on the home page, as in home()
+HOME_ARTICLES = 10
+
+ASSET_FOLDERS = ('css', 'js', 'graphics')
+STATE_FILE = '.export-state.json'
+LOCK_FILE = '.export.lock'
+
+STATIC_URL = re.compile(r'/static/([^"\'()\s?#]+)')
+
+@contextlib.contextmanager
+def export_lock(out_dir):
+    """Hold an exclusive lock on the export directory (one export at a time across workers)"""
+    with open(os.path.join(out_dir, LOCK_FILE), 'w') as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+def write_file(path, data):
+    """Replace a file atomically, so the file server never sees half a page"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+def page_file(out_dir, path):
+    """Where the page for a URL path is written: /archive -> archive/index.html"""
+    parts = [urllib.parse.unquote(part) for part in path.split('/') if part]
+    return os.path.join(out_dir, *parts, 'index.html')
+
+def fingerprinted_name(relative_path, digest):
+    """css/style.css -> css/style.<hash>.css"""
+    stem, ext = os.path.splitext(relative_path)
+    return f'{stem}.{digest[:12]}{ext}'
+
+def copy_assets(static_folder, out_dir, prune=False):
+    """Copy static assets under fingerprinted names and return {original: fingerprinted}"""
+    manifest = {}
+    for folder in ASSET_FOLDERS:
+        for root, _, files in os.walk(os.path.join(static_folder, folder)):
+            for name in files:
+                source = os.path.join(root, name)
+                relative_path = os.path.relpath(source, static_folder).replace(os.sep, '/')
+                with open(source, 'rb') as f:
+                    data = f.read()
+                target = fingerprinted_name(relative_path, hashlib.sha256(data).hexdigest())
+                manifest[relative_path] = target
+                target_path = os.path.join(out_dir, 'static', target)
+                if not os.path.exists(target_path):
+                    write_file(target_path, data)
+
+    if prune:
+        # Fingerprinted copies of earlier versions
+        kept = {os.path.normpath(os.path.join(out_dir, 'static', target)) for target in manifest.values()}
+        for folder in ASSET_FOLDERS:
+            for root, _, files in os.walk(os.path.join(out_dir, 'static', folder)):
+                for name in files:
+                    path = os.path.normpath(os.path.join(root, name))
+                    if path not in kept:
+                        os.remove(path)
+    return manifest
+
+def copy_uploads(upload_folder, out_dir):
+    """Copy uploads the export does not have yet; content-addressed names never change content"""
+    target_folder = os.path.join(out_dir, 'static', 'uploads')
+    os.makedirs(target_folder, exist_ok=True)
+    try:
+        entries = list(os.scandir(upload_folder))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        target = os.path.join(target_folder, entry.name)
+        if not entry.is_file() or os.path.exists(target):
+            continue
+        try:
+            os.link(entry.path, target)
+        except OSError:
+            shutil.copyfile(entry.path, target)
+
+def rewrite_asset_urls(page, manifest):
+    """Point /static/ URLs in a page at the fingerprinted copies"""
+    def replace(match):
+        target = manifest.get(urllib.parse.unquote(match.group(1)))
+        if target is None:
+            return match.group(0)
+        return '/static/' + urllib.parse.quote(target)
+    return STATIC_URL.sub(replace, page)
+
+def render_page(client, path, manifest):
+    """Get a page from the app as it is exported"""
+    response = client.get(path, environ_base={ENVIRON_KEY: True})
+    if response.status_code != 200:
+        raise RuntimeError(f'{path} returned {response.status}')
+    return rewrite_asset_urls(response.get_data(as_text=True), manifest).encode()
+
+def read_state(out_dir):
+    try:
+        with open(os.path.join(out_dir, STATE_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def export_site(app, out_dir, article_ids=None, about=False):
+    """Render public pages into `out_dir` and return the URL paths written.
+
+    Without `article_ids` or `about`, or when there is no earlier export in
+    `out_dir`, everything is rendered. Otherwise only the pages showing the
+    given articles are: each article's own page, the category pages it was
+    and is in, the archive, and the home page when the article was or is
+    among the latest HOME_ARTICLES. A change to any static asset means every
+    page links to new names, so that also renders everything.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    with export_lock(out_dir):
+        state = read_state(out_dir)
+        full = state is None or (article_ids is None and not about)
+        manifest = copy_assets(app.static_folder, out_dir, prune=full)
+        if state is not None and state['assets'] != manifest:
+            full = True
+        copy_uploads(app.config['UPLOAD_FOLDER'], out_dir)
+
+        conn = sqlite3.connect(app.config['DATABASE'])
+        home_ids = [row[0] for row in conn.execute(
+            'SELECT id FROM articles ORDER BY published_date DESC LIMIT ?', (HOME_ARTICLES,))]
+        if full:
+            articles = {str(article_id): [slug, category] for article_id, slug, category
+                        in conn.execute('SELECT id, slug, category FROM articles')}
+        else:
+            articles = dict(state['articles'])
+            for article_id in article_ids or ():
+                row = conn.execute('SELECT slug, category FROM articles WHERE id = ?', (article_id,)).fetchone()
+                if row:
+                    articles[str(article_id)] = list(row)
+                else:
+                    articles.pop(str(article_id), None)
+        conn.close()
+
+        # The app context is fresh so rendering does not disturb a request this runs in
+        with app.app_context(), app.test_request_context():
+            if full:
+                pages = {url_for(endpoint) for endpoint in PAGE_ENDPOINTS}
+                pages.update(url_for('article_detail', slug=slug) for slug, _ in articles.values())
+                previous = {url_for('article_detail', slug=slug) for slug, _ in state['articles'].values()} if state else set()
+                removed = previous - pages
+            else:
+                pages = set()
+                removed = set()
+                if about:
+                    pages.add(url_for('about'))
+                for article_id in article_ids or ():
+                    old = state['articles'].get(str(article_id))
+                    new = articles.get(str(article_id))
+                    pages.add(url_for('archive'))
+                    for info in (old, new):
+                        if info and info[1] in CATEGORY_ENDPOINTS:
+                            pages.add(url_for(CATEGORY_ENDPOINTS[info[1]]))
+                    if new:
+                        pages.add(url_for('article_detail', slug=new[0]))
+                    if old and (not new or old[0] != new[0]):
+                        removed.add(url_for('article_detail', slug=old[0]))
+                    if article_id in home_ids or article_id in state['home']:
+                        pages.add(url_for('home'))
+            removed -= pages
+
+            client = app.test_client()
+            for path in sorted(pages):
+                write_file(page_file(out_dir, path), render_page(client, path, manifest))
+
+        for path in removed:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(page_file(out_dir, path))
+                os.rmdir(os.path.dirname(page_file(out_dir, path)))
+
+        write_file(os.path.join(out_dir, STATE_FILE),
+                   json.dumps({'assets': manifest, 'home': home_ids, 'articles': articles}).encode())
+    return sorted(pages)
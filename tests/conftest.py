@@ -0,0 +1,32 @@
+"""Fixtures shared by the tests: an app on a throwaway database and an admin client."""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import app as blog
+
+@pytest.fixture
+def app(tmp_path):
+    instance = blog.create_app({
+        'DATABASE': str(tmp_path / 'blog.db'),
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+        'UPLOAD_SPOOL_DIR': str(tmp_path / 'incoming'),
+        'TEMPLATE_CACHE_DIR': None,
+        'CRITICAL_CSS_CACHE': None,
+        'STATIC_EXPORT_DIR': None,
+        'BACKUP_DIR': None,
+    })
+    with instance.app_context():
+        blog.get_db().close()
+    return instance
+
+@pytest.fixture
+def admin(app):
+    client = app.test_client()
+    client.post('/admin/login', data={'password': app.config['ADMIN_PASSWORD']})
+    return client
@@ -0,0 +1,16 @@
+import app as blog
+
+def test_edit_form_fills_in_missing_summary(app, admin):
+    with app.app_context():
+        conn = blog.get_db()
+        conn.execute('''
+            INSERT INTO articles (title, slug, author_name, category, published_date, cover_image_filename)
+            VALUES ('No Summary', 'no-summary', 'Kylee', 'Quick Reads', '2024-01-01', 'cover_image.png')
+        ''')
+        article_id = conn.execute("SELECT id FROM articles WHERE slug = 'no-summary'").fetchone()[0]
+        conn.commit()
+        conn.close()
+
+    response = admin.get(f'/admin/edit/{article_id}')
+    assert response.status_code == 200
+    assert blog.DEFAULT_SUMMARY.encode() in response.data
@@ -0,0 +1,49 @@
+import sqlite3
+
+import app as blog
+import backups
+
+def make_database(path, title):
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE notes (title TEXT)')
+    conn.execute('INSERT INTO notes VALUES (?)', (title,))
+    conn.commit()
+    conn.close()
+
+def test_snapshots_of_other_databases_are_not_used(tmp_path):
+    backup_dir = tmp_path / 'backups'
+    live, other = str(tmp_path / 'live.db'), str(tmp_path / 'other.db')
+    make_database(live, 'live')
+    make_database(other, 'other')
+    taken = backups.backup(live, backup_dir)
+    backups.backup(other, backup_dir)
+
+    assert backups.list_snapshots(backup_dir, live) == [taken]
+    assert backups.latest_snapshot(backup_dir, live) == taken
+    assert backups.latest_snapshot(backup_dir, str(tmp_path / 'missing.db')) is None
+
+def test_pruning_keeps_the_snapshots_of_other_databases(tmp_path):
+    backup_dir = tmp_path / 'backups'
+    live, other = str(tmp_path / 'live.db'), str(tmp_path / 'other.db')
+    make_database(live, 'live')
+    make_database(other, 'other')
+    kept = backups.backup(other, backup_dir)
+    for _ in range(3):
+        backups.backup(live, backup_dir, keep=2)
+
+    assert len(backups.list_snapshots(backup_dir, live)) == 2
+    assert backups.list_snapshots(backup_dir, other) == [kept]
+
+def test_replica_ignores_snapshots_of_another_database(tmp_path):
+    backup_dir = str(tmp_path / 'backups')
+    other = blog.create_app({'DATABASE': str(tmp_path / 'other.db'), 'TEMPLATE_CACHE_DIR': None})
+    with other.app_context():
+        blog.get_db().close()
+    backups.backup(other.config['DATABASE'], backup_dir)
+
+    instance = blog.create_app({'DATABASE': str(tmp_path / 'blog.db'), 'TEMPLATE_CACHE_DIR': None,
+                                'BACKUP_DIR': backup_dir, 'READ_FROM_SNAPSHOT': True})
+    with instance.app_context():
+        conn, taken = blog.get_replica_db()
+        conn.close()
+    assert taken is None
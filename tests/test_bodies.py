@@ -0,0 +1,62 @@
+import pytest
+
+import app as blog
+import bodies
+
+TEXT = '<p>Ünïcode body with <strong>markup</strong>.</p>' * 50
+
+ARTICLE = {'title': 'Cached', 'author_name': 'Kylee', 'published_date': '2024-01-01', 'category': 'Quick Reads',
+           'short_summary': 'Summary'}
+
+@pytest.mark.parametrize('codec', ['zlib', pytest.param('zstd', marks=pytest.mark.skipif(
+    bodies.zstandard is None, reason='zstandard is not installed'))])
+def test_codec_round_trips(codec):
+    data = bodies.compress(TEXT, codec)
+    assert len(data) < len(TEXT.encode())
+    assert bodies.decompress(data, codec) == TEXT
+
+def test_stored_body_round_trips(app):
+    with app.app_context():
+        conn = blog.get_db()
+        bodies.store(conn, 1, TEXT, '<p>compiled</p>')
+        row = conn.execute('SELECT codec FROM article_bodies WHERE article_id = 1').fetchone()
+        assert row['codec'] == bodies.CODEC
+        assert bodies.load(conn, 1, 'source') == TEXT
+        assert bodies.load(conn, 1) == '<p>compiled</p>'
+        bodies.store(conn, 1, TEXT, None)
+        assert bodies.load(conn, 1) is None
+        assert bodies.load(conn, 2) is None
+        conn.close()
+
+def test_body_cache_evicts_least_recently_used():
+    cache = bodies.BodyCache()
+    cache.put('a', 'x' * 10, 40)
+    cache.put('b', 'y' * 10, 40)
+    assert cache.get('a') == 'x' * 10
+    cache.put('c', 'z' * 10, 40)
+    cache.put('d', 'w' * 10, 40)
+    cache.put('e', 'v' * 10, 40)
+    assert cache.get('b') is None
+    assert cache.get('a') == 'x' * 10
+    assert cache.size == 40
+    # A body over a quarter of the budget is not kept
+    cache.put('f', 'u' * 11, 40)
+    assert cache.get('f') is None
+
+def test_edit_replaces_cached_body(app, admin):
+    admin.post('/admin/new', data=dict(ARTICLE, content_html='<p>Before the edit</p>'))
+    with app.app_context():
+        conn = blog.get_db()
+        article = conn.execute("SELECT id, slug, body_version FROM articles WHERE title = 'Cached'").fetchone()
+        conn.close()
+    client = app.test_client()
+    assert b'Before the edit' in client.get(f"/article/{article['slug']}").data
+
+    admin.post(f"/admin/edit/{article['id']}", data=dict(ARTICLE, content_html='<p>After the edit</p>'))
+    with app.app_context():
+        conn = blog.get_db()
+        version = conn.execute('SELECT body_version FROM articles WHERE id = ?', (article['id'],)).fetchone()[0]
+        conn.close()
+    assert version == article['body_version'] + 1
+    page = client.get(f"/article/{article['slug']}").data
+    assert b'After the edit' in page and b'Before the edit' not in page
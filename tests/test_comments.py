@@ -0,0 +1,126 @@
+import html
+import re
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+import app as blog
+
+def add_article(conn, slug):
+    return conn.execute('''
+        INSERT INTO articles (title, slug, author_name, category, published_date, cover_image_filename)
+        VALUES (?, ?, 'Kylee', 'Quick Reads', '2024-01-01', 'cover_image.png')
+    ''', (slug.title(), slug)).lastrowid
+
+def add_comments(conn, article_id, created_ats, is_approved=1, viewer='viewer'):
+    return [conn.execute('''
+        INSERT INTO comments (article_id, display_name, content, created_at, is_approved, viewer_token)
+        VALUES (?, 'Reader', ?, ?, ?, ?)
+    ''', (article_id, f'Comment {i}', created_at, is_approved, viewer)).lastrowid
+            for i, created_at in enumerate(created_ats)]
+
+@pytest.fixture
+def article(app):
+    """An article with 45 approved comments, many of them posted in the same second"""
+    with app.app_context():
+        conn = blog.get_db()
+        article_id = add_article(conn, 'commented')
+        # 15 distinct times, three comments each, so page boundaries fall inside runs of ties
+        times = [f'2024-01-01 00:00:{second:02d}' for second in range(15) for _ in range(3)]
+        ids = add_comments(conn, article_id, times)
+        conn.commit()
+        conn.close()
+    return {'id': article_id, 'slug': 'commented', 'comment_ids': ids}
+
+def test_comment_pages_split_ties_without_duplicates_or_gaps(app, article):
+    client = app.test_client()
+    state = client.get(f"/article/{article['slug']}/state").json
+    seen = [comment['id'] for comment in state['comments']]
+    cursor = state['next_cursor']
+    while cursor:
+        page = client.get(f"/article/{article['slug']}/comments", query_string={'after': cursor}).json
+        seen += [comment['id'] for comment in page['comments']]
+        cursor = page['next_cursor']
+
+    assert state['comment_count'] == 45
+    assert len(state['comments']) == blog.COMMENTS_PER_PAGE
+    # Newest first, ties broken by the newest id
+    with app.app_context():
+        conn = blog.get_db()
+        expected = [row[0] for row in conn.execute(
+            'SELECT id FROM comments WHERE article_id = ? ORDER BY created_at DESC, id DESC', (article['id'],))]
+        conn.close()
+    assert seen == expected
+
+def test_cached_first_page_is_replaced_when_comments_change(app, admin, article):
+    client = app.test_client()
+    assert client.get(f"/article/{article['slug']}/state").json['comment_count'] == 45
+
+    with app.app_context():
+        conn = blog.get_db()
+        # Without a version bump the cached page is still served
+        newest = add_comments(conn, article['id'], ['2024-02-01 00:00:00'])[0]
+        conn.commit()
+        conn.close()
+    assert client.get(f"/article/{article['slug']}/state").json['comment_count'] == 45
+
+    admin.post('/admin/comments/bulk', data={'action': 'unapprove', 'comment_ids': [str(article['comment_ids'][0])]})
+    state = client.get(f"/article/{article['slug']}/state").json
+    assert state['comment_count'] == 45
+    assert state['comments'][0]['id'] == newest
+    with app.app_context():
+        conn = blog.get_db()
+        version = conn.execute('SELECT comments_version FROM articles WHERE id = ?', (article['id'],)).fetchone()[0]
+        conn.close()
+    assert version == 1
+
+def test_posting_a_comment_shows_on_the_next_read(app, article):
+    client = app.test_client()
+    client.get(f"/article/{article['slug']}/state")
+    client.post(f"/article/{article['slug']}/comment", data={'content': 'Fresh comment'})
+    state = client.get(f"/article/{article['slug']}/state").json
+    assert state['comment_count'] == 46
+    assert state['comments'][0]['content'] == 'Fresh comment'
+
+def queue_page(admin, **query):
+    """(comment ids listed, query of the 'Older' link or None) of a moderation queue page"""
+    page = admin.get('/admin/comments', query_string=query).get_data(as_text=True)
+    ids = [int(value) for value in re.findall(r'name="comment_ids" value="(\d+)"', page)]
+    older = re.search(r'<a href="([^"]*)">Older', page)
+    return ids, older and {name: values[0] for name, values in parse_qs(urlsplit(html.unescape(older.group(1))).query).items()}
+
+def test_moderation_queue_filters_and_pages(app, admin):
+    with app.app_context():
+        conn = blog.get_db()
+        first, second = add_article(conn, 'first'), add_article(conn, 'second')
+        times = [f'2024-01-01 00:{minute:02d}:00' for minute in range(30) for _ in range(2)]
+        pending = add_comments(conn, first, times, is_approved=0)
+        add_comments(conn, first, times[:10], is_approved=1)
+        add_comments(conn, second, times, is_approved=0)
+        conn.commit()
+        conn.close()
+
+    filters = {'article': str(first), 'status': 'pending'}
+    ids, older = queue_page(admin, **filters)
+    assert len(ids) == blog.MODERATION_PER_PAGE
+    assert {name: older[name] for name in filters} == filters
+    rest, last = queue_page(admin, **older)
+    assert last is None
+    assert sorted(ids + rest) == sorted(pending)
+    assert not set(ids) & set(rest)
+
+def test_bulk_actions_only_touch_the_selected_comments(app, admin):
+    with app.app_context():
+        conn = blog.get_db()
+        article_id = add_article(conn, 'moderated')
+        ids = add_comments(conn, article_id, [f'2024-01-01 00:00:{second:02d}' for second in range(6)], is_approved=0)
+        conn.commit()
+        conn.close()
+
+    admin.post('/admin/comments/bulk', data={'action': 'approve', 'comment_ids': [str(ids[0]), str(ids[1])]})
+    admin.post('/admin/comments/bulk', data={'action': 'delete', 'comment_ids': [str(ids[2])]})
+    with app.app_context():
+        conn = blog.get_db()
+        rows = dict(conn.execute('SELECT id, is_approved FROM comments WHERE article_id = ?', (article_id,)).fetchall())
+        conn.close()
+    assert rows == {ids[0]: 1, ids[1]: 1, ids[3]: 0, ids[4]: 0, ids[5]: 0}
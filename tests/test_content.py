@@ -0,0 +1,73 @@
+import app as blog
+from content import compile_content
+
+ARTICLE = {'title': 'Compiled', 'author_name': 'Kylee', 'published_date': '2024-01-01', 'category': 'Quick Reads'}
+
+def test_scripts_and_their_content_are_dropped():
+    html = compile_content('<p>Hello<script>alert(1)</script></p><script src="/x.js"></script>').html
+    assert html == '<p>Hello</p>'
+
+def test_event_handler_attributes_are_dropped():
+    html = compile_content('<p onclick="alert(1)">Hi <a href="/a" onmouseover="alert(1)">link</a></p>').html
+    assert html == '<p>Hi <a href="/a">link</a></p>'
+
+def test_unsafe_link_and_image_urls_are_dropped():
+    html = compile_content('<p><a href="javascript:alert(1)">a</a> <a href=" JavaScript:alert(1)">b</a> '
+                           '<a href="data:text/html,<script>alert(1)</script>">c</a></p>'
+                           '<p><img src="javascript:alert(1)"><img src="data:text/html;base64,PHNjcmlwdD4="></p>').html
+    assert 'javascript' not in html.lower() and 'data:' not in html
+    assert html == '<p><a>a</a> <a>b</a> <a>c</a></p>'
+
+def test_styles_are_reduced_to_the_allowlist():
+    html = compile_content('<p style="color: red; position: fixed; background: url(javascript:x)">a</p>'
+                           '<p style="behavior: url(x.htc)">b</p><style>p { display: none }</style>').html
+    assert html == '<p style="color: red">a</p><p>b</p>'
+
+def test_images_load_lazily_with_their_size():
+    html = compile_content('<p><img src="/static/uploads/a.png"></p>', lambda src: (640, 480)).html
+    assert html == ('<p><img src="/static/uploads/a.png" width="640" height="480" alt="" loading="lazy" '
+                    'decoding="async"></p>')
+
+def test_recompile_articles_rewrites_stored_bodies(app):
+    with app.app_context():
+        conn = blog.get_db()
+        article_id = conn.execute('''
+            INSERT INTO articles (title, slug, author_name, category, published_date, cover_image_filename)
+            VALUES ('Old', 'old', 'Kylee', 'Quick Reads', '2024-01-01', 'cover_image.png')
+        ''').lastrowid
+        source = '<p>Old   body<script>alert(1)</script></p>'
+        blog.bodies.store(conn, article_id, source, source)
+        conn.commit()
+        conn.close()
+
+        assert blog.recompile_articles() == 1
+        conn = blog.get_db()
+        row = conn.execute('SELECT excerpt, reading_minutes, body_version FROM articles WHERE id = ?',
+                           (article_id,)).fetchone()
+        compiled = blog.bodies.load(conn, article_id, 'compiled')
+        conn.close()
+    assert compiled == '<p>Old body</p>'
+    assert (row['excerpt'], row['reading_minutes'], row['body_version']) == ('Old body', 1, 1)
+
+def test_listings_show_the_excerpt_while_the_summary_is_the_placeholder(app, admin):
+    admin.post('/admin/new', data=dict(ARTICLE, short_summary='', content_html='<p>The opening lines.</p>'))
+    assert b'The opening lines.' in admin.get('/archive').data
+    assert b'<description>The opening lines.</description>' in admin.get('/feed.xml').data
+
+def test_deferred_carousel_covers_have_a_noscript_fallback(app):
+    with app.app_context():
+        conn = blog.get_db()
+        for i in range(blog.PRELOAD_HOME_COVERS + 2):
+            conn.execute('''
+                INSERT INTO articles (title, slug, author_name, category, published_date, cover_image_filename)
+                VALUES (?, ?, 'Kylee', 'Quick Reads', ?, ?)
+            ''', (f'Cover {i}', f'cover-{i}', f'2024-01-{10 - i:02d}', f'cover-{i}.png'))
+        conn.commit()
+        conn.close()
+    page = app.test_client().get('/').get_data(as_text=True)
+
+    for i in range(blog.PRELOAD_HOME_COVERS):
+        assert f'src="/static/uploads/cover-{i}.png"' in page and f'data-src="/static/uploads/cover-{i}.png"' not in page
+    for i in range(blog.PRELOAD_HOME_COVERS, blog.PRELOAD_HOME_COVERS + 2):
+        assert f'data-src="/static/uploads/cover-{i}.png"' in page
+        assert f'<noscript><img src="/static/uploads/cover-{i}.png"' in page
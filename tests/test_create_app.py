@@ -0,0 +1,20 @@
+import os
+
+import app as blog
+
+def test_configured_app_ignores_shared_outputs_from_environment(monkeypatch, tmp_path):
+    for name in blog.SHARED_OUTPUT_SETTINGS:
+        monkeypatch.setenv(name, str(tmp_path / name.lower()))
+    instance = blog.create_app({'DATABASE': str(tmp_path / 'blog.db'), 'TEMPLATE_CACHE_DIR': None})
+    for name in blog.SHARED_OUTPUT_SETTINGS:
+        assert instance.config[name] is None
+
+def test_configured_app_keeps_shared_outputs_it_sets(tmp_path):
+    instance = blog.create_app({'DATABASE': str(tmp_path / 'blog.db'), 'TEMPLATE_CACHE_DIR': None,
+                                'STATIC_EXPORT_DIR': str(tmp_path / 'site')})
+    assert instance.config['STATIC_EXPORT_DIR'] == str(tmp_path / 'site')
+
+def test_critical_css_cache_defaults_to_instance_folder(monkeypatch):
+    monkeypatch.delenv('CRITICAL_CSS_CACHE', raising=False)
+    instance = blog.create_app()
+    assert instance.config['CRITICAL_CSS_CACHE'] == os.path.join(instance.instance_path, 'critical_css.json')
@@ -0,0 +1,28 @@
+import os
+
+import app as blog
+
+BLOCKING = 'rel="stylesheet" href="/static/css/style.css"'
+DEFERRED = 'rel="preload" href="/static/css/style.css" as="style"'
+
+def test_requests_never_build_critical_css(app, tmp_path):
+    cache = str(tmp_path / 'critical_css.json')
+    app.config['CRITICAL_CSS_CACHE'] = cache
+    client = app.test_client()
+
+    page = client.get('/').get_data(as_text=True)
+    assert BLOCKING in page and DEFERRED not in page
+    assert not os.path.exists(cache)
+
+    blog.warm_critical_css(app)
+    assert DEFERRED in client.get('/').get_data(as_text=True)
+
+def test_stale_cache_falls_back_to_the_stylesheet(app, tmp_path):
+    cache = tmp_path / 'critical_css.json'
+    app.config['CRITICAL_CSS_CACHE'] = str(cache)
+    blog.build_critical_css(app)
+    cache.write_text('{"stylesheet": "an older style.css", "templates": {"home": "body{}"}}')
+
+    client = app.test_client()
+    assert DEFERRED not in client.get('/').get_data(as_text=True)
+    assert 'older' in cache.read_text()
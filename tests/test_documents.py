@@ -0,0 +1,36 @@
+import app as blog
+
+ARTICLE = {'title': 'Feed Article', 'author_name': 'Kylee', 'published_date': '2024-01-01', 'category': 'Quick Reads',
+           'short_summary': 'Summary', 'content_html': '<p>Body</p>'}
+
+def stored_documents(app):
+    with app.app_context():
+        conn = blog.get_db()
+        names = [row['name'] for row in conn.execute('SELECT name FROM generated_documents')]
+        conn.close()
+    return names
+
+def test_requests_never_build_documents(app):
+    client = app.test_client()
+    assert client.get('/feed.xml', base_url='http://attacker.test').status_code == 404
+    assert client.get('/sitemap.xml', base_url='http://attacker.test').status_code == 404
+    assert stored_documents(app) == []
+
+def test_admin_save_builds_documents_on_its_own_host(app, admin):
+    admin.post('/admin/new', data=ARTICLE)
+    response = app.test_client().get('/feed.xml', base_url='http://attacker.test')
+    assert response.status_code == 200
+    assert b'http://localhost/article/feed-article' in response.data
+    assert b'attacker.test' not in response.data
+
+def test_build_documents_command_links_to_site_url(app):
+    app.config['SITE_URL'] = 'https://example.com'
+    result = app.test_cli_runner().invoke(args=['build-documents'])
+    assert result.exit_code == 0, result.output
+    response = app.test_client().get('/sitemap.xml')
+    assert b'https://example.com/archive' in response.data
+
+def test_build_documents_command_needs_site_url(app):
+    result = app.test_cli_runner().invoke(args=['build-documents'])
+    assert result.exit_code != 0
+    assert stored_documents(app) == []
@@ -0,0 +1,49 @@
+import sqlite3
+
+import pytest
+
+import app as blog
+import query_audit
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE notes (id INTEGER PRIMARY KEY, author TEXT, body TEXT, created_at TEXT)')
+    conn.execute('CREATE INDEX idx_notes_created_at ON notes (created_at)')
+    conn.executemany('INSERT INTO notes (author, body, created_at) VALUES (?, ?, ?)',
+                     [(f'author-{i % 7}', 'Note', f'2024-01-{i % 28 + 1:02d}') for i in range(200)])
+    yield conn
+    conn.close()
+
+def audit(conn, sql, parameters=()):
+    return query_audit.audit_statement(conn, 'test', sql, parameters, max_rows=100)
+
+def test_unindexed_filter_is_reported(conn):
+    findings = audit(conn, 'SELECT id FROM notes WHERE author = ?', ('author-1',))
+    assert len(findings) == 1
+    assert 'SCAN notes' in findings[0]
+
+def test_index_scan_without_limit_is_reported(conn):
+    findings = audit(conn, 'SELECT body FROM notes ORDER BY created_at')
+    assert len(findings) == 1
+    assert 'USING INDEX idx_notes_created_at' in findings[0]
+
+def test_index_scan_under_limit_is_not_reported(conn):
+    assert audit(conn, 'SELECT id FROM notes ORDER BY created_at LIMIT 10') == []
+
+def test_sort_of_large_table_is_reported(conn):
+    findings = audit(conn, 'SELECT id FROM notes ORDER BY author LIMIT 10')
+    assert any('USE TEMP B-TREE FOR ORDER BY' in finding for finding in findings)
+
+def test_sort_of_limited_subquery_is_not_reported(conn):
+    sql = '''
+        SELECT n.id FROM (SELECT id FROM notes ORDER BY created_at DESC LIMIT 10) AS recent
+        JOIN notes n ON n.id = recent.id ORDER BY n.author
+    '''
+    assert audit(conn, sql) == []
+
+def test_indexed_lookup_is_not_reported(conn):
+    assert audit(conn, 'SELECT id FROM notes WHERE created_at = ?', ('2024-01-02',)) == []
+
+def test_routes_have_no_unallowed_full_scans():
+    assert query_audit.run_audit(blog.create_app, max_rows=200) == []
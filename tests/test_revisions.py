@@ -0,0 +1,38 @@
+import app as blog
+import revisions
+
+ARTICLE = {'title': 'Revised', 'author_name': 'Kylee', 'published_date': '2024-01-01', 'category': 'Quick Reads',
+           'short_summary': 'Summary'}
+
+def test_diff_defaults_to_previous_revision_left_by_compaction(app, admin):
+    admin.post('/admin/new', data=dict(ARTICLE, content_html='<p>First</p>'))
+    with app.app_context():
+        conn = blog.get_db()
+        article_id = conn.execute('SELECT id FROM articles WHERE title = ?', ('Revised',)).fetchone()[0]
+        conn.close()
+    for text in ('<p>Second</p>', '<p>Third</p>'):
+        admin.post(f'/admin/edit/{article_id}', data=dict(ARTICLE, content_html=text))
+
+    with app.app_context():
+        conn = blog.get_db()
+        # Revision 2 is not the last of its day, so compaction removes it
+        for number, created_at in ((1, '2020-01-01 10:00:00'), (2, '2020-01-02 10:00:00'), (3, '2020-01-02 11:00:00')):
+            conn.execute('UPDATE article_revisions SET created_at = ? WHERE article_id = ? AND number = ?',
+                         (created_at, article_id, number))
+        assert revisions.compact(conn, article_id) == 1
+        conn.commit()
+        conn.close()
+
+    response = admin.get(f'/admin/edit/{article_id}/revisions/diff')
+    assert response.status_code == 200
+    assert b'Third' in response.data and b'First' in response.data
+
+def test_new_article_starts_with_one_dated_revision(app, admin):
+    admin.post('/admin/new', data=dict(ARTICLE, content_html='<p>First</p>'))
+    with app.app_context():
+        conn = blog.get_db()
+        article_id = conn.execute('SELECT id FROM articles WHERE title = ?', ('Revised',)).fetchone()[0]
+        saved = revisions.list_revisions(conn, article_id)
+        conn.close()
+    assert [row['number'] for row in saved] == [1]
+    assert saved[0]['created_at'] is not None
@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+import app as blog
+import static_export
+
+def files_under(folder):
+    return sorted(os.path.relpath(os.path.join(root, name), folder).replace(os.sep, '/')
+                  for root, _, names in os.walk(folder) for name in names)
+
+@pytest.fixture
+def exported(app, tmp_path):
+    """A full export of 12 articles, with every file dated in 2001"""
+    out_dir = str(tmp_path / 'site')
+    app.config['STATIC_EXPORT_DIR'] = out_dir
+    with app.app_context():
+        conn = blog.get_db()
+        for i in range(12):
+            # The oldest article is not among the latest HOME_ARTICLES on the home page
+            conn.execute('''
+                INSERT INTO articles (title, slug, author_name, category, published_date, cover_image_filename)
+                VALUES (?, ?, 'Kylee', ?, ?, 'cover_image.png')
+            ''', (f'Article {i}', f'article-{i}', 'Quick Reads' if i == 0 else 'Angsty Entries', f'2024-01-{i + 1:02d}'))
+        conn.commit()
+        conn.close()
+    static_export.export_site(app, out_dir)
+    for name in files_under(out_dir):
+        os.utime(os.path.join(out_dir, name), (1e9, 1e9))
+    return out_dir
+
+def rewritten(out_dir):
+    return [name for name in files_under(out_dir) if os.path.getmtime(os.path.join(out_dir, name)) > 1e9]
+
+def test_full_export_writes_every_page_and_fingerprinted_assets(exported):
+    names = files_under(exported)
+    assert 'index.html' in names and 'archive/index.html' in names and 'about/index.html' in names
+    assert sum(name.startswith('article/') for name in names) == 12
+    stylesheets = [name for name in names if name.startswith('static/css/style.')]
+    assert len(stylesheets) == 1 and stylesheets[0] != 'static/css/style.css'
+    with open(os.path.join(exported, 'index.html')) as f:
+        assert f'/{stylesheets[0]}' in f.read()
+
+def test_admin_save_renders_only_the_pages_showing_the_article(app, admin, exported):
+    assets = [name for name in files_under(exported) if name.startswith('static/')]
+    admin.post('/admin/edit/1', data={'title': 'Article 0', 'author_name': 'Kylee', 'published_date': '2024-01-01',
+                                      'category': 'Quick Reads', 'short_summary': 'Edited summary',
+                                      'content_html': '<p>Edited</p>'})
+
+    pages = [name for name in rewritten(exported) if name.endswith('index.html')]
+    assert sorted(pages) == ['archive/index.html', 'article/article-0/index.html', 'quick-reads/index.html']
+    assert [name for name in files_under(exported) if name.startswith('static/')] == assets
+    with open(os.path.join(exported, 'article', 'article-0', 'index.html')) as f:
+        assert 'Edited' in f.read()
+
+def test_moving_an_article_renders_both_categories(app, admin, exported):
+    admin.post('/admin/edit/1', data={'title': 'Article 0', 'author_name': 'Kylee', 'published_date': '2024-01-01',
+                                      'category': 'Songbird Magazine', 'short_summary': 'Summary',
+                                      'content_html': '<p>Moved</p>'})
+    pages = [name for name in rewritten(exported) if name.endswith('index.html')]
+    assert sorted(pages) == ['archive/index.html', 'article/article-0/index.html', 'quick-reads/index.html',
+                             'songbird-magazine/index.html']
@@ -0,0 +1,15 @@
+import io
+import sqlite3
+
+import app as blog
+
+def test_import_spanning_several_batches(app, admin):
+    rows = blog.IMPORT_BATCH_SIZE * 2 + 500
+    csv_text = 'Email,Name\n' + ''.join(f'reader{i}@example.com,Reader {i}\n' for i in range(rows))
+    response = admin.post('/admin/subscribers/import',
+                          data={'csv_file': (io.BytesIO(csv_text.encode()), 'list.csv')})
+    assert response.status_code == 302
+
+    conn = sqlite3.connect(app.config['DATABASE'])
+    assert conn.execute('SELECT COUNT(*) FROM subscribers').fetchone()[0] == rows
+    conn.close()
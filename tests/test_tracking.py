@@ -0,0 +1,57 @@
+import pytest
+
+import app as blog
+import useragents
+
+BROWSER = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+CRAWLER = 'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)'
+
+def rows(app, query):
+    with app.app_context():
+        conn = blog.get_db()
+        result = [tuple(row) for row in conn.execute(query)]
+        conn.close()
+    return result
+
+@pytest.mark.parametrize('user_agent, expected', [
+    (BROWSER, False),
+    (CRAWLER, True),
+    ('curl/8.4.0', True),
+    ('python-requests/2.31', True),
+    ('Mozilla/5.0 (Linux; Android 13; CUBOT KingKong) AppleWebKit/537.36 Mobile Safari/537.36', False),
+    ('', False),
+])
+def test_bot_classification(user_agent, expected):
+    assert useragents.is_bot(useragents.normalize(user_agent)) is expected
+
+def test_bot_views_are_dropped_at_ingest(app):
+    client = app.test_client()
+    response = client.post('/track/view/start', json={'path': '/'}, headers={'User-Agent': CRAWLER})
+    assert response.json == {'view_id': None}
+    # A bot cannot pass itself off as a browser through the reported user agent
+    response = client.post('/track/view/start', json={'path': '/', 'user_agent': BROWSER},
+                           headers={'User-Agent': CRAWLER})
+    assert response.json == {'view_id': None}
+    response = client.post('/track/article/start', json={'article_id': 1}, headers={'User-Agent': CRAWLER})
+    assert response.json == {'view_id': None}
+    assert rows(app, 'SELECT id FROM page_views') == []
+    assert rows(app, 'SELECT id FROM article_views') == []
+    assert rows(app, 'SELECT id FROM user_agents') == []
+
+def test_sampled_bot_views_are_stored_as_bots(app):
+    app.config['BOT_SAMPLE_RATE'] = 1
+    client = app.test_client()
+    assert client.post('/track/view/start', json={'path': '/'}, headers={'User-Agent': CRAWLER}).json['view_id']
+    assert rows(app, 'SELECT user_agent, is_bot FROM user_agents') == [(CRAWLER, 1)]
+
+def test_repeated_user_agents_share_one_row(app):
+    client = app.test_client()
+    for path in ('/', '/archive', '/about'):
+        assert client.post('/track/view/start', json={'path': path}, headers={'User-Agent': BROWSER}).json['view_id']
+    # Another worker's memory, or a restart: the same row is found in the database
+    app.extensions['blog'].user_agent_ids.clear()
+    client.post('/track/view/start', json={'path': '/'}, headers={'User-Agent': BROWSER})
+
+    assert rows(app, 'SELECT user_agent, is_bot FROM user_agents') == [(BROWSER, 0)]
+    assert rows(app, 'SELECT DISTINCT user_agent_id FROM page_views') == rows(app, 'SELECT id FROM user_agents')
+    assert len(rows(app, 'SELECT id FROM page_views')) == 4
@@ -0,0 +1,119 @@
+import errno
+import io
+import os
+
+import pytest
+
+import app as blog
+import bodies
+import revisions
+import uploads
+
+PNG = bytes.fromhex('89504e470d0a1a0a0000000d4948445200000001000000010806000000' '1f15c489'
+                    '0000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082')
+
+def listing(folder):
+    return sorted(os.listdir(folder)) if os.path.isdir(folder) else []
+
+@pytest.fixture
+def spooled(monkeypatch):
+    """Paths of the files uploads are spooled into"""
+    paths = []
+    init = uploads.HashedUpload.__init__
+
+    def recording_init(self, directory):
+        init(self, directory)
+        paths.append(self.path)
+
+    monkeypatch.setattr(uploads.HashedUpload, '__init__', recording_init)
+    return paths
+
+def test_uploads_are_spooled_outside_the_upload_folder(app, admin, spooled):
+    response = admin.post('/admin/upload_image', data={'image': (io.BytesIO(PNG), 'image.png')})
+    assert response.status_code == 200
+
+    upload_folder = app.config['UPLOAD_FOLDER']
+    filename = response.json['url'].rsplit('/', 1)[1]
+    assert [os.path.dirname(path) for path in spooled] == [app.config['UPLOAD_SPOOL_DIR']]
+    assert [name for name in listing(upload_folder) if name.endswith('.png')] == [filename]
+    assert listing(app.config['UPLOAD_SPOOL_DIR']) == []
+
+def test_csv_import_is_spooled_outside_the_upload_folder(app, admin, spooled):
+    data = b'email,name\nreader@example.com,Reader\n'
+    response = admin.post('/admin/subscribers/import', data={'csv_file': (io.BytesIO(data), 'list.csv')})
+    assert response.status_code == 302
+    assert [os.path.dirname(path) for path in spooled] == [app.config['UPLOAD_SPOOL_DIR']]
+
+def test_rejected_upload_is_not_kept(app, admin):
+    admin.post('/admin/upload_image', data={'image': (io.BytesIO(b'not an image'), 'image.png')})
+    assert [name for name in listing(app.config['UPLOAD_FOLDER']) if os.path.isfile(
+        os.path.join(app.config['UPLOAD_FOLDER'], name))] == []
+    assert listing(app.config['UPLOAD_SPOOL_DIR']) == []
+
+def test_keep_as_copies_across_filesystems(tmp_path, monkeypatch):
+    spool, target = tmp_path / 'spool', tmp_path / 'target'
+    spool.mkdir()
+    target.mkdir()
+    upload = uploads.HashedUpload(spool)
+    upload.write(b'content')
+    replace = os.replace
+
+    def cross_device_replace(src, dst):
+        if os.path.dirname(src) == str(spool):
+            raise OSError(errno.EXDEV, 'Invalid cross-device link')
+        replace(src, dst)
+
+    monkeypatch.setattr(uploads.os, 'replace', cross_device_replace)
+    upload.keep_as(str(target / 'kept'))
+    upload.close()
+    assert (target / 'kept').read_bytes() == b'content'
+    assert listing(spool) == [] and listing(target) == ['kept']
+
+@pytest.fixture
+def upload_files(app):
+    """Write `names` into the upload folder, dated `age` seconds ago"""
+    def write(names, age=0):
+        for name in names:
+            path = os.path.join(app.config['UPLOAD_FOLDER'], name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(PNG)
+            os.utime(path, (os.path.getmtime(path) - age,) * 2)
+    return write
+
+def test_gc_removes_only_unreferenced_expired_uploads(app, upload_files):
+    day = 86400
+    with app.app_context():
+        conn = blog.get_db()
+        article_id = conn.execute('''
+            INSERT INTO articles (title, slug, author_name, category, published_date, cover_image_filename)
+            VALUES ('Pictures', 'pictures', 'Kylee', 'Quick Reads', '2024-01-01', 'cover.png')
+        ''').lastrowid
+        revisions.record(conn, article_id, 'Pictures', '<img src="/static/uploads/earlier.png">')
+        text = '<img src="/static/uploads/inline.png">'
+        bodies.store(conn, article_id, text, text)
+        revisions.record(conn, article_id, 'Pictures', text)
+        conn.execute('''
+            INSERT INTO about_page (author_name, author_photo_filename, author_bio_text)
+            VALUES ('Kylee', 'author.png', '<img src="/static/uploads/bio.png">')
+        ''')
+        conn.commit()
+        conn.close()
+    upload_files(['cover.png', 'inline.png', 'earlier.png', 'author.png', 'bio.png', 'orphan.png',
+                  'tmp/stale-preview.png'], age=2 * day)
+    upload_files(['just-added.png', 'tmp/preview.png'])
+    os.makedirs(app.config['UPLOAD_SPOOL_DIR'], exist_ok=True)
+    with open(os.path.join(app.config['UPLOAD_SPOOL_DIR'], 'abandoned'), 'wb') as f:
+        f.write(PNG)
+    os.utime(os.path.join(app.config['UPLOAD_SPOOL_DIR'], 'abandoned'), (0, 0))
+
+    with app.app_context():
+        assert blog.collect_upload_garbage(day, dry_run=True) == ['orphan.png']
+        assert listing(os.path.join(app.config['UPLOAD_FOLDER'], 'tmp')) == ['preview.png', 'stale-preview.png']
+        removed = blog.collect_upload_garbage(day)
+
+    assert sorted(os.path.basename(name) for name in removed) == ['abandoned', 'orphan.png', 'stale-preview.png']
+    assert [name for name in listing(app.config['UPLOAD_FOLDER']) if name.endswith('.png')] == [
+        'author.png', 'bio.png', 'cover.png', 'earlier.png', 'inline.png', 'just-added.png']
+    assert listing(os.path.join(app.config['UPLOAD_FOLDER'], 'tmp')) == ['preview.png']
+    assert listing(app.config['UPLOAD_SPOOL_DIR']) == []
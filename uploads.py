@@ -0,0 +1,84 @@
+"""Upload spooling: files are written to disk and hashed as they arrive.
+
+The multipart parser writes each uploaded file into a HashedUpload in small
+pieces, so a large upload never sits in worker memory, and its SHA-256 is
+known by the time the request handler runs. The spool directory is kept
+outside the served upload folder, and keep_as() moves a file there only once
+it has been checked, with a single rename (or, from another filesystem, a
+copy renamed into place).
+"""
+import errno
+import hashlib
+import os
+import shutil
+import tempfile
+
+CHUNK_SIZE = 64 * 1024
+
+class HashedUpload:
+    """A temporary file that hashes and counts everything written to it.
+
+    Reading, seeking and the other file methods go to the underlying file.
+    Unless keep_as() was called, the file is deleted when closed.
+    """
+
+    def __init__(self, directory):
+        fd, self.path = tempfile.mkstemp(dir=directory, suffix='.part')
+        self.file = os.fdopen(fd, 'wb+')
+        self.hash = hashlib.sha256()
+        self.size = 0
+        self.kept = False
+
+    @classmethod
+    def copy_from(cls, stream, directory):
+        """Spool an already open file object, e.g. one not parsed by UploadRequest"""
+        upload = cls(directory)
+        for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+            upload.write(chunk)
+        upload.seek(0)
+        return upload
+
+    def write(self, data):
+        self.hash.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def __iter__(self):
+        return iter(self.file)
+
+    def hexdigest(self):
+        return self.hash.hexdigest()
+
+    def keep_as(self, path):
+        """Move the file to `path`, atomically: nothing is ever seen at `path` half written"""
+        self.file.close()
+        os.chmod(self.path, 0o644)
+        try:
+            os.replace(self.path, path)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            # The spool directory is on another filesystem: copy next to `path` first
+            fd, part = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+            os.close(fd)
+            try:
+                shutil.copyfile(self.path, part)
+                os.chmod(part, 0o644)
+                os.replace(part, path)
+            except BaseException:
+                os.remove(part)
+                raise
+            os.remove(self.path)
+        self.kept = True
+
+    def close(self):
+        self.file.close()
+        if not self.kept:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self.kept = True
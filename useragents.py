@@ -0,0 +1,46 @@
+"""Classification of tracking requests as crawlers and other automated clients.
+
+The bot signatures are joined into one regular expression, compiled once,
+so a user agent is checked in a single pass however many signatures there
+are. A site sees the same few hundred user agents over and over, so
+is_bot() remembers its answer for the most recent ones.
+"""
+import functools
+import re
+
+# Longest user agent stored or classified; longer ones are cut to this
+MAX_LENGTH = 512
+# User agents whose classification is remembered
+CACHE_SIZE = 4096
+
+# Case-insensitive fragments of user agents that are not people reading the site
+BOT_SIGNATURES = [
+    # Search engines, SEO tools and AI crawlers ("Googlebot", "bingbot", "GPTBot", ...; not CUBOT phones)
+    r'(?<!cu)bot\b', r'crawl', r'spider', r'slurp', r'archiver', r'mediapartners', r'feedfetcher',
+    r'google-inspectiontool', r'bingpreview', r'semrush', r'dataforseo', r'anthropic-ai',
+    # Link previews and feed readers
+    r'facebookexternalhit', r'facebookcatalog', r'embedly', r'quora link preview', r'skypeuripreview', r'whatsapp',
+    r'vkshare', r'feedly', r'newsblur', r'inoreader', r'rss',
+    # Headless and automated browsers
+    r'headless', r'phantomjs', r'selenium', r'webdriver', r'puppeteer', r'playwright', r'lighthouse',
+    r'pagespeed', r'gtmetrix',
+    # Monitoring
+    r'pingdom', r'uptime', r'statuscake', r'site24x7', r'newrelicpinger', r'datadog', r'monitor',
+    # HTTP libraries and command-line tools
+    r'^curl/', r'^wget/', r'python-requests', r'python-urllib', r'python-httpx', r'aiohttp', r'go-http-client',
+    r'^java/', r'okhttp', r'apache-httpclient', r'libwww-perl', r'scrapy', r'node-fetch', r'axios/', r'httpie',
+    r'^php/', r'^ruby', r'postmanruntime', r'insomnia',
+]
+
+BOT_PATTERN = re.compile('|'.join(f'(?:{signature})' for signature in BOT_SIGNATURES), re.IGNORECASE)
+
+def normalize(user_agent):
+    """The user agent as stored: stripped, cut to MAX_LENGTH, or None when empty"""
+    if not user_agent:
+        return None
+    return user_agent.strip()[:MAX_LENGTH] or None
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def is_bot(user_agent):
+    """Whether a (normalized) user agent belongs to a crawler or automated client"""
+    return bool(user_agent) and BOT_PATTERN.search(user_agent) is not None
@@ -0,0 +1,157 @@
+"""Batched SQLite writes from a background thread.
+
+Requests hand their writes to a BatchWriter and wait on the returned
+Future. One thread owns the write connection and runs whatever has queued
+up in a single transaction, so a burst of signups costs one commit (and one
+fsync) per batch instead of one per request. Under light load a batch is a
+single write and nothing waits for it to fill up.
+
+A write is either one statement (submit) or a function of the connection
+(submit_transaction) for writes that read what they change, such as
+toggling a like and counting the likes after it. Functions run inside a
+savepoint, so one that raises is undone without failing the rest of its
+batch, and their Future resolves to whatever they return.
+
+With several processes writing the same file, each has its own writer:
+transactions start with BEGIN IMMEDIATE, so they wait up to `timeout`
+seconds for another process's transaction and never deadlock halfway
+through, and a batch that still finds the database locked is retried
+`retries` times before its callers see the error.
+"""
+import functools
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+def is_busy(error):
+    """Whether an error means another connection held the lock for longer than the timeout"""
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in str(error) or 'busy' in str(error))
+
+def fetch_rows(sql, parameters, conn):
+    return conn.execute(sql, parameters).fetchall()
+
+class BatchWriter:
+    """Runs submitted writes in batched transactions on its own connection"""
+
+    def __init__(self, database, max_batch=500, timeout=10.0, retries=3, retry_delay=0.05, factory=sqlite3.Connection):
+        self.database = database
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.factory = factory
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.pid = None
+        self.batches = 0
+        self.statements = 0
+        self.retried = 0
+
+    def submit(self, sql, parameters=()):
+        """Queue a statement; the Future resolves to the rows it returned (RETURNING) or []"""
+        return self.enqueue(functools.partial(fetch_rows, sql, parameters), savepoint=False)
+
+    def submit_transaction(self, function):
+        """Queue `function(conn)`; the Future resolves to its return value.
+
+        It runs on the writer thread inside the batch's transaction and must
+        not commit, roll back or wait on the writer itself.
+        """
+        return self.enqueue(function, savepoint=True)
+
+    def execute(self, sql, parameters=(), timeout=30):
+        """Submit a statement and wait for its rows"""
+        return self.submit(sql, parameters).result(timeout)
+
+    def transaction(self, function, timeout=30):
+        """Submit a function and wait for its result"""
+        return self.submit_transaction(function).result(timeout)
+
+    def enqueue(self, function, savepoint):
+        if threading.current_thread() is self.thread:
+            raise RuntimeError('A write function cannot wait on its own writer')
+        future = Future()
+        self.ensure_thread()
+        self.queue.put((function, savepoint, future))
+        return future
+
+    def ensure_thread(self):
+        # Threads do not survive fork(), so a forked worker starts its own
+        if self.thread is not None and self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.thread is None or self.pid != os.getpid():
+                self.queue = queue.Queue()
+                self.pid = os.getpid()
+                self.thread = threading.Thread(target=self.run, name='sqlite-batch-writer', daemon=True)
+                self.thread.start()
+
+    def run(self):
+        conn = sqlite3.connect(self.database, timeout=self.timeout, isolation_level=None, factory=self.factory)
+        conn.row_factory = sqlite3.Row
+        pending = self.queue
+        while True:
+            batch = [pending.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(pending.get_nowait())
+                except queue.Empty:
+                    break
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if batch:
+                self.write_batch(conn, batch)
+
+    def write_batch(self, conn, batch):
+        for attempt in range(self.retries + 1):
+            try:
+                outcomes = self.run_batch(conn, batch)
+                break
+            except sqlite3.Error as e:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                if is_busy(e) and attempt < self.retries:
+                    self.retried += 1
+                    time.sleep(self.retry_delay * 2 ** attempt)
+                    continue
+                for _, _, future in batch:
+                    future.set_exception(e)
+                return
+        self.batches += 1
+        self.statements += len(batch)
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def run_batch(self, conn, batch):
+        """Run a batch in one transaction and return (future, result, exception) for each write.
+
+        Futures are only resolved after COMMIT, so a batch that has to be
+        retried runs every write again from the start.
+        """
+        outcomes = []
+        conn.execute('BEGIN IMMEDIATE')
+        for function, savepoint, future in batch:
+            if savepoint:
+                conn.execute('SAVEPOINT write')
+            try:
+                result = function(conn)
+            except Exception as e:
+                if is_busy(e):
+                    raise
+                # A failed statement is rolled back on its own; a function back to its savepoint
+                if savepoint:
+                    conn.execute('ROLLBACK TO write')
+                    conn.execute('RELEASE write')
+                outcomes.append((future, None, e))
+                continue
+            if savepoint:
+                conn.execute('RELEASE write')
+            outcomes.append((future, result, None))
+        conn.execute('COMMIT')
+        return outcomes